@@ -1,6 +1,6 @@
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.response import Response
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
@@ -15,7 +15,27 @@ from django.conf import settings
 import time
 from datetime import datetime
 import sys
-from dal import UserDAO, MoodHistoryDAO, ListeningHistoryDAO
+from dal import UserDAO, MoodHistoryDAO, ListeningHistoryDAO, PlaylistDAO
+from inference.metrics import metrics
+from inference.model_cache import model_cache, reserve_external_models
+from inference.audio_normalize import TranscodeError, get_transcoder_pool, needs_transcode
+from inference.face_detection import NO_FACE_EMOTION, found_no_face, get_face_detector
+from inference.facial_burst import AGGREGATIONS, FacialBurst
+from inference.long_text import get_long_text_emotion
+from inference.scheduler import get_scheduler
+from inference.shadow import get_shadow_evaluator
+from inference.speech_tiers import get_speech_router, parse_request_options
+from inference.text_cascade import get_text_cascade
+from recommendation.bloom import BloomFilter, split_seen
+from recommendation.cache import get_recommendation_cache
+from recommendation.catalog import get_catalog, song_to_track
+from recommendation.diversity import get_diversifier
+from recommendation.feed import FeedError, FeedExpired, get_feed
+from recommendation.moods import canonical_mood
+from recommendation.personalization import get_personalizer
+from recommendation.providers import get_recommendation_chain
+from recommendation.spotify import get_spotify_manager
+from recommendation.transitions import transition
 import json
 
 # Add the project root directory to the Python path
@@ -28,8 +48,12 @@ try:
     from ai_ml.src.models.text_emotion import infer_text_emotion
     from ai_ml.src.models.speech_emotion import infer_speech_emotion
     from ai_ml.src.models.facial_emotion import infer_facial_emotion
+    # Share the pooled Spotify session before the recommender builds its spotipy client
+    get_spotify_manager()
     from ai_ml.src.recommendation.music_recommendation import get_music_recommendation
     logging.debug(f"Successfully imported AI/ML modules from {project_root}")
+    # ai_ml keeps its models outside the model cache; count them against its memory budget
+    reserve_external_models()
 except ImportError as e:
     logging.error(f"Failed to import AI/ML modules: {str(e)}")
     logging.error(f"Python path: {sys.path}")
@@ -43,6 +67,79 @@ logger = logging.getLogger(__name__)
 user_dao = UserDAO()
 mood_history_dao = MoodHistoryDAO()
 listening_history_dao = ListeningHistoryDAO()
+playlist_dao = PlaylistDAO()
+
+
+def spotify_recommendations(emotion, market=None):
+    return get_music_recommendation(emotion, market) if market else get_music_recommendation(emotion)
+
+
+def candidate_pool(emotion, market=None, username=None, size=None, keep_seen=None):
+    """
+    Candidates from the provider chain in relevance order, re-ranked for the user's taste when
+    username is given and with tracks the user was already recommended moved last. Bounded by the
+    provider deadlines; never raises.
+
+    :param size: Candidates to ask the providers for; defaults to RECOMMENDATION_POOL_SIZE.
+    :param keep_seen: Keep already recommended tracks only while fewer than this many new ones remain.
+    """
+    # Facial and speech labels share the text model's cache entries, catalog moods and search terms
+    emotion = canonical_mood(emotion)
+    pool = get_recommendation_chain().recommend(emotion, market, live=spotify_recommendations,
+                                                limit=size or settings.RECOMMENDATION_POOL_SIZE)
+    if username is None:
+        return pool
+    try:
+        profile = UserProfile.objects(username=username).only('taste', 'recommended_filter').first()
+        if profile and profile.taste:
+            pool = get_personalizer(get_catalog().space).rerank(pool, profile.taste)
+        if profile and profile.recommended_filter:
+            unseen, seen = split_seen(pool, BloomFilter.from_bytes(profile.recommended_filter))
+            pool = unseen + (seen if keep_seen is None else seen[:max(0, keep_seen - len(unseen))])
+    except Exception as e:
+        logger.error(f"Personalizing recommendations failed: {str(e)}")
+    return pool
+
+
+def recommend_tracks(emotion, market=None, username=None, diversity=None, relevance_weight=None):
+    """
+    candidate_pool diversified by artist and sound; already recommended tracks only fill in when
+    too few new ones remain. Never raises.
+
+    :param diversity: MMR similarity penalty; defaults to RECOMMENDATION_DIVERSITY.
+    :param relevance_weight: MMR relevance weight; defaults to 1 - diversity.
+    """
+    limit = settings.RECOMMENDATION_LIMIT
+    pool = candidate_pool(emotion, market, username, keep_seen=limit)
+    if diversity is None:
+        diversity = settings.RECOMMENDATION_DIVERSITY
+    try:
+        return get_diversifier(get_catalog().space).rerank(pool, limit, diversity=diversity,
+                                                           relevance_weight=relevance_weight)
+    except Exception as e:
+        logger.error(f"Diversifying recommendations failed: {str(e)}")
+        return pool[:limit]
+
+
+def mmr_weights(data):
+    """
+    Per-request MMR weights from request data.
+
+    :return: ({'diversity': ..., 'relevance_weight': ...} with the fields given, error message or None).
+    """
+    weights = {}
+    for field, name in (('diversity', 'diversity'), ('relevance', 'relevance_weight')):
+        if data.get(field) is None:
+            continue
+        try:
+            value = float(data[field])
+        except (TypeError, ValueError):
+            value = float('nan')
+        if not 0.0 <= value <= 1.0:
+            return weights, f"{field} must be a number between 0 and 1"
+        weights[name] = value
+    return weights, None
+
 
 @swagger_auto_schema(
     method='post',
@@ -50,6 +147,9 @@ listening_history_dao = ListeningHistoryDAO()
         type=openapi.TYPE_OBJECT,
         properties={
             'text': openapi.Schema(type=openapi.TYPE_STRING, description='Text to analyze for emotion'),
+            'long_text': openapi.Schema(type=openapi.TYPE_BOOLEAN,
+                                        description='Analyze sentence by sentence and return per-segment emotions '
+                                                    '(default: automatic for long texts)'),
         },
         required=['text'],
     ),
@@ -76,9 +176,28 @@ def text_emotion(request):
             
         logger.debug(f"Processing text: {text}")
         
-        # Detect emotion from text
-        detected_emotion = infer_text_emotion(text)
+        # Long texts are classified sentence by sentence so nothing past the token limit is lost
+        long_text = request.data.get('long_text')
+        if long_text is None:
+            long_text = len(text.split()) >= settings.LONG_TEXT_MIN_WORDS
+        elif isinstance(long_text, str):
+            # Form submissions send booleans as strings
+            long_text = long_text.strip().lower() in ('1', 'true', 'yes', 'on')
+        analysis = None
+        inference_started = time.perf_counter()
+        if long_text:
+            analysis = get_scheduler().run(get_long_text_emotion().analyze, text)
+            detected_emotion = analysis['emotion']
+        else:
+            # Confident inputs are answered without the transformer
+            detected_emotion = get_scheduler().run(get_text_cascade().predict, text, infer_text_emotion)
         logger.debug(f"Detected emotion: {detected_emotion}")
+        get_shadow_evaluator().maybe_submit('text', text, detected_emotion,
+                                            (time.perf_counter() - inference_started) * 1000)
+        
+        # Get music recommendations once; the provider chain bounds the wait and never raises
+        recommendations = recommend_tracks(detected_emotion, username=request.user.username)
+        logger.debug(f"Got {len(recommendations)} music recommendations")
         
         try:
             # Get user profile and save emotion to history
@@ -89,10 +208,6 @@ def text_emotion(request):
             })
             logger.debug(f"Saved emotion to user history: {detected_emotion}")
             
-            # Get music recommendations based on the detected emotion
-            recommendations = get_music_recommendation(detected_emotion)
-            logger.debug(f"Got {len(recommendations)} music recommendations")
-            
             # Save recommendations to user history
             for track in recommendations:
                 user_profile.add_recommendation(
@@ -106,13 +221,16 @@ def text_emotion(request):
         except Exception as e:
             logger.error(f"Error saving to user history: {str(e)}")
             # Continue even if saving fails - we still want to return the emotion and recommendations
-            recommendations = get_music_recommendation(detected_emotion)
         
-        return Response({
+        response = {
             'emotion': detected_emotion,
             'message': 'Emotion detected and saved to history',
             'recommendations': recommendations
-        }, status=status.HTTP_200_OK)
+        }
+        if analysis:
+            response['scores'] = analysis['scores']
+            response['segments'] = analysis['segments']
+        return Response(response, status=status.HTTP_200_OK)
         
     except Exception as e:
         logger.error(f"Error processing text emotion: {str(e)}", exc_info=True)
@@ -128,6 +246,10 @@ def text_emotion(request):
         type=openapi.TYPE_OBJECT,
         properties={
             'audio_file': openapi.Schema(type=openapi.TYPE_FILE, description='Audio file to analyze for emotion'),
+            'tier': openapi.Schema(type=openapi.TYPE_STRING, enum=['fast', 'standard', 'premium'],
+                                   description='Model quality tier (default from settings)'),
+            'latency_budget_ms': openapi.Schema(type=openapi.TYPE_NUMBER,
+                                                description='Skip the heavy model if it would exceed this budget'),
         },
         required=['audio_file'],
     ),
@@ -164,6 +286,11 @@ def speech_emotion(request):
         if audio_file.size == 0:
             logger.error("Empty audio file received")
             return Response({'error': 'Empty audio file'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            tier, budget = parse_request_options(request.data.get('tier'), request.data.get('latency_budget_ms'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         # Create temporary directory if it doesn't exist
         temp_dir = os.path.join(settings.MEDIA_ROOT, 'temp')
@@ -176,9 +303,22 @@ def speech_emotion(request):
         logger.debug(f"Saving temporary file to: {temp_path}")
         
         try:
-            with open(temp_path, 'wb+') as destination:
-                for chunk in audio_file.chunks():
-                    destination.write(chunk)
+            # Compressed browser formats are normalized to 16 kHz mono WAV by the ffmpeg pool
+            pool = get_transcoder_pool()
+            if pool and needs_transcode(audio_file.name, audio_file.content_type):
+                try:
+                    normalized = pool.transcode_to_wav(audio_file.read())
+                    temp_path = f'{os.path.splitext(temp_path)[0]}.wav'
+                    with open(temp_path, 'wb+') as destination:
+                        destination.write(normalized)
+                    logger.debug(f"Transcoded {audio_file.content_type} upload to WAV")
+                except TranscodeError as e:
+                    logger.warning(f"Transcoding failed, decoding upload in-process: {str(e)}")
+                    audio_file.seek(0)
+            if not os.path.exists(temp_path):
+                with open(temp_path, 'wb+') as destination:
+                    for chunk in audio_file.chunks():
+                        destination.write(chunk)
             
             # Verify the file was saved correctly
             if not os.path.exists(temp_path):
@@ -192,9 +332,13 @@ def speech_emotion(request):
                 logger.error("Saved file is empty")
                 return Response({'error': 'Saved audio file is empty'}, status=status.HTTP_400_BAD_REQUEST)
             
-            # Get emotion from speech
+            # Get emotion from speech; the cheap model answers unless the tier or its confidence calls for wav2vec2
             logger.debug("Starting speech emotion detection")
-            emotion = infer_speech_emotion(temp_path)
+            inference_started = time.perf_counter()
+            emotion = get_scheduler().run(get_speech_router().predict, temp_path, infer_speech_emotion,
+                                          tier=tier, latency_budget_ms=budget)
+            get_shadow_evaluator().maybe_submit('speech', temp_path, emotion,
+                                                (time.perf_counter() - inference_started) * 1000)
             logger.debug(f"Detected emotion: {emotion}")
             
             # Get user profile
@@ -208,7 +352,7 @@ def speech_emotion(request):
             logger.debug(f"Saved emotion to user history: {emotion}")
             
             # Get music recommendations
-            recommendations = get_music_recommendation(emotion)
+            recommendations = recommend_tracks(emotion, username=request.user.username)
             logger.debug(f"Got {len(recommendations)} music recommendations")
             
             # Store recommendations
@@ -305,6 +449,7 @@ def facial_emotion(request):
         timestamp = int(time.time() * 1000)
         temp_path = os.path.join(temp_dir, f'temp_facial_{timestamp}_{image_file.name}')
         logger.debug(f"Saving temporary file to: {temp_path}")
+        face_path, face_detection = None, None
         
         try:
             with open(temp_path, 'wb+') as destination:
@@ -323,10 +468,27 @@ def facial_emotion(request):
                 logger.error("Saved file is empty")
                 return Response({'error': 'Saved image file is empty'}, status=status.HTTP_400_BAD_REQUEST)
         
+            # Crop to the largest face; the Haar cascade handles most images and MTCNN only the rest.
+            # The emotion model still runs its own detector on the crop, so it is skipped when neither finds a face.
+            detector = get_face_detector()
+            if detector:
+                try:
+                    face_path, face_detection = detector.crop_to_face(temp_path)
+                    logger.debug(f"Face detection: {face_detection}")
+                except Exception as e:
+                    logger.warning(f"Face detection failed, using the full image: {str(e)}")
+        
             # Detect emotion from the image
-            logger.debug("Calling facial emotion detection model")
-            detected_emotion = infer_facial_emotion(temp_path)
-            logger.debug(f"Model returned emotion: {detected_emotion}")
+            if found_no_face(face_detection):
+                logger.debug(f"No face found, skipping the emotion model and answering {NO_FACE_EMOTION}")
+                detected_emotion = NO_FACE_EMOTION
+            else:
+                logger.debug("Calling facial emotion detection model")
+                inference_started = time.perf_counter()
+                detected_emotion = get_scheduler().run(infer_facial_emotion, face_path or temp_path)
+                logger.debug(f"Model returned emotion: {detected_emotion}")
+                get_shadow_evaluator().maybe_submit('facial', face_path or temp_path, detected_emotion,
+                                                    (time.perf_counter() - inference_started) * 1000)
             
             if not detected_emotion:
                 logger.warning("No emotion detected, defaulting to neutral")
@@ -337,7 +499,7 @@ def facial_emotion(request):
             # Get music recommendations based on the detected emotion
             logger.debug(f"Getting music recommendations for emotion: {detected_emotion}")
             try:
-                recommendations = get_music_recommendation(detected_emotion)
+                recommendations = recommend_tracks(detected_emotion, username=request.user.username)
                 logger.debug(f"Got {len(recommendations)} music recommendations")
             except Exception as e:
                 logger.error(f"Error getting music recommendations: {str(e)}")
@@ -366,11 +528,14 @@ def facial_emotion(request):
                 logger.error(f"Error saving to user history: {str(e)}")
                 # Continue even if saving fails - we still want to return the emotion and recommendations
             
-            return Response({
+            response = {
                 'emotion': detected_emotion,
                 'message': 'Emotion detected and saved to history',
                 'recommendations': recommendations
-            }, status=status.HTTP_200_OK)
+            }
+            if face_detection:
+                response['face_detection'] = face_detection
+            return Response(response, status=status.HTTP_200_OK)
             
         except Exception as e:
             logger.error(f"Error processing image: {str(e)}")
@@ -379,9 +544,10 @@ def facial_emotion(request):
         finally:
             # Clean up temporary file
             try:
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
-                    logger.debug(f"Temporary file removed: {temp_path}")
+                for path in (temp_path, face_path):
+                    if path and os.path.exists(path):
+                        os.remove(path)
+                        logger.debug(f"Temporary file removed: {path}")
             except Exception as e:
                 logger.error(f"Error removing temporary file: {str(e)}")
                 
@@ -394,6 +560,98 @@ def facial_emotion(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@swagger_auto_schema(
+    method='post',
+    manual_parameters=[
+        openapi.Parameter('images', openapi.IN_FORM, type=openapi.TYPE_FILE, required=True,
+                          description='Burst of images to analyze; repeat the field for each frame'),
+        openapi.Parameter('aggregate', openapi.IN_FORM, type=openapi.TYPE_STRING, enum=list(AGGREGATIONS),
+                          description='majority: one vote per frame; average: votes weighted by face confidence'),
+    ],
+    responses={
+        200: openapi.Response('Emotion detected successfully'),
+        400: openapi.Response('Invalid input'),
+        500: openapi.Response('Internal server error'),
+    },
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def facial_emotion_burst(request):
+    """
+    Detect one emotion from a burst of facial images.
+    """
+    try:
+        logger.debug("Received facial emotion burst request")
+        
+        images = request.FILES.getlist('images') or [request.FILES[key] for key in request.FILES]
+        if not images:
+            logger.error("No files found in request")
+            return Response({'error': 'No image files provided in request'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(images) > settings.FACIAL_BURST_MAX_IMAGES:
+            return Response({'error': f'At most {settings.FACIAL_BURST_MAX_IMAGES} images per burst'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if any(image.size == 0 for image in images):
+            logger.error("Empty image file received")
+            return Response({'error': 'Empty image file'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        method = request.data.get('aggregate', 'majority')
+        if method not in AGGREGATIONS:
+            return Response({'error': f"aggregate must be one of {', '.join(AGGREGATIONS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        temp_dir = os.path.join(settings.MEDIA_ROOT, 'temp')
+        os.makedirs(temp_dir, exist_ok=True)
+        
+        # Decode, crop and classify every frame in parallel, then reduce to one label
+        burst = FacialBurst(lambda path: get_scheduler().run(infer_facial_emotion, path), get_face_detector(),
+                            workers=settings.FACIAL_BURST_WORKERS)
+        result = burst.run([image.read() for image in images], temp_dir, method)
+        logger.debug(f"Burst result: {result['emotion']} from {len(images)} frames, votes {result['votes']}")
+        
+        detected_emotion = result['emotion'] or 'neutral'
+        if not result['emotion']:
+            logger.warning("No emotion detected in any frame, defaulting to neutral")
+        
+        try:
+            recommendations = recommend_tracks(detected_emotion, username=request.user.username)
+            logger.debug(f"Got {len(recommendations)} music recommendations")
+        except Exception as e:
+            logger.error(f"Error getting music recommendations: {str(e)}")
+            recommendations = []
+        
+        # Save the emotion and all recommendations with one write
+        try:
+            user_profile = UserProfile.objects.get(username=request.user.username)
+            user_profile.add_mood_with_recommendations(
+                {'emotion': detected_emotion, 'timestamp': datetime.utcnow()},
+                [{
+                    'track_id': track['external_url'].split('/')[-1],
+                    'track_name': track['name'],
+                    'artist': track['artist'],
+                    'emotion': detected_emotion
+                } for track in recommendations]
+            )
+            logger.debug("Saved emotion and recommendations to user history")
+        except Exception as e:
+            logger.error(f"Error saving to user history: {str(e)}")
+        
+        return Response({
+            'emotion': detected_emotion,
+            'votes': result['votes'],
+            'frames': result['frames'],
+            'message': 'Emotion detected and saved to history',
+            'recommendations': recommendations
+        }, status=status.HTTP_200_OK)
+        
+    except Exception as e:
+        logger.error(f"Error in facial emotion burst endpoint: {str(e)}")
+        logger.error(traceback.format_exc())
+        return Response({
+            'error': 'Failed to process facial emotion burst',
+            'detail': str(e)
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 @swagger_auto_schema(
     method='post',
     request_body=openapi.Schema(
@@ -401,6 +659,11 @@ def facial_emotion(request):
         properties={
             'emotion': openapi.Schema(type=openapi.TYPE_STRING, description='Detected emotion'),
             'market': openapi.Schema(type=openapi.TYPE_STRING, description='Market code for Spotify recommendations'),
+            'diversity': openapi.Schema(type=openapi.TYPE_NUMBER,
+                                        description='0-1 penalty on tracks similar to ones already listed '
+                                                    '(default: RECOMMENDATION_DIVERSITY)'),
+            'relevance': openapi.Schema(type=openapi.TYPE_NUMBER,
+                                        description='0-1 weight of relevance (default: 1 - diversity)'),
         },
         required=['emotion'],
     ),
@@ -426,11 +689,15 @@ def music_recommendation(request):
     if not emotion:
         logger.error("No emotion provided in request")
         return Response({"error": "Emotion is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+    weights, error = mmr_weights(request.data)
+    if error:
+        return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
     
     try:
         # Get music recommendations
         logger.debug(f"Getting music recommendations for emotion: {emotion}, market: {market}")
-        recommendations = get_music_recommendation(emotion, market)
+        recommendations = recommend_tracks(emotion, market, username=request.user.username, **weights)
         logger.debug(f"Got {len(recommendations)} music recommendations")
         
         # Save emotion and recommendations to user history
@@ -530,4 +797,193 @@ def get_user_listening_history(request, username):
         return Response({'listening_history': listening_history})
         
     except Exception as e:
-        return Response({'error': str(e)}, status=500) 
\ No newline at end of file
+        return Response({'error': str(e)}, status=500) 
+
+
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=[
+        openapi.Parameter('emotion', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description='Emotion to start a new feed for'),
+        openapi.Parameter('market', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description='Market code for a new feed'),
+        openapi.Parameter('diversity', openapi.IN_QUERY, type=openapi.TYPE_NUMBER,
+                          description='0-1 MMR similarity penalty for a new feed'),
+        openapi.Parameter('relevance', openapi.IN_QUERY, type=openapi.TYPE_NUMBER,
+                          description='0-1 MMR relevance weight for a new feed'),
+        openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description='next_cursor of the previous page; continues that feed'),
+    ],
+    responses={
+        200: openapi.Response('A page of recommendations and the cursor of the next one (null at the end)'),
+        400: openapi.Response('Invalid input or cursor'),
+        410: openapi.Response('The feed expired; start a new one'),
+        500: openapi.Response('Internal server error'),
+    },
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def recommendation_feed(request):
+    """
+    Page through recommendations for an emotion.
+
+    Without a cursor this starts a feed and returns its first page; with one it returns the next
+    page of that feed from the pool cached when the feed started.
+    """
+    username = request.user.username
+    cursor = request.query_params.get('cursor')
+    try:
+        diversifier = get_diversifier(get_catalog().space)
+        if cursor:
+            emotion, recommendations, next_cursor = get_feed().page(username, cursor, diversifier)
+        else:
+            emotion = request.query_params.get('emotion')
+            if not emotion:
+                return Response({"error": "Emotion or cursor is required"}, status=status.HTTP_400_BAD_REQUEST)
+            weights, error = mmr_weights(request.query_params)
+            if error:
+                return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+            weights.setdefault('diversity', settings.RECOMMENDATION_DIVERSITY)
+            pool = candidate_pool(emotion, request.query_params.get('market'), username,
+                                  size=settings.FEED_POOL_SIZE)
+            recommendations, next_cursor = get_feed().start(username, emotion, pool, diversifier, **weights)
+    except FeedExpired as e:
+        return Response({"error": str(e)}, status=status.HTTP_410_GONE)
+    except FeedError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        logger.error(f"Error in recommendation feed: {str(e)}")
+        return Response({"error": "Failed to generate recommendations", "detail": str(e)},
+                        status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    # Record what was shown, so later feeds and recommendations skip it
+    try:
+        user_profile = UserProfile.objects.get(username=username)
+        served = [{
+            'track_id': track['external_url'].split('/')[-1],
+            'track_name': track['name'],
+            'artist': track['artist'],
+            'emotion': emotion
+        } for track in recommendations]
+        if cursor:
+            user_profile.add_recommendations(served)
+        else:
+            user_profile.add_mood_with_recommendations({'emotion': emotion, 'timestamp': datetime.utcnow()}, served)
+    except Exception as e:
+        logger.error(f"Error saving feed page to user history: {str(e)}")
+
+    return Response({
+        "emotion": emotion,
+        "recommendations": recommendations,
+        "next_cursor": next_cursor,
+    }, status=status.HTTP_200_OK)
+
+
+@swagger_auto_schema(
+    method='post',
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            'to_emotion': openapi.Schema(type=openapi.TYPE_STRING, description='Emotion the playlist should end on'),
+            'from_emotion': openapi.Schema(type=openapi.TYPE_STRING,
+                                           description='Emotion to start from (default: the last detected mood)'),
+            'length': openapi.Schema(type=openapi.TYPE_INTEGER,
+                                     description='Number of tracks (default: PLAYLIST_TRANSITION_LENGTH)'),
+            'market': openapi.Schema(type=openapi.TYPE_STRING, description='Only tracks available in this market'),
+            'name': openapi.Schema(type=openapi.TYPE_STRING, description='Playlist name'),
+        },
+        required=['to_emotion'],
+    ),
+    responses={
+        201: openapi.Response('Playlist created'),
+        400: openapi.Response('Invalid input'),
+        404: openapi.Response('User not found'),
+        503: openapi.Response('The track catalog has no tracks with audio features yet'),
+        500: openapi.Response('Internal server error'),
+    },
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def mood_transition_playlist(request):
+    """
+    Create a playlist that moves from one mood to another, built from the local track catalog.
+    """
+    to_emotion = request.data.get('to_emotion')
+    from_emotion = request.data.get('from_emotion')
+    market = request.data.get('market')
+    if not to_emotion:
+        return Response({"error": "to_emotion is required"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        length = int(request.data.get('length') or settings.PLAYLIST_TRANSITION_LENGTH)
+    except (TypeError, ValueError):
+        length = 0
+    if not 2 <= length <= settings.PLAYLIST_TRANSITION_MAX_LENGTH:
+        return Response({"error": f"length must be between 2 and {settings.PLAYLIST_TRANSITION_MAX_LENGTH}"},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        # Playlists belong to the DAL user, whose id differs from the Django auth id
+        user = user_dao.get_by_username(request.user.username)
+        if not user:
+            return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        if not from_emotion:
+            profile = UserProfile.objects(username=request.user.username).only('mood_history').first()
+            # The views save the whole {'emotion', 'timestamp'} mood dict as each entry's emotion
+            last_mood = profile.mood_history[-1]['emotion'] if profile and profile.mood_history else None
+            from_emotion = last_mood.get('emotion') if last_mood else None
+            if not from_emotion:
+                return Response({"error": "from_emotion is required when no mood has been detected yet"},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        space = get_catalog().space
+        started = time.perf_counter()
+        try:
+            positions = transition(space, from_emotion, to_emotion, length, market)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        metrics.observe('playlist.transition_ms', (time.perf_counter() - started) * 1000)
+        if not positions:
+            return Response({"error": "The track catalog has no tracks with audio features yet"},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        songs = [space.songs[position] for position in positions]
+        name = request.data.get('name') or f"From {from_emotion} to {to_emotion}"
+        playlist_id = playlist_dao.create_playlist_with_songs(
+            user['id'], name, [song['song_id'] for song in songs],
+            description=f"Moves from {from_emotion} to {to_emotion}", mood_category=to_emotion,
+        )
+        return Response({
+            "playlist_id": playlist_id,
+            "name": name,
+            "from_emotion": from_emotion,
+            "to_emotion": to_emotion,
+            "tracks": [song_to_track(song) for song in songs],
+        }, status=status.HTTP_201_CREATED)
+    except Exception as e:
+        logger.error(f"Error creating mood transition playlist: {str(e)}")
+        return Response({"error": "Failed to create playlist", "detail": str(e)},
+                        status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@swagger_auto_schema(
+    method='get',
+    responses={
+        200: openapi.Response('Inference metrics for this worker process'),
+        403: openapi.Response('Admin access required'),
+    },
+)
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def inference_metrics(request):
+    """
+    Return the in-process inference metrics (counters, gauges and timings) of this worker.
+    """
+    snapshot = metrics.snapshot()
+    snapshot['text_cascade'] = get_text_cascade().stats()
+    snapshot['speech_router'] = get_speech_router().stats()
+    snapshot['model_cache'] = model_cache.stats()
+    snapshot['catalog'] = get_catalog().stats()
+    snapshot['recommendation_cache'] = get_recommendation_cache().stats()
+    snapshot['recommendation_providers'] = get_recommendation_chain().stats()
+    return Response(snapshot, status=status.HTTP_200_OK)
@@ -0,0 +1,317 @@
+"""
+Internal gRPC inference API for service-to-service callers.
+
+Exposes text, audio and image emotion detection without DRF, JWT or JSON:
+payloads are raw bytes and responses carry only the emotion. The servicer is
+built from the same components as the REST views (text cascade and long-text
+mode, ffmpeg normalization, speech tier router, tiered face detection, the
+model cache and the priority scheduler), so both APIs behave the same. The
+gRPC server is its own process with its own models and scheduler; requests
+with priority 'batch' (``score_emotions --grpc``) wait behind its interactive ones.
+It does not fetch recommendations or write user history.
+
+Message classes are built at runtime from descriptors mirroring
+``protos/emotion_inference.proto``, so no generated code is checked in.
+"""
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+from concurrent import futures
+from functools import lru_cache
+
+from django.conf import settings
+
+from inference.audio_normalize import TranscodeError, get_transcoder_pool, needs_transcode
+from inference.face_detection import NO_FACE_EMOTION, found_no_face, get_face_detector
+from inference.long_text import get_long_text_emotion
+from inference.metrics import metrics
+from inference.scheduler import PRIORITIES, get_scheduler
+from inference.speech_tiers import get_speech_router
+from inference.text_cascade import get_text_cascade
+
+logger = logging.getLogger(__name__)
+
+PACKAGE = 'moodify.inference'
+SERVICE_NAME = f'{PACKAGE}.EmotionInference'
+
+# Large enough for a few seconds of uncompressed audio or a full-resolution photo
+MAX_MESSAGE_BYTES = 32 * 2 ** 20
+
+CHANNEL_OPTIONS = [
+    ('grpc.max_receive_message_length', MAX_MESSAGE_BYTES),
+    ('grpc.max_send_message_length', MAX_MESSAGE_BYTES),
+]
+
+
+class InvalidRequest(ValueError):
+    """A malformed request, answered with INVALID_ARGUMENT; any other error is INTERNAL."""
+
+
+@lru_cache(maxsize=1)
+def get_messages():
+    """Return {name: message class} for the messages in emotion_inference.proto."""
+    from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+
+    field = descriptor_pb2.FieldDescriptorProto
+    string, binary, double = field.TYPE_STRING, field.TYPE_BYTES, field.TYPE_DOUBLE
+    file_proto = descriptor_pb2.FileDescriptorProto(name='moodify/emotion_inference.proto', package=PACKAGE,
+                                                    syntax='proto3')
+
+    def add_message(name, fields, oneof=None):
+        message = file_proto.message_type.add(name=name)
+        if oneof:
+            message.oneof_decl.add(name=oneof[0])
+        for number, (field_name, field_type) in enumerate(fields, start=1):
+            added = message.field.add(name=field_name, number=number, type=field_type, label=field.LABEL_OPTIONAL)
+            if oneof and field_name in oneof[1]:
+                added.oneof_index = 0
+
+    add_message('TextRequest', [('text', string), ('priority', string)])
+    add_message('MediaRequest', [('data', binary), ('filename', string), ('priority', string)])
+    add_message('EmotionRequest', [('request_id', string), ('text', string), ('audio', binary), ('image', binary),
+                                   ('filename', string), ('priority', string)],
+                oneof=('payload', ('text', 'audio', 'image')))
+    add_message('EmotionReply', [('request_id', string), ('emotion', string), ('latency_ms', double),
+                                 ('error', string)])
+
+    pool = descriptor_pool.DescriptorPool()
+    pool.AddSerializedFile(file_proto.SerializeToString())
+    return {
+        message.name: message_factory.GetMessageClass(pool.FindMessageTypeByName(f'{PACKAGE}.{message.name}'))
+        for message in file_proto.message_type
+    }
+
+
+class EmotionInferenceServicer:
+    """Implements the EmotionInference service on top of the shared inference components."""
+
+    def __init__(self, infer_text, infer_speech, infer_facial):
+        """
+        :param infer_text: The transformer text model (escalation target of the cascade).
+        :param infer_speech: The wav2vec2 speech model (heavy tier of the router).
+        :param infer_facial: The facial emotion model, called with an image path.
+        """
+        self.infer_text = infer_text
+        self.infer_speech = infer_speech
+        self.infer_facial = infer_facial
+        self.messages = get_messages()
+        self.temp_dir = os.path.join(settings.MEDIA_ROOT, 'temp')
+        os.makedirs(self.temp_dir, exist_ok=True)
+
+    # Pipelines; each runs entirely on a scheduler worker
+
+    def _text(self, text):
+        if not text:
+            raise InvalidRequest("Empty text")
+        if len(text.split()) >= settings.LONG_TEXT_MIN_WORDS:
+            return get_long_text_emotion().analyze(text)['emotion']
+        return get_text_cascade().predict(text, self.infer_text)
+
+    def _audio(self, data, filename):
+        if not data:
+            raise InvalidRequest("Empty audio payload")
+        suffix = os.path.splitext(filename)[1] or '.bin'
+        pool = get_transcoder_pool()
+        if pool and data[:4] != b'RIFF' and needs_transcode(filename, None):
+            try:
+                data, suffix = pool.transcode_to_wav(data), '.wav'
+            except TranscodeError as e:
+                logger.warning(f"Transcoding failed, decoding in-process: {str(e)}")
+        path = self._write_temp(data, suffix)
+        try:
+            return get_speech_router().predict(path, self.infer_speech)
+        finally:
+            os.remove(path)
+
+    def _image(self, data, filename):
+        if not data:
+            raise InvalidRequest("Empty image payload")
+        path = self._write_temp(data, os.path.splitext(filename)[1] or '.jpg')
+        face_path, face_detection = None, None
+        try:
+            detector = get_face_detector()
+            if detector:
+                try:
+                    face_path, face_detection = detector.crop_to_face(path)
+                except Exception as e:
+                    logger.warning(f"Face detection failed, using the full image: {str(e)}")
+            if found_no_face(face_detection):
+                return NO_FACE_EMOTION
+            return self.infer_facial(face_path or path) or 'neutral'
+        finally:
+            for temp_path in (path, face_path):
+                if temp_path and os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+    def _write_temp(self, data, suffix):
+        handle, path = tempfile.mkstemp(suffix=suffix, prefix='grpc_', dir=self.temp_dir)
+        with os.fdopen(handle, 'wb') as destination:
+            destination.write(data)
+        return path
+
+    def _submit(self, kind, payload, filename, priority):
+        priority = priority or 'interactive'
+        if priority not in PRIORITIES:
+            raise InvalidRequest(f"Unknown priority '{priority}'; expected one of {', '.join(PRIORITIES)}")
+        metrics.increment(f'grpc.{kind}.requests')
+        if kind == 'text':
+            return get_scheduler().submit(self._text, payload, priority=priority)
+        pipeline = self._audio if kind == 'audio' else self._image
+        return get_scheduler().submit(pipeline, payload, filename, priority=priority)
+
+    def _reply(self, request_id, future, started):
+        reply = self.messages['EmotionReply'](request_id=request_id)
+        try:
+            reply.emotion = str(future.result())
+        except Exception as e:
+            reply.error = str(e)
+        reply.latency_ms = (time.perf_counter() - started) * 1000
+        return reply
+
+    # RPC handlers
+
+    def _unary(self, kind, payload, filename, priority, context):
+        import grpc
+
+        started = time.perf_counter()
+        try:
+            future = self._submit(kind, payload, filename, priority)
+            reply = self.messages['EmotionReply'](emotion=str(future.result()))
+        except InvalidRequest as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        except Exception as e:
+            logger.error(f"gRPC {kind} inference failed: {str(e)}", exc_info=True)
+            context.abort(grpc.StatusCode.INTERNAL, str(e))
+        reply.latency_ms = (time.perf_counter() - started) * 1000
+        metrics.observe(f'grpc.{kind}.latency_ms', reply.latency_ms)
+        return reply
+
+    def detect_text(self, request, context):
+        return self._unary('text', request.text, '', request.priority, context)
+
+    def detect_audio(self, request, context):
+        return self._unary('audio', request.data, request.filename, request.priority, context)
+
+    def detect_image(self, request, context):
+        return self._unary('image', request.data, request.filename, request.priority, context)
+
+    def stream_detect(self, request_iterator, context):
+        """
+        Pipelined detection: every request is scheduled as soon as it arrives and
+        replies are sent in completion order. A failing request gets a reply with
+        error set; the stream continues.
+        """
+        events = queue.Queue()
+
+        def submit_all():
+            try:
+                for request in request_iterator:
+                    started = time.perf_counter()
+                    kind = request.WhichOneof('payload')
+                    try:
+                        if kind is None:
+                            raise InvalidRequest("Request has no payload")
+                        future = self._submit(kind, getattr(request, kind), request.filename, request.priority)
+                    except InvalidRequest as e:
+                        events.put(('rejected', self.messages['EmotionReply'](request_id=request.request_id,
+                                                                               error=str(e))))
+                        continue
+                    # Counted before the callback can fire, so the outstanding count never goes negative
+                    events.put(('scheduled', None))
+                    future.add_done_callback(
+                        lambda done, request_id=request.request_id, started=started:
+                            events.put(('done', self._reply(request_id, done, started)))
+                    )
+            finally:
+                events.put(('finished', None))
+
+        threading.Thread(target=submit_all, name='grpc-stream-reader', daemon=True).start()
+        outstanding, reading = 0, True
+        while reading or outstanding:
+            event, reply = events.get()
+            if event == 'finished':
+                reading = False
+            elif event == 'scheduled':
+                outstanding += 1
+            else:
+                if event == 'done':
+                    outstanding -= 1
+                yield reply
+
+
+def create_server(servicer, address, max_workers=16):
+    """
+    Build a gRPC server for servicer bound to address.
+
+    :return: (server, bound port); call server.start().
+    """
+    import grpc
+
+    messages = servicer.messages
+    reply = messages['EmotionReply'].SerializeToString
+
+    def unary(handler, request_name):
+        return grpc.unary_unary_rpc_method_handler(
+            handler, request_deserializer=messages[request_name].FromString, response_serializer=reply)
+
+    handlers = {
+        'DetectText': unary(servicer.detect_text, 'TextRequest'),
+        'DetectAudio': unary(servicer.detect_audio, 'MediaRequest'),
+        'DetectImage': unary(servicer.detect_image, 'MediaRequest'),
+        'StreamDetect': grpc.stream_stream_rpc_method_handler(
+            servicer.stream_detect, request_deserializer=messages['EmotionRequest'].FromString,
+            response_serializer=reply),
+    }
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=max_workers), options=CHANNEL_OPTIONS)
+    server.add_generic_rpc_handlers((grpc.method_handlers_generic_handler(SERVICE_NAME, handlers),))
+    port = server.add_insecure_port(address)
+    return server, port
+
+
+class EmotionInferenceClient:
+    """Minimal Python client for the EmotionInference service."""
+
+    def __init__(self, target):
+        import grpc
+
+        messages = get_messages()
+        self.messages = messages
+        self.channel = grpc.insecure_channel(target, options=CHANNEL_OPTIONS)
+        reply = messages['EmotionReply'].FromString
+
+        def unary(method, request_name):
+            return self.channel.unary_unary(f'/{SERVICE_NAME}/{method}',
+                                            request_serializer=messages[request_name].SerializeToString,
+                                            response_deserializer=reply)
+
+        self._text = unary('DetectText', 'TextRequest')
+        self._audio = unary('DetectAudio', 'MediaRequest')
+        self._image = unary('DetectImage', 'MediaRequest')
+        self._stream = self.channel.stream_stream(f'/{SERVICE_NAME}/StreamDetect',
+                                                  request_serializer=messages['EmotionRequest'].SerializeToString,
+                                                  response_deserializer=reply)
+
+    def detect_text(self, text, priority='', timeout=None):
+        return self._text(self.messages['TextRequest'](text=text, priority=priority), timeout=timeout)
+
+    def detect_audio(self, data, filename='', priority='', timeout=None):
+        return self._audio(self.messages['MediaRequest'](data=data, filename=filename, priority=priority),
+                           timeout=timeout)
+
+    def detect_image(self, data, filename='', priority='', timeout=None):
+        return self._image(self.messages['MediaRequest'](data=data, filename=filename, priority=priority),
+                           timeout=timeout)
+
+    def stream(self, requests):
+        """
+        :param requests: Iterable of dicts with request_id, one of text/audio/image and
+                         optionally filename and priority.
+        :return: Iterator of replies in completion order.
+        """
+        return self._stream(self.messages['EmotionRequest'](**request) for request in requests)
+
+    def close(self):
+        self.channel.close()
@@ -0,0 +1,313 @@
+"""
+Offline load-testing harness for the API.
+
+Drives a weighted mix of register/login, emotion and profile calls through the
+full Django request stack (middleware, DRF, JWT auth, views) at a target request
+rate, with MongoDB, Redis and Spotify replaced by local stand-ins. Model inference
+is replaced by constant-time fakes as well, so the numbers isolate view-level
+overhead; use ``benchmark_inference`` for the models themselves.
+
+Requests are issued open-loop: each one has a scheduled send time and its latency
+is measured from that time, so a saturated server shows up as growing latency
+instead of a silently lower request rate.
+"""
+import io
+import logging
+import random
+import sys
+import threading
+import time
+import types
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+from django.test import Client
+
+from dal import UserDAO
+
+EMOTIONS = ['joy', 'sadness', 'anger', 'fear', 'love', 'surprise', 'neutral']
+
+DEFAULT_MIX = {
+    'register': 2,
+    'login': 8,
+    'text_emotion': 35,
+    'speech_emotion': 10,
+    'facial_emotion': 15,
+    'music_recommendation': 10,
+    'user_profile': 20,
+    # Not in the default traffic; opt in with --mix
+    'recommendation_feed': 0,
+    'mood_transition_playlist': 0,
+}
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class StandIns:
+    """
+    Fake inference and recommendation functions with configurable latency.
+
+    install() wires them into api.emotion_views, registering placeholder ai_ml
+    modules first when the real package is not importable.
+    """
+
+    def __init__(self, recommendation_latency_ms=50.0, inference_latency_ms=0.0, tracks_per_emotion=10):
+        self.recommendation_latency = recommendation_latency_ms / 1000
+        self.inference_latency = inference_latency_ms / 1000
+        self.tracks_per_emotion = tracks_per_emotion
+
+    def _infer(self, source):
+        if self.inference_latency:
+            time.sleep(self.inference_latency)
+        return EMOTIONS[hash(str(source)) % len(EMOTIONS)]
+
+    def get_music_recommendation(self, emotion, market=None):
+        if self.recommendation_latency:
+            time.sleep(self.recommendation_latency)
+        return [
+            {
+                'name': f'{emotion.title()} Track {i}',
+                'artist': f'Artist {i % 4}',
+                'preview_url': None,
+                'external_url': f'https://open.spotify.com/track/{emotion}{i:04d}',
+            }
+            for i in range(self.tracks_per_emotion)
+        ]
+
+    def install(self):
+        fakes = {
+            'infer_text_emotion': self._infer,
+            'infer_speech_emotion': self._infer,
+            'infer_facial_emotion': self._infer,
+            'get_music_recommendation': self.get_music_recommendation,
+        }
+        try:
+            import ai_ml  # noqa: F401
+        except ImportError:
+            _register_placeholder_modules(fakes)
+
+        from api import emotion_views
+        for name, function in fakes.items():
+            setattr(emotion_views, name, function)
+
+        # The views configure DEBUG logging on import; per-request debug output would dominate timings
+        logging.getLogger().setLevel(logging.WARNING)
+        return self
+
+
+def fake_audio_features(song_ids):
+    """Deterministic audio features for stand-in tracks; used as CATALOG_FEATURES_SOURCE."""
+    features = {}
+    for song_id in song_ids:
+        rng = random.Random(song_id)
+        features[song_id] = {'valence': rng.random(), 'energy': rng.random(), 'tempo': rng.uniform(60, 200),
+                             'danceability': rng.random()}
+    return features
+
+
+def _register_placeholder_modules(fakes):
+    modules = {
+        'ai_ml': {},
+        'ai_ml.src': {},
+        'ai_ml.src.models': {},
+        'ai_ml.src.models.text_emotion': {'infer_text_emotion': fakes['infer_text_emotion']},
+        'ai_ml.src.models.speech_emotion': {'infer_speech_emotion': fakes['infer_speech_emotion']},
+        'ai_ml.src.models.facial_emotion': {'infer_facial_emotion': fakes['infer_facial_emotion']},
+        'ai_ml.src.recommendation': {},
+        'ai_ml.src.recommendation.music_recommendation': {
+            'get_music_recommendation': fakes['get_music_recommendation'],
+        },
+    }
+    for name, attributes in modules.items():
+        module = types.ModuleType(name)
+        module.__dict__.update(attributes)
+        sys.modules.setdefault(name, module)
+
+
+def _make_wav(seconds=1.0, sample_rate=16000):
+    buffer = io.BytesIO()
+    samples = (np.sin(np.linspace(0, 440 * 2 * np.pi * seconds, int(sample_rate * seconds))) * 8000).astype('<i2')
+    with wave.open(buffer, 'wb') as handle:
+        handle.setnchannels(1)
+        handle.setsampwidth(2)
+        handle.setframerate(sample_rate)
+        handle.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+def _make_jpeg(size=256):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (size, size), (200, 170, 150)).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+class EndpointStats:
+    """Latency samples, histogram and error counts for one endpoint."""
+
+    def __init__(self):
+        self.latencies_ms = []
+        self.histogram = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+        self.statuses = {}
+        self.errors = 0
+
+    def record(self, latency_ms, status_code):
+        self.latencies_ms.append(latency_ms)
+        bucket = next((i for i, bound in enumerate(HISTOGRAM_BUCKETS_MS) if latency_ms <= bound),
+                      len(HISTOGRAM_BUCKETS_MS))
+        self.histogram[bucket] += 1
+        self.statuses[str(status_code)] = self.statuses.get(str(status_code), 0) + 1
+        if status_code is None or status_code >= 400:
+            self.errors += 1
+
+    def summary(self):
+        count = len(self.latencies_ms)
+        p50, p95, p99 = np.percentile(self.latencies_ms, [50, 95, 99]) if count else (0.0, 0.0, 0.0)
+        labels = [f'<={bound}ms' for bound in HISTOGRAM_BUCKETS_MS] + [f'>{HISTOGRAM_BUCKETS_MS[-1]}ms']
+        return {
+            'count': count,
+            'errors': self.errors,
+            'error_rate': round(self.errors / count, 4) if count else 0.0,
+            'mean_ms': round(float(np.mean(self.latencies_ms)), 3) if count else 0.0,
+            'p50_ms': round(float(p50), 3),
+            'p95_ms': round(float(p95), 3),
+            'p99_ms': round(float(p99), 3),
+            'max_ms': round(max(self.latencies_ms), 3) if count else 0.0,
+            'statuses': self.statuses,
+            'histogram': dict(zip(labels, self.histogram)),
+        }
+
+
+class LoadTestRunner:
+    """Runs a weighted request mix against the in-process app at a target rate."""
+
+    def __init__(self, rps=20.0, duration=30.0, mix=None, concurrency=16, users=20, seed=0):
+        self.rps = rps
+        self.duration = duration
+        self.mix = mix or DEFAULT_MIX
+        self.concurrency = concurrency
+        self.n_users = users
+        self.random = random.Random(seed)
+        self.users = []
+        self.stats = {name: EndpointStats() for name in self.mix}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.wav = _make_wav()
+        self.jpeg = _make_jpeg()
+        self.counter = 0
+
+    def _client(self):
+        if not hasattr(self.local, 'client'):
+            self.local.client = Client()
+        return self.local.client
+
+    def _next_username(self):
+        with self.lock:
+            self.counter += 1
+            return f'loadtest_{self.counter}_{self.random.randrange(10 ** 9)}'
+
+    def setup(self):
+        """Register and log in the pool of users that authenticated calls run as."""
+        for _ in range(self.n_users):
+            username = self._next_username()
+            self._register(username)
+            token = self._login(username).json().get('tokens', {}).get('access')
+            if not token:
+                raise RuntimeError(f"Could not log in load-test user {username}")
+            # Playlists are stored against the DAL user of the same name; seeded names repeat across runs
+            users = UserDAO()
+            if not users.get_by_username(username):
+                users.insert({'username': username, 'email': f'{username}@example.com', 'password_hash': '',
+                              'created_at': datetime.utcnow()})
+            self.users.append({'username': username, 'token': token})
+
+    def _register(self, username):
+        return self._client().post('/users/register/', {
+            'username': username, 'password': 'loadtest-password', 'email': f'{username}@example.com',
+        }, content_type='application/json')
+
+    def _login(self, username):
+        return self._client().post('/users/login/', {
+            'username': username, 'password': 'loadtest-password',
+        }, content_type='application/json')
+
+    def _call(self, operation, user):
+        client = self._client()
+        auth = {'HTTP_AUTHORIZATION': f"Bearer {user['token']}"}
+        if operation == 'register':
+            return self._register(self._next_username())
+        if operation == 'login':
+            return self._login(user['username'])
+        if operation == 'text_emotion':
+            text = self.random.choice(['I feel great today', 'Everything is going wrong', 'Just a normal day'])
+            return client.post('/api/text_emotion/', {'text': text}, content_type='application/json', **auth)
+        if operation == 'speech_emotion':
+            upload = io.BytesIO(self.wav)
+            upload.name = 'clip.wav'
+            return client.post('/api/speech_emotion/', {'audio_file': upload}, **auth)
+        if operation == 'facial_emotion':
+            upload = io.BytesIO(self.jpeg)
+            upload.name = 'face.jpg'
+            return client.post('/api/facial_emotion/', {'image': upload}, **auth)
+        if operation == 'music_recommendation':
+            return client.post('/api/music_recommendation/', {'emotion': self.random.choice(EMOTIONS)},
+                               content_type='application/json', **auth)
+        if operation == 'recommendation_feed':
+            # Scroll: follow the user's last cursor, or start a new feed at the end of one
+            cursor = user.get('feed_cursor')
+            params = {'cursor': cursor} if cursor else {'emotion': self.random.choice(EMOTIONS)}
+            response = client.get('/api/recommendation_feed/', params, **auth)
+            user['feed_cursor'] = response.json().get('next_cursor') if response.status_code == 200 else None
+            return response
+        if operation == 'mood_transition_playlist':
+            from_emotion, to_emotion = self.random.sample(EMOTIONS, 2)
+            return client.post('/api/playlists/mood_transition/', {'from_emotion': from_emotion, 'to_emotion': to_emotion},
+                               content_type='application/json', **auth)
+        if operation == 'user_profile':
+            return client.get('/users/user/profile/', **auth)
+        raise ValueError(f"Unknown operation {operation}")
+
+    def _execute(self, operation, user, scheduled):
+        try:
+            status_code = self._call(operation, user).status_code
+        except Exception:
+            status_code = None
+        latency_ms = (time.perf_counter() - scheduled) * 1000
+        with self.lock:
+            self.stats[operation].record(latency_ms, status_code)
+
+    def run(self):
+        """
+        Issue requests at the target rate for the configured duration.
+
+        :return: Report dict with offered/achieved rate and per-endpoint summaries.
+        """
+        operations = list(self.mix)
+        weights = [self.mix[name] for name in operations]
+        total = int(self.rps * self.duration)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for i in range(total):
+                scheduled = started + i / self.rps
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                operation = self.random.choices(operations, weights)[0]
+                executor.submit(self._execute, operation, self.random.choice(self.users), scheduled)
+        elapsed = time.perf_counter() - started
+
+        completed = sum(len(stats.latencies_ms) for stats in self.stats.values())
+        errors = sum(stats.errors for stats in self.stats.values())
+        return {
+            'offered_rps': self.rps,
+            'achieved_rps': round(completed / elapsed, 2) if elapsed else 0.0,
+            'duration_s': round(elapsed, 2),
+            'requests': completed,
+            'error_rate': round(errors / completed, 4) if completed else 0.0,
+            'endpoints': {name: stats.summary() for name, stats in self.stats.items() if stats.latencies_ms},
+        }
@@ -0,0 +1,150 @@
+import contextlib
+import io
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from api.loadtest import EndpointStats, StandIns, _make_jpeg, _make_wav
+
+MODALITIES = ('text', 'audio', 'image')
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the REST emotion endpoints with the internal gRPC API (unary and streaming) "
+        "in-process against local stand-ins. REST timings include the recommendation lookup "
+        "and history writes the gRPC API skips. Run with --settings=backend.loadtest_settings."
+    )
+
+    # System checks import the URLconf, which must wait until the stand-ins are installed
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per modality and transport')
+        parser.add_argument('--inference-latency-ms', type=float, default=0.0,
+                            help='Latency of the fake emotion models')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        if not getattr(settings, 'USE_LOCAL_STANDINS', False):
+            raise CommandError("Refusing to benchmark live services; run with --settings=backend.loadtest_settings")
+        try:
+            import grpc  # noqa: F401
+        except ImportError:
+            raise CommandError("grpcio and protobuf are required: pip install grpcio protobuf")
+
+        call_command('migrate', verbosity=0, interactive=False)
+        call_command('flush', verbosity=0, interactive=False)
+        StandIns(recommendation_latency_ms=0, inference_latency_ms=options['inference_latency_ms']).install()
+
+        from api import emotion_views
+        from api.grpc_service import EmotionInferenceClient, EmotionInferenceServicer, create_server
+
+        servicer = EmotionInferenceServicer(emotion_views.infer_text_emotion, emotion_views.infer_speech_emotion,
+                                            emotion_views.infer_facial_emotion)
+        server, port = create_server(servicer, 'localhost:0')
+        server.start()
+        client = EmotionInferenceClient(f'localhost:{port}')
+        payloads = {'text': 'I feel great today', 'audio': _make_wav(), 'image': _make_jpeg()}
+        n = options['requests']
+
+        report = {}
+        try:
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                rest = _RestCaller()
+                unary = {
+                    'text': lambda: client.detect_text(payloads['text']),
+                    'audio': lambda: client.detect_audio(payloads['audio'], 'clip.wav'),
+                    'image': lambda: client.detect_image(payloads['image'], 'face.jpg'),
+                }
+                for modality in MODALITIES:
+                    report[f'rest.{modality}'] = _measure(lambda: rest.call(modality, payloads[modality]), n)
+                    report[f'grpc.{modality}'] = _measure(unary[modality], n)
+                    report[f'grpc_stream.{modality}'] = _measure_stream(client, modality, payloads[modality], n)
+        finally:
+            client.close()
+            server.stop(grace=None)
+
+        self._print_report(report)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as handle:
+                json.dump(report, handle, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Wrote benchmark report to {options['output']}"))
+
+    def _print_report(self, report):
+        self.stdout.write(f"{'case':<20}{'count':>7}{'err':>5}{'p50':>9}{'p95':>9}{'req/s':>10}")
+        for case, summary in report.items():
+            self.stdout.write(
+                f"{case:<20}{summary['count']:>7}{summary['errors']:>5}{summary['p50_ms']:>9.2f}"
+                f"{summary['p95_ms']:>9.2f}{summary['requests_per_s']:>10.1f}"
+            )
+
+
+class _RestCaller:
+    """Authenticated Django test client for the REST emotion endpoints."""
+
+    def __init__(self):
+        from django.test import Client
+
+        self.client = Client()
+        self.client.post('/users/register/', {
+            'username': 'grpc_benchmark', 'password': 'benchmark-password', 'email': 'grpc_benchmark@example.com',
+        }, content_type='application/json')
+        token = self.client.post('/users/login/', {
+            'username': 'grpc_benchmark', 'password': 'benchmark-password',
+        }, content_type='application/json').json().get('tokens', {}).get('access')
+        if not token:
+            raise CommandError("Could not log in the benchmark user")
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+
+    def call(self, modality, payload):
+        if modality == 'text':
+            response = self.client.post('/api/text_emotion/', {'text': payload}, content_type='application/json',
+                                        **self.auth)
+        else:
+            upload = io.BytesIO(payload)
+            upload.name = 'clip.wav' if modality == 'audio' else 'face.jpg'
+            field, path = ('audio_file', '/api/speech_emotion/') if modality == 'audio' else ('image', '/api/facial_emotion/')
+            response = self.client.post(path, {field: upload}, **self.auth)
+        if response.status_code >= 400:
+            raise RuntimeError(f"HTTP {response.status_code}")
+
+
+def _measure(call, n):
+    stats = EndpointStats()
+    started = time.perf_counter()
+    for _ in range(n):
+        call_started = time.perf_counter()
+        try:
+            call()
+            status_code = 200
+        except Exception:
+            status_code = None
+        stats.record((time.perf_counter() - call_started) * 1000, status_code)
+    return _summary(stats, time.perf_counter() - started)
+
+
+def _measure_stream(client, modality, payload, n):
+    """Send n requests on one stream; latency is the server-reported time per request."""
+    stats = EndpointStats()
+    started = time.perf_counter()
+    requests = ({'request_id': str(i), modality: payload, 'filename': 'clip.wav' if modality == 'audio' else ''}
+                for i in range(n))
+    for reply in client.stream(requests):
+        stats.record(reply.latency_ms, None if reply.error else 200)
+    return _summary(stats, time.perf_counter() - started)
+
+
+def _summary(stats, elapsed):
+    summary = stats.summary()
+    return {
+        'count': summary['count'],
+        'errors': summary['errors'],
+        'p50_ms': summary['p50_ms'],
+        'p95_ms': summary['p95_ms'],
+        'requests_per_s': round(summary['count'] / elapsed, 1) if elapsed else 0.0,
+    }
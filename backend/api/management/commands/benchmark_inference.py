@@ -0,0 +1,62 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inference.benchmark import TARGETS, compare_results, run_benchmarks, write_results
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the emotion models on synthetic and fixture inputs: cold vs warm "
+        "latency (p50/p95/p99), throughput per batch size and thread count, and peak "
+        "RSS. Optionally compare against a previous run to catch regressions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', action='append', choices=sorted(TARGETS),
+                            help='Targets to benchmark (repeatable, default: all)')
+        parser.add_argument('--threads', type=int, action='append',
+                            help='Thread counts to test (repeatable, default: 1)')
+        parser.add_argument('--batch-size', type=int, action='append',
+                            help='Batch sizes for throughput (repeatable, default: 1 and 8)')
+        parser.add_argument('--iterations', type=int, default=50, help='Measured warm calls per case')
+        parser.add_argument('--warmup', type=int, default=5, help='Unmeasured calls after the cold call')
+        parser.add_argument('--fixtures', help='Directory of real inputs to benchmark alongside synthetic ones')
+        parser.add_argument('--output', default='benchmark_results.json', help='Where to write the JSON report')
+        parser.add_argument('--compare', help='Previous JSON report to diff against')
+        parser.add_argument('--threshold', type=float, default=10.0,
+                            help='Percent change counted as a regression when comparing')
+
+    def handle(self, *args, **options):
+        report = run_benchmarks(
+            options['target'] or sorted(TARGETS),
+            threads=options['threads'] or [1],
+            batch_sizes=options['batch_size'] or [1, 8],
+            iterations=options['iterations'],
+            warmup=options['warmup'],
+            fixtures_dir=options['fixtures'],
+            on_result=self._print_result,
+        )
+        write_results(report, options['output'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote benchmark results to {options['output']}"))
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as handle:
+                baseline = json.load(handle)
+            rows = compare_results(baseline, report, options['threshold'])
+            regressions = [row for row in rows if row[5]]
+            for case, metric, old, new, change, regressed in rows:
+                line = f"{case} {metric}: {old} -> {new} ({change:+.1f}%)"
+                self.stdout.write(self.style.ERROR(line) if regressed else line)
+            if regressions:
+                raise CommandError(f"{len(regressions)} metrics regressed by more than {options['threshold']}%")
+
+    def _print_result(self, key, result):
+        if 'error' in result:
+            self.stdout.write(self.style.WARNING(f"{key}: failed ({result['error']})"))
+            return
+        self.stdout.write(
+            f"{key}: cold {result['cold_ms']:.0f} ms, p50 {result['p50_ms']:.1f} ms, "
+            f"p95 {result['p95_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms, "
+            f"throughput {result['throughput_per_s']}, peak RSS {result['peak_rss_mb']} MB"
+        )
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inference.compiled import MODELS, build_artifact
+
+
+class Command(BaseCommand):
+    help = (
+        "Trace and freeze the text and facial emotion models into versioned TorchScript "
+        "artifacts that serving loads instead of the eager models."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', choices=sorted(MODELS),
+                            help='Model to compile (repeatable; default: all)')
+        parser.add_argument('--force', action='store_true', help='Rebuild even if this version is already compiled')
+
+    def handle(self, *args, **options):
+        failed = []
+        for name in options['model'] or sorted(MODELS):
+            try:
+                directory, built = build_artifact(name, force=options['force'])
+            except Exception as e:
+                failed.append(name)
+                self.stderr.write(self.style.ERROR(f"{name}: {str(e)}"))
+                continue
+            status = 'compiled' if built else 'up to date'
+            self.stdout.write(self.style.SUCCESS(f"{name}: {status} at {directory}"))
+
+        if failed:
+            raise CommandError(f"Failed to compile: {', '.join(failed)}")
@@ -0,0 +1,48 @@
+import os
+
+import joblib
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from inference.batch_scoring import iter_manifest
+from inference.text_cascade import distill_student, student_path
+
+
+class Command(BaseCommand):
+    help = (
+        "Distill the fast first stage of the text emotion cascade from the transformer's "
+        "own predictions and report held-out agreement and escalation rate."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='A .txt file with one text per line, or a .csv/.jsonl manifest with a text column')
+        parser.add_argument('--threshold', type=float, default=getattr(settings, 'TEXT_CASCADE_THRESHOLD', 0.9),
+                            help='Confidence threshold to evaluate')
+        parser.add_argument('--holdout', type=float, default=0.2, help='Fraction of texts held out for evaluation')
+        parser.add_argument('--output', default=None, help='Where to save the student (default: the serving path)')
+
+    def handle(self, *args, **options):
+        from ai_ml.src.models.text_emotion import infer_text_emotion
+
+        source = options['input']
+        if source.endswith('.txt'):
+            with open(source, encoding='utf-8') as handle:
+                texts = [line.strip() for line in handle if line.strip()]
+        elif source.endswith(('.csv', '.jsonl')):
+            texts = [item['text'] for item in iter_manifest(source) if item.get('text')]
+        else:
+            raise CommandError("Input must be a .txt file or a .csv/.jsonl manifest")
+        if len(texts) < 10:
+            raise CommandError("Need at least 10 texts to distill a student")
+
+        self.stdout.write(f"Labelling {len(texts)} texts with the transformer...")
+        student, report = distill_student(texts, infer_text_emotion, holdout=options['holdout'],
+                                          threshold=options['threshold'])
+
+        output = options['output'] or student_path()
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        joblib.dump(student, output)
+
+        for key, value in report.items():
+            self.stdout.write(f"  {key}: {value}")
+        self.stdout.write(self.style.SUCCESS(f"Saved cascade student to {output}"))
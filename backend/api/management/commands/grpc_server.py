@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve the internal EmotionInference gRPC API (see api/protos/emotion_inference.proto) "
+        "for service-to-service callers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--address', default=getattr(settings, 'GRPC_ADDRESS', '[::]:50051'),
+                            help='Address to listen on')
+        parser.add_argument('--workers', type=int, default=getattr(settings, 'GRPC_WORKERS', 16),
+                            help='Threads handling RPCs; inference itself runs on the scheduler workers')
+
+    def handle(self, *args, **options):
+        try:
+            import grpc  # noqa: F401
+        except ImportError:
+            raise CommandError("grpcio and protobuf are required: pip install grpcio protobuf")
+
+        # Same model entry points as the REST views; this process loads its own copy of the models
+        from api import emotion_views
+        from api.grpc_service import EmotionInferenceServicer, create_server
+
+        servicer = EmotionInferenceServicer(emotion_views.infer_text_emotion, emotion_views.infer_speech_emotion,
+                                            emotion_views.infer_facial_emotion)
+        server, port = create_server(servicer, options['address'], max_workers=options['workers'])
+        if not port:
+            raise CommandError(f"Could not bind {options['address']}")
+        server.start()
+        self.stdout.write(self.style.SUCCESS(f"EmotionInference listening on {options['address']} (port {port})"))
+        try:
+            server.wait_for_termination()
+        except KeyboardInterrupt:
+            server.stop(grace=5).wait()
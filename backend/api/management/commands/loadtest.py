@@ -0,0 +1,74 @@
+import contextlib
+import json
+import os
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from api.loadtest import DEFAULT_MIX, LoadTestRunner, StandIns
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the API in-process against local stand-ins (mongomock, local-memory "
+        "cache, fake models and recommendations). Run with "
+        "--settings=backend.loadtest_settings."
+    )
+
+    # System checks import the URLconf, which must wait until the stand-ins are installed
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rps', type=float, default=20.0, help='Target requests per second')
+        parser.add_argument('--duration', type=float, default=30.0, help='Test duration in seconds')
+        parser.add_argument('--concurrency', type=int, default=16, help='Worker threads issuing requests')
+        parser.add_argument('--users', type=int, default=20, help='Pre-registered users to spread calls across')
+        parser.add_argument('--recommendation-latency-ms', type=float, default=50.0,
+                            help='Latency of the fake recommendation provider')
+        parser.add_argument('--inference-latency-ms', type=float, default=0.0,
+                            help='Latency of the fake emotion models')
+        parser.add_argument('--mix', help="Request mix as JSON, e.g. '{\"text_emotion\": 3, \"login\": 1}'")
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the request mix')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        if not getattr(settings, 'USE_LOCAL_STANDINS', False):
+            raise CommandError("Refusing to load-test live services; run with --settings=backend.loadtest_settings")
+
+        mix = json.loads(options['mix']) if options['mix'] else DEFAULT_MIX
+        unknown = set(mix) - set(DEFAULT_MIX)
+        if unknown:
+            raise CommandError(f"Unknown operations in --mix: {', '.join(sorted(unknown))}")
+
+        call_command('migrate', verbosity=0, interactive=False)
+        call_command('flush', verbosity=0, interactive=False)
+        StandIns(options['recommendation_latency_ms'], options['inference_latency_ms']).install()
+
+        runner = LoadTestRunner(rps=options['rps'], duration=options['duration'], mix=mix,
+                                concurrency=options['concurrency'], users=options['users'], seed=options['seed'])
+
+        # Views print debug lines on every request; keep them out of the report and the timings
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            runner.setup()
+            report = runner.run()
+
+        self._print_report(report)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as handle:
+                json.dump(report, handle, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Wrote load-test report to {options['output']}"))
+
+    def _print_report(self, report):
+        self.stdout.write(
+            f"Offered {report['offered_rps']} rps, achieved {report['achieved_rps']} rps over "
+            f"{report['duration_s']} s ({report['requests']} requests, error rate {report['error_rate']:.2%})"
+        )
+        self.stdout.write(f"{'endpoint':<22}{'count':>7}{'err%':>7}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+        for name, summary in sorted(report['endpoints'].items()):
+            self.stdout.write(
+                f"{name:<22}{summary['count']:>7}{summary['error_rate'] * 100:>6.1f}%"
+                f"{summary['p50_ms']:>9.1f}{summary['p95_ms']:>9.1f}{summary['p99_ms']:>9.1f}{summary['max_ms']:>9.1f}"
+            )
+            buckets = ', '.join(f"{label}: {count}" for label, count in summary['histogram'].items() if count)
+            self.stdout.write(f"{'':<22}{buckets}")
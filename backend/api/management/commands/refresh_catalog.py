@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recommendation.catalog import build_catalog
+
+
+class Command(BaseCommand):
+    help = (
+        "Refresh the local track catalog from Spotify for every configured mood and market. "
+        "Web workers refresh on their own when the catalog is older than CATALOG_REFRESH_INTERVAL; "
+        "run this to populate a new database or from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--if-stale', action='store_true',
+                            help='Only refresh when the last refresh is older than CATALOG_REFRESH_INTERVAL')
+
+    def handle(self, *args, **options):
+        catalog = build_catalog()
+        if options['if_stale'] and not catalog.is_stale():
+            self.stdout.write("Catalog is fresh; nothing to do")
+            return
+
+        total = catalog.refresh()
+        if not total:
+            raise CommandError("Catalog is empty after refresh; check the Spotify credentials and logs")
+        for key, count in catalog.stats()['tracks'].items():
+            self.stdout.write(f"{key}: {count} tracks")
+        self.stdout.write(self.style.SUCCESS(f"Catalog holds {total} tracks"))
@@ -0,0 +1,78 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inference.batch_scoring import (
+    MODALITIES, iter_directory, iter_manifest, make_writer, run_scoring,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Score a directory or a CSV/JSONL manifest with the text, speech and facial "
+        "emotion models and stream the results to JSONL or Parquet. Re-running with "
+        "the same output resumes an interrupted run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Directory to scan, or a .csv/.jsonl manifest')
+        parser.add_argument('--output', required=True,
+                            help='Output .jsonl file, or a .parquet directory of part files')
+        parser.add_argument('--format', choices=['jsonl', 'parquet'],
+                            help='Output format (default: inferred from --output)')
+        parser.add_argument('--modality', action='append', choices=MODALITIES,
+                            help='Only score these modalities (repeatable)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Number of worker processes (0 scores in-process at batch priority), '
+                                 'or of concurrent streams with --grpc')
+        parser.add_argument('--batch-size', type=int, default=32,
+                            help='Items per single-modality batch sent to a worker')
+        parser.add_argument('--speech-model', choices=['default', 'classical'], default='default',
+                            help="'classical' scores speech in batches with the scikit-learn model")
+        parser.add_argument('--grpc', metavar='ADDRESS',
+                            help="Score on the gRPC inference server at ADDRESS at batch priority, sharing its "
+                                 "loaded models and yielding to its live requests")
+
+    def handle(self, *args, **options):
+        source = options['input']
+        if os.path.isdir(source):
+            items = list(iter_directory(source))
+        elif os.path.isfile(source) and source.endswith(('.csv', '.jsonl')):
+            items = list(iter_manifest(source))
+        else:
+            raise CommandError(f"{source} is neither a directory nor a .csv/.jsonl manifest")
+
+        if options['modality']:
+            items = [item for item in items if item['modality'] in options['modality']]
+        if not items:
+            raise CommandError("No supported inputs found")
+
+        client = None
+        if options['grpc']:
+            if options['speech_model'] != 'default':
+                raise CommandError("--speech-model only applies to local scoring; the server picks its speech tier")
+            try:
+                from api.grpc_service import EmotionInferenceClient
+                client = EmotionInferenceClient(options['grpc'])
+            except ImportError:
+                raise CommandError("grpcio and protobuf are required: pip install grpcio protobuf")
+
+        writer = make_writer(options['output'], options['format'])
+        target = f"the gRPC server at {options['grpc']}" if client else f"{options['workers']} workers"
+        self.stdout.write(f"Scoring {len(items)} items with {target}")
+
+        progress = run_scoring(
+            items,
+            writer,
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            speech_model=options['speech_model'],
+            on_progress=lambda p: self.stdout.write(f"\r{p}", ending=''),
+            client=client,
+        )
+        if client:
+            client.close()
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f"Scored {progress.done} items ({progress.errors} errors) into {options['output']}"
+        ))
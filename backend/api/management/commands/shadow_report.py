@@ -0,0 +1,40 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from inference.shadow import read_log, summarize
+
+
+class Command(BaseCommand):
+    help = "Summarize shadow evaluation: agreement with the live model and latency delta per candidate."
+
+    # Only reads the log; no need to import the URLconf and the models behind it
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=None, help='Shadow log to read (default: SHADOW_LOG_PATH)')
+        parser.add_argument('--hours', type=float, default=None, help='Only include the last N hours')
+
+    def handle(self, *args, **options):
+        path = options['log'] or settings.SHADOW_LOG_PATH
+        if not os.path.exists(path):
+            raise CommandError(f"No shadow log at {path}")
+
+        since = time.time() - options['hours'] * 3600 if options['hours'] else None
+        summaries = summarize(read_log(path, since))
+        if not summaries:
+            self.stdout.write("No shadow comparisons recorded")
+            return
+
+        self.stdout.write(f"{'modality':<9}{'candidate':<40}{'n':>7}{'agree':>8}{'err%':>7}"
+                          f"{'live p50':>10}{'cand p50':>10}{'cand p95':>10}{'delta':>9}")
+        for summary in summaries:
+            agreement = f"{summary['agreement']:.1%}" if summary['agreement'] is not None else '-'
+            self.stdout.write(
+                f"{summary['modality']:<9}{summary['candidate'][-39:]:<40}{summary['samples']:>7}{agreement:>8}"
+                f"{summary['error_rate'] * 100:>6.1f}%"
+                f"{summary.get('live_p50_ms', 0):>10.1f}{summary.get('candidate_p50_ms', 0):>10.1f}"
+                f"{summary.get('candidate_p95_ms', 0):>10.1f}{summary.get('p50_delta_ms', 0):>+9.1f}"
+            )
@@ -1,9 +1,15 @@
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase, APIClient
+from django.test import SimpleTestCase, override_settings
 from unittest.mock import patch
+import importlib.util
 import tempfile
 import os
+import unittest
+from types import SimpleNamespace
+
+from .loadtest import EndpointStats
 
 
 class EmotionAPITestCase(APITestCase):
@@ -104,3 +110,116 @@ class EmotionAPITestCase(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response.data['error'], 'No emotion provided')
+
+
+class LoadTestStatsTestCase(SimpleTestCase):
+    # Test that latencies land in the right histogram buckets and errors are counted
+    def test_endpoint_stats_summary(self):
+        stats = EndpointStats()
+        for latency_ms, status_code in [(0.5, 200), (7.0, 200), (7.5, 500), (9000.0, None)]:
+            stats.record(latency_ms, status_code)
+        summary = stats.summary()
+
+        self.assertEqual(summary['count'], 4)
+        self.assertEqual(summary['errors'], 2)
+        self.assertEqual(summary['histogram']['<=1ms'], 1)
+        self.assertEqual(summary['histogram']['<=10ms'], 2)
+        self.assertEqual(summary['histogram']['>5000ms'], 1)
+
+
+@unittest.skipUnless(importlib.util.find_spec('mongomock'), 'mongomock is not installed')
+@override_settings(PERSONALIZATION_FEATURE_WEIGHT=1.0, PERSONALIZATION_ARTIST_WEIGHT=1.0)
+class ListeningTasteTestCase(APITestCase):
+    def setUp(self):
+        import mongomock
+        from django.contrib.auth.models import User
+        from mongoengine import connect, disconnect
+        from recommendation.vector_space import FeatureSpace
+        from users.models import UserProfile
+
+        # Profiles go to an in-process database for the length of the test
+        connect(db='listening_test', alias='listening_test', host='mongodb://localhost',
+                mongo_client_class=mongomock.MongoClient)
+        self.addCleanup(disconnect, 'listening_test')
+        self.addCleanup(self.use_profile_alias, UserProfile, UserProfile._meta['db_alias'])
+        self.use_profile_alias(UserProfile, 'listening_test')
+        UserProfile(username='listener').save()
+
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(username='listener', password='secret'))
+
+        songs = [{'song_id': song_id, 'valence': value, 'energy': value, 'tempo': 120.0, 'danceability': 0.5,
+                  'artist': artist, 'market': 'US'}
+                 for song_id, value, artist in (('calm', 0.2, 'Quiet'), ('mid', 0.5, 'Middle'), ('loud', 0.9, 'Fav'))]
+        catalog = SimpleNamespace(space=FeatureSpace(songs))
+        self.pool = [{'name': song_id, 'artist': artist, 'preview_url': None,
+                      'external_url': f'https://open.spotify.com/track/{song_id}'}
+                     for song_id, artist in (('calm', 'Quiet'), ('mid', 'Middle'), ('loud', 'Fav'))]
+        chain = SimpleNamespace(recommend=lambda *args, **kwargs: list(self.pool))
+        for target, value in (('recommendation.catalog.get_catalog', lambda: catalog),
+                              ('api.emotion_views.get_catalog', lambda: catalog),
+                              ('api.emotion_views.get_recommendation_chain', lambda: chain)):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def use_profile_alias(document, alias):
+        document._meta['db_alias'] = alias
+        document._collection = None
+
+    # Test that a recorded listen updates the taste profile and re-ranks the user's next pool
+    def test_listen_reranks_pool(self):
+        from .emotion_views import candidate_pool
+
+        def ranked():
+            return [track['name'] for track in candidate_pool('joy', username='listener')]
+
+        self.assertEqual(ranked(), ['calm', 'mid', 'loud'])
+
+        url = reverse('user_listening_history', args=['listener'])
+        self.assertEqual(self.client.post(url, {}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url, {'track_id': 'loud', 'track_name': 'Loud', 'artist': 'Fav'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(ranked(), ['loud', 'calm', 'mid'])
+        history = self.client.get(url).data['listening_history']
+        self.assertEqual([entry['track_id'] for entry in history], ['loud'])
+
+
+@unittest.skipUnless(importlib.util.find_spec('grpc'), 'grpcio is not installed')
+class GrpcInferenceTestCase(SimpleTestCase):
+    def setUp(self):
+        from .grpc_service import EmotionInferenceClient, EmotionInferenceServicer, create_server
+
+        servicer = EmotionInferenceServicer(lambda text: 'happy', lambda path: 'calm', lambda path: 'sad')
+        self.server, port = create_server(servicer, 'localhost:0', max_workers=4)
+        self.server.start()
+        self.client = EmotionInferenceClient(f'localhost:{port}')
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop(grace=None)
+
+    # Test that unary calls return the emotion and invalid input maps to INVALID_ARGUMENT
+    def test_detect_text(self):
+        import grpc
+
+        self.assertEqual(self.client.detect_text('I am feeling great').emotion, 'happy')
+        with self.assertRaises(grpc.RpcError) as raised:
+            self.client.detect_text('')
+        self.assertEqual(raised.exception.code(), grpc.StatusCode.INVALID_ARGUMENT)
+
+    # Test that every streamed request gets exactly one reply, including rejected ones
+    def test_stream_detect(self):
+        replies = list(self.client.stream([
+            {'request_id': '1', 'text': 'I am feeling great'},
+            {'request_id': '2', 'text': 'Still great', 'priority': 'urgent'},
+            {'request_id': '3', 'text': 'And again', 'priority': 'batch'},
+        ]))
+
+        by_id = {reply.request_id: reply for reply in replies}
+        self.assertEqual(len(replies), 3)
+        self.assertEqual(by_id['1'].emotion, 'happy')
+        self.assertIn('Unknown priority', by_id['2'].error)
+        self.assertEqual(by_id['3'].emotion, 'happy')
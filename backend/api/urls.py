@@ -1,5 +1,6 @@
 from django.urls import path
-from .emotion_views import text_emotion, speech_emotion, facial_emotion, music_recommendation
+from .emotion_views import (text_emotion, speech_emotion, facial_emotion, facial_emotion_burst, music_recommendation,
+                            recommendation_feed, mood_transition_playlist, inference_metrics)
 from .user_views import register, login
 
 urlpatterns = [
@@ -11,5 +12,11 @@ urlpatterns = [
     path('text_emotion/', text_emotion, name='text_emotion'),
     path('speech_emotion/', speech_emotion, name='speech_emotion'),
     path('facial_emotion/', facial_emotion, name='facial_emotion'),
+    path('facial_emotion/burst/', facial_emotion_burst, name='facial_emotion_burst'),
     path('music_recommendation/', music_recommendation, name='music_recommendation'),
+    path('recommendation_feed/', recommendation_feed, name='recommendation_feed'),
+    path('playlists/mood_transition/', mood_transition_playlist, name='mood_transition_playlist'),
+
+    # Monitoring endpoints
+    path('inference_metrics/', inference_metrics, name='inference_metrics'),
 ]
@@ -454,6 +454,7 @@ def save_recommendations(request, user_id):
             return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
 
         user_profile.recommendations.extend(recommendations)
+        user_profile.remember_recommended(rec.get('track_id') for rec in recommendations if isinstance(rec, dict))
         user_profile.save()
 
         return Response({"message": "Recommendations saved successfully"}, status=status.HTTP_201_CREATED)
@@ -521,7 +522,7 @@ def delete_all_recommendations(request, user_id):
             return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
 
         # Explicitly set recommendations to an empty list
-        user_profile.recommendations = []
+        user_profile.clear_recommendations()
         user_profile.save()
 
         return Response({"message": "All recommendations deleted"}, status=status.HTTP_200_OK)
@@ -572,7 +573,9 @@ def user_recommendations(request, user_id):
         data = json.loads(request.body)
         try:
             user_profile = UserProfile.objects.get(id=user_id)
-            user_profile.recommendations.extend(data.get('recommendations', []))
+            recommendations = data.get('recommendations', [])
+            user_profile.recommendations.extend(recommendations)
+            user_profile.remember_recommended(rec.get('track_id') for rec in recommendations if isinstance(rec, dict))
             user_profile.save()
             return Response({"message": "Recommendations saved successfully."}, status=status.HTTP_201_CREATED)
         except DoesNotExist:
@@ -588,7 +591,7 @@ def user_recommendations(request, user_id):
     elif request.method == 'DELETE':
         try:
             user_profile = UserProfile.objects.get(id=user_id)
-            user_profile.recommendations.clear()  # Clear all recommendations
+            user_profile.clear_recommendations()  # Clear all recommendations
             user_profile.save()
             return Response({"message": "All recommendations deleted."}, status=status.HTTP_204_NO_CONTENT)
         except DoesNotExist:
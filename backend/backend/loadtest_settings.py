@@ -0,0 +1,48 @@
+"""
+Settings for running the app offline against local stand-ins.
+
+Used by the ``loadtest`` management command:
+
+    python manage.py loadtest --settings=backend.loadtest_settings
+
+MongoDB is replaced by an in-process mongomock database, Redis by the local-memory
+cache, and Django's auth tables live in a throwaway SQLite file so load tests never
+touch real data.
+"""
+import os
+import tempfile
+
+LOADTEST_DIR = os.path.join(tempfile.gettempdir(), 'moodify_loadtest')
+os.makedirs(LOADTEST_DIR, exist_ok=True)
+
+os.environ.setdefault('USE_LOCAL_STANDINS', 'True')
+os.environ.setdefault('SECRET_KEY', 'loadtest-only-secret-key-not-for-production')
+# The DAL tables (history, catalog) go to a throwaway file too
+os.environ.setdefault('DAL_DB_PATH', os.path.join(LOADTEST_DIR, 'dal.sqlite3'))
+
+from .settings import *  # noqa: E402,F401,F403
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(LOADTEST_DIR, 'db.sqlite3'),
+        'OPTIONS': {'timeout': 30},
+    }
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+MEDIA_ROOT = os.path.join(LOADTEST_DIR, 'media')
+
+# A cheap hasher keeps register/login measurements about view overhead rather than PBKDF2
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# The catalog refreshes from the views' Spotify recommender, which StandIns replaces
+CATALOG_SOURCE = 'api.emotion_views.spotify_recommendations'
+
+# Stand-in tracks get deterministic audio features instead of Spotify's
+CATALOG_FEATURES_SOURCE = 'api.loadtest.fake_audio_features'
@@ -9,6 +9,7 @@ https://docs.djangoproject.com/en/5.0/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
+import json
 import os
 from datetime import timedelta, datetime
 from pathlib import Path
@@ -27,66 +28,80 @@ MONGODB_SETTINGS = {
     'tlsAllowInvalidCertificates': True
 }
 
+# Offline stand-ins for load testing (see backend/loadtest_settings.py): an in-process
+# mongomock database replaces the live MongoDB server
+USE_LOCAL_STANDINS = config('USE_LOCAL_STANDINS', default=False, cast=bool)
+
 # MongoDB connection is now handled with better error checking
 MONGODB_AVAILABLE = False
-try:
+if USE_LOCAL_STANDINS:
+    import mongomock
     from mongoengine import connect, disconnect
-    from pymongo.errors import ServerSelectionTimeoutError, ConnectionFailure
-    from pymongo import MongoClient
+
+    disconnect()
+    connect(db=MONGODB_SETTINGS['db'], alias='default', host='mongodb://localhost',
+            mongo_client_class=mongomock.MongoClient)
+    print("[MongoDB Debug] Using in-process mongomock stand-in")
+    MONGODB_AVAILABLE = True
+else:
+    try:
+        from mongoengine import connect, disconnect
+        from pymongo.errors import ServerSelectionTimeoutError, ConnectionFailure
+        from pymongo import MongoClient
     
-    print("[MongoDB Debug] Attempting to connect to MongoDB...")
+        print("[MongoDB Debug] Attempting to connect to MongoDB...")
     
-    # Disconnect any existing connections first
-    disconnect()
+        # Disconnect any existing connections first
+        disconnect()
     
-    # Connect using pymongo first to ensure database and collections exist
-    client = MongoClient(
-        MONGODB_SETTINGS['host'],
-        serverSelectionTimeoutMS=MONGODB_SETTINGS['serverSelectionTimeoutMS'],
-        connectTimeoutMS=MONGODB_SETTINGS['connectTimeoutMS'],
-        socketTimeoutMS=MONGODB_SETTINGS['socketTimeoutMS'],
-        maxPoolSize=MONGODB_SETTINGS['maxPoolSize'],
-        retryWrites=MONGODB_SETTINGS['retryWrites'],
-        tlsAllowInvalidCertificates=MONGODB_SETTINGS['tlsAllowInvalidCertificates']
-    )
+        # Connect using pymongo first to ensure database and collections exist
+        client = MongoClient(
+            MONGODB_SETTINGS['host'],
+            serverSelectionTimeoutMS=MONGODB_SETTINGS['serverSelectionTimeoutMS'],
+            connectTimeoutMS=MONGODB_SETTINGS['connectTimeoutMS'],
+            socketTimeoutMS=MONGODB_SETTINGS['socketTimeoutMS'],
+            maxPoolSize=MONGODB_SETTINGS['maxPoolSize'],
+            retryWrites=MONGODB_SETTINGS['retryWrites'],
+            tlsAllowInvalidCertificates=MONGODB_SETTINGS['tlsAllowInvalidCertificates']
+        )
     
-    # Test the connection
-    client.admin.command('ping')
-    print("[MongoDB Debug] Initial connection test successful")
+        # Test the connection
+        client.admin.command('ping')
+        print("[MongoDB Debug] Initial connection test successful")
     
-    mongodb = client[MONGODB_SETTINGS['db']]
+        mongodb = client[MONGODB_SETTINGS['db']]
     
-    # Initialize collections if they don't exist
-    if 'user_profiles' not in mongodb.list_collection_names():
-        mongodb.create_collection('user_profiles')
-        mongodb.user_profiles.create_index('username', unique=True)
-        print("[MongoDB Debug] Created user_profiles collection with indexes")
+        # Initialize collections if they don't exist
+        if 'user_profiles' not in mongodb.list_collection_names():
+            mongodb.create_collection('user_profiles')
+            mongodb.user_profiles.create_index('username', unique=True)
+            print("[MongoDB Debug] Created user_profiles collection with indexes")
     
-    # Connect using mongoengine
-    connection = connect(**MONGODB_SETTINGS)
+        # Connect using mongoengine
+        connection = connect(**MONGODB_SETTINGS)
     
-    # Verify the connection
-    connection.server_info()
-    print("[MongoDB Debug] MongoDB connected successfully")
+        # Verify the connection
+        connection.server_info()
+        print("[MongoDB Debug] MongoDB connected successfully")
     
-    # Get database reference and verify collections
-    db = connection.get_database(MONGODB_SETTINGS['db'])
-    collections = db.list_collection_names()
-    print(f"[MongoDB Debug] Available collections: {collections}")
+        # Get database reference and verify collections
+        db = connection.get_database(MONGODB_SETTINGS['db'])
+        collections = db.list_collection_names()
+        print(f"[MongoDB Debug] Available collections: {collections}")
     
-    MONGODB_AVAILABLE = True
-
-except (ServerSelectionTimeoutError, ConnectionFailure) as e:
-    print(f"[MongoDB Debug] Connection Error: {str(e)}")
-    print("[MongoDB Debug] Please check your MongoDB connection:")
-    print("1. Verify MONGO_DB_URI in your environment variables")
-    print("2. Check if MongoDB server is running")
-    print("3. Verify network connectivity")
-    print("4. Check MongoDB Atlas network access settings")
-    print("5. Verify IP whitelist settings")
-except Exception as e:
-    print(f"[MongoDB Debug] Unexpected error: {str(e)}")
-    print("Please check the MongoDB configuration and try again.")
+        MONGODB_AVAILABLE = True
+
+    except (ServerSelectionTimeoutError, ConnectionFailure) as e:
+        print(f"[MongoDB Debug] Connection Error: {str(e)}")
+        print("[MongoDB Debug] Please check your MongoDB connection:")
+        print("1. Verify MONGO_DB_URI in your environment variables")
+        print("2. Check if MongoDB server is running")
+        print("3. Verify network connectivity")
+        print("4. Check MongoDB Atlas network access settings")
+        print("5. Verify IP whitelist settings")
+    except Exception as e:
+        print(f"[MongoDB Debug] Unexpected error: {str(e)}")
+        print("Please check the MongoDB configuration and try again.")
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -118,6 +133,7 @@ INSTALLED_APPS = [
     'allauth.account',
     'allauth.socialaccount',
     'django.contrib.sites',
+    'api',
 ]
 
 SITE_ID = 1
@@ -297,5 +313,150 @@ STATICFILES_DIRS = [
 # Create static directory if it doesn't exist
 os.makedirs(os.path.join(BASE_DIR, 'static'), exist_ok=True)
 
+# Trained model artifacts (see download_models.py)
+AI_ML_MODELS_DIR = config('AI_ML_MODELS_DIR', default=os.path.join(BASE_DIR.parent, 'ai_ml', 'models'))
+
+# TorchScript artifacts built by `manage.py compile_models`, loaded in place of the eager models
+COMPILED_MODELS_DIR = config('COMPILED_MODELS_DIR', default=os.path.join(AI_ML_MODELS_DIR, 'compiled'))
+USE_COMPILED_MODELS = config('USE_COMPILED_MODELS', default=True, cast=bool)
+
+# Models loaded by the inference package share one LRU cache capped at MODEL_CACHE_MAX_MB;
+# models unused for MODEL_CACHE_IDLE_TTL seconds are evicted (0 keeps them loaded)
+MODEL_CACHE_MAX_MB = config('MODEL_CACHE_MAX_MB', default=3072, cast=int)
+MODEL_CACHE_IDLE_TTL = config('MODEL_CACHE_IDLE_TTL', default=1800, cast=int)
+# Weights (relative to AI_ML_MODELS_DIR) of the models ai_ml loads itself: the default text,
+# facial and wav2vec2 speech models. They are never evicted but count against MODEL_CACHE_MAX_MB.
+MODEL_CACHE_EXTERNAL_MODELS = config('MODEL_CACHE_EXTERNAL_MODELS',
+                                     default='text_emotion_model,facial_emotion_model,speech_emotion_model',
+                                     cast=lambda v: [path.strip() for path in v.split(',') if path.strip()])
+
+# Batch scoring caches speech features per audio content hash so re-scored clips are not recomputed;
+# live requests do not use this cache
+SPEECH_FEATURE_CACHE_DIR = config('SPEECH_FEATURE_CACHE_DIR', default=os.path.join(BASE_DIR, 'cache', 'speech_features'))
+
+# Text emotion cascade: the distilled first stage answers when its confidence clears the
+# threshold; a sampled fraction of its answers is re-checked against the transformer
+TEXT_CASCADE_THRESHOLD = config('TEXT_CASCADE_THRESHOLD', default=0.9, cast=float)
+TEXT_CASCADE_AUDIT_RATE = config('TEXT_CASCADE_AUDIT_RATE', default=0.02, cast=float)
+
+# Texts of at least LONG_TEXT_MIN_WORDS words are split into sentence segments of at most
+# LONG_TEXT_MAX_WORDS words and classified in length-bucketed batches
+LONG_TEXT_MIN_WORDS = config('LONG_TEXT_MIN_WORDS', default=128, cast=int)
+LONG_TEXT_MAX_WORDS = config('LONG_TEXT_MAX_WORDS', default=64, cast=int)
+LONG_TEXT_BATCH_SIZE = config('LONG_TEXT_BATCH_SIZE', default=16, cast=int)
+
+# Speech model tiers: 'fast' uses the scikit-learn model only, 'standard' escalates to
+# wav2vec2 below SPEECH_ESCALATION_CONFIDENCE, 'premium' always uses wav2vec2. Requests may
+# override the tier and set a latency budget; an empty budget means unlimited
+SPEECH_DEFAULT_TIER = config('SPEECH_DEFAULT_TIER', default='standard')
+SPEECH_ESCALATION_CONFIDENCE = config('SPEECH_ESCALATION_CONFIDENCE', default=0.6, cast=float)
+SPEECH_LATENCY_BUDGET_MS = config('SPEECH_LATENCY_BUDGET_MS', default='', cast=lambda v: float(v) if v else None)
+
+# Warm ffmpeg processes used to normalize compressed audio uploads; 0 disables the pool
+AUDIO_TRANSCODER_POOL_SIZE = config('AUDIO_TRANSCODER_POOL_SIZE', default=2, cast=int)
+AUDIO_TRANSCODE_TIMEOUT = config('AUDIO_TRANSCODE_TIMEOUT', default=30.0, cast=float)
+
+# Faces found by the Haar cascade below this confidence are re-checked with MTCNN
+FACE_DETECT_MIN_CONFIDENCE = config('FACE_DETECT_MIN_CONFIDENCE', default=0.8, cast=float)
+
+# Multi-image facial requests: frames per request and threads used to process them
+FACIAL_BURST_MAX_IMAGES = config('FACIAL_BURST_MAX_IMAGES', default=10, cast=int)
+FACIAL_BURST_WORKERS = config('FACIAL_BURST_WORKERS', default=4, cast=int)
+
+# Inference runs on INFERENCE_WORKERS threads per process. Interactive requests go first;
+# when batch work is also waiting, one in INFERENCE_BATCH_EVERY dispatches is batch work,
+# with at most INFERENCE_MAX_BATCH_RUNNING batch tasks running at once
+INFERENCE_WORKERS = config('INFERENCE_WORKERS', default=4, cast=int)
+INFERENCE_BATCH_EVERY = config('INFERENCE_BATCH_EVERY', default=4, cast=int)
+INFERENCE_MAX_BATCH_RUNNING = config('INFERENCE_MAX_BATCH_RUNNING', default=1, cast=int)
+
+# Shadow evaluation: SHADOW_SAMPLE_RATE of requests are replayed in the background against
+# candidate models, given as JSON {"text"|"speech"|"facial": "dotted.path.to.callable"}
+SHADOW_SAMPLE_RATE = config('SHADOW_SAMPLE_RATE', default=0.0, cast=float)
+SHADOW_CANDIDATES = config('SHADOW_CANDIDATES', default='{}', cast=json.loads)
+SHADOW_LOG_PATH = config('SHADOW_LOG_PATH', default=os.path.join(BASE_DIR, 'cache', 'shadow.jsonl'))
+SHADOW_MAX_PENDING = config('SHADOW_MAX_PENDING', default=16, cast=int)
+
+# Internal gRPC inference API (manage.py grpc_server); GRPC_WORKERS threads handle RPCs
+GRPC_ADDRESS = config('GRPC_ADDRESS', default='[::]:50051')
+GRPC_WORKERS = config('GRPC_WORKERS', default=16, cast=int)
+
+# Local track catalog: recommendations are served from the songs table, indexed by mood and
+# market; CATALOG_SOURCE (the Spotify-backed recommender) is only called to refresh it
+CATALOG_SOURCE = config('CATALOG_SOURCE',
+                        default='ai_ml.src.recommendation.music_recommendation.get_music_recommendation')
+CATALOG_MOODS = config('CATALOG_MOODS', default='joy,sadness,anger,fear,love,surprise,neutral',
+                       cast=lambda v: [mood.strip() for mood in v.split(',') if mood.strip()])
+CATALOG_MARKETS = config('CATALOG_MARKETS', default='US',
+                         cast=lambda v: [market.strip() for market in v.split(',') if market.strip()])
+CATALOG_REFRESH_INTERVAL = config('CATALOG_REFRESH_INTERVAL', default=6 * 3600, cast=int)
+CATALOG_MIN_TRACKS = config('CATALOG_MIN_TRACKS', default=10, cast=int)
+
+# Audio features (valence, energy, tempo, danceability) are fetched for new catalog tracks
+# from CATALOG_FEATURES_SOURCE (empty disables it). Recommendations are the tracks nearest to
+# the emotion's target point; EMOTION_FEATURE_TARGETS (JSON {emotion: [4 values in 0-1]})
+# overrides targets and FEATURE_WEIGHTS (JSON list of 4) weighs the distance
+CATALOG_FEATURES_SOURCE = config('CATALOG_FEATURES_SOURCE', default='recommendation.spotify.fetch_audio_features')
+EMOTION_FEATURE_TARGETS = config('EMOTION_FEATURE_TARGETS', default='{}', cast=json.loads)
+FEATURE_WEIGHTS = config('FEATURE_WEIGHTS', default='', cast=lambda v: json.loads(v) if v else None)
+
+# Spotify recommendations are cached per (emotion, market, strategy version): fresh for
+# RECOMMENDATION_CACHE_TTL seconds, then served stale for up to RECOMMENDATION_CACHE_STALE
+# more while one background refresh runs. Bump the version when ranking changes
+RECOMMENDATION_CACHE_ALIAS = config('RECOMMENDATION_CACHE_ALIAS', default='default')
+RECOMMENDATION_CACHE_TTL = config('RECOMMENDATION_CACHE_TTL', default=600, cast=int)
+RECOMMENDATION_CACHE_STALE = config('RECOMMENDATION_CACHE_STALE', default=3600, cast=int)
+RECOMMENDATION_STRATEGY_VERSION = config('RECOMMENDATION_STRATEGY_VERSION', default=1, cast=int)
+
+# Shared Spotify client: SPOTIFY_POOL_SIZE keep-alive connections, SPOTIFY_TIMEOUT seconds per
+# call, and a client-credentials token refreshed SPOTIFY_TOKEN_REFRESH_MARGIN seconds before expiry
+SPOTIFY_CLIENT_ID = config('SPOTIFY_CLIENT_ID', default='')
+SPOTIFY_CLIENT_SECRET = config('SPOTIFY_CLIENT_SECRET', default='')
+SPOTIFY_POOL_SIZE = config('SPOTIFY_POOL_SIZE', default=10, cast=int)
+SPOTIFY_TIMEOUT = config('SPOTIFY_TIMEOUT', default=5.0, cast=float)
+SPOTIFY_TOKEN_REFRESH_MARGIN = config('SPOTIFY_TOKEN_REFRESH_MARGIN', default=300, cast=int)
+
+# Recommendation providers, tried in order: the local catalog, Spotify behind the cache, then
+# whatever the cache still holds. Each has a deadline; after RECOMMENDATION_BREAKER_FAILURES
+# consecutive failures a provider is skipped for RECOMMENDATION_BREAKER_RESET seconds
+RECOMMENDATION_PROVIDERS = config('RECOMMENDATION_PROVIDERS', default='catalog,spotify,cache',
+                                  cast=lambda v: [name.strip() for name in v.split(',') if name.strip()])
+RECOMMENDATION_DEADLINES_MS = config('RECOMMENDATION_DEADLINES_MS',
+                                     default='{"catalog": 50, "spotify": 800, "cache": 50}', cast=json.loads)
+# Threads per provider; a provider whose threads are all busy fails fast. 0 runs it on the request
+# thread without a deadline, which only suits the in-memory catalog
+RECOMMENDATION_PROVIDER_WORKERS = config('RECOMMENDATION_PROVIDER_WORKERS',
+                                         default='{"catalog": 0, "spotify": 4, "cache": 2}', cast=json.loads)
+RECOMMENDATION_BREAKER_FAILURES = config('RECOMMENDATION_BREAKER_FAILURES', default=5, cast=int)
+RECOMMENDATION_BREAKER_RESET = config('RECOMMENDATION_BREAKER_RESET', default=30, cast=int)
+RECOMMENDATION_LIMIT = config('RECOMMENDATION_LIMIT', default=10, cast=int)
+# Candidates fetched for personalization and diversity re-ranking, which pick RECOMMENDATION_LIMIT of them
+RECOMMENDATION_POOL_SIZE = config('RECOMMENDATION_POOL_SIZE', default=30, cast=int)
+
+# Personalization: each user's taste (decayed audio-feature mean and top artists) is updated per
+# listening event and candidates are re-ranked against it
+PERSONALIZATION_FEATURE_WEIGHT = config('PERSONALIZATION_FEATURE_WEIGHT', default=0.5, cast=float)
+PERSONALIZATION_ARTIST_WEIGHT = config('PERSONALIZATION_ARTIST_WEIGHT', default=0.3, cast=float)
+PERSONALIZATION_DECAY = config('PERSONALIZATION_DECAY', default=0.05, cast=float)
+PERSONALIZATION_MAX_ARTISTS = config('PERSONALIZATION_MAX_ARTISTS', default=50, cast=int)
+
+# Per-user Bloom filter of recommended tracks; it is rebuilt at twice the size when it reaches capacity
+RECOMMENDATION_FILTER_CAPACITY = config('RECOMMENDATION_FILTER_CAPACITY', default=1000, cast=int)
+RECOMMENDATION_FILTER_ERROR_RATE = config('RECOMMENDATION_FILTER_ERROR_RATE', default=0.01, cast=float)
+
+# Maximal marginal relevance: penalty for similarity to tracks already picked (0 disables), and the
+# share of that similarity that comes from a shared artist rather than audio features
+RECOMMENDATION_DIVERSITY = config('RECOMMENDATION_DIVERSITY', default=0.3, cast=float)
+DIVERSITY_ARTIST_WEIGHT = config('DIVERSITY_ARTIST_WEIGHT', default=0.5, cast=float)
+
+# Recommendation feed: candidates pooled per feed, tracks per page, and seconds a feed is kept after its last page
+FEED_POOL_SIZE = config('FEED_POOL_SIZE', default=200, cast=int)
+FEED_PAGE_SIZE = config('FEED_PAGE_SIZE', default=10, cast=int)
+FEED_TTL = config('FEED_TTL', default=1800, cast=int)
+
+# Mood-transition playlists: default and largest number of tracks
+PLAYLIST_TRANSITION_LENGTH = config('PLAYLIST_TRANSITION_LENGTH', default=12, cast=int)
+PLAYLIST_TRANSITION_MAX_LENGTH = config('PLAYLIST_TRANSITION_MAX_LENGTH', default=50, cast=int)
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
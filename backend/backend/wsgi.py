@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_wsgi_application()
+
+# Fetch the Spotify token and open a connection in the background, ahead of the first request
+from recommendation.spotify import get_spotify_manager  # noqa: E402
+
+get_spotify_manager().start()
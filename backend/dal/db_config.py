@@ -1,7 +1,7 @@
 import os
 
 # Database configuration
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'db.sqlite3')
+DB_PATH = os.environ.get('DAL_DB_PATH') or os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'db.sqlite3')
 
 # Database connection settings
 DB_CONFIG = {
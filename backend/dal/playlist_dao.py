@@ -2,8 +2,7 @@ from .base_dao import BaseDAO
 
 class PlaylistDAO(BaseDAO):
     def __init__(self):
-        super().__init__()
-        self.table_name = 'playlists'
+        super().__init__('playlists')
         self.create_table_if_not_exists()
         self.create_playlist_songs_table()
 
@@ -75,4 +74,18 @@ class PlaylistDAO(BaseDAO):
         """
         with self.db.get_cursor() as cursor:
             cursor.execute(query, (playlist_id, song_id, position))
-            return cursor.lastrowid 
\ No newline at end of file
+            return cursor.lastrowid
+
+    def create_playlist_with_songs(self, user_id, name, song_ids, description=None, mood_category=None):
+        """Create a playlist holding song_ids in order, in a single transaction; returns its id."""
+        with self.db.get_cursor() as cursor:
+            cursor.execute(f"""
+            INSERT INTO {self.table_name} (user_id, name, description, mood_category)
+            VALUES (?, ?, ?, ?)
+            """, (user_id, name, description, mood_category))
+            playlist_id = cursor.lastrowid
+            cursor.executemany("""
+            INSERT INTO playlist_songs (playlist_id, song_id, position)
+            VALUES (?, ?, ?)
+            """, [(playlist_id, song_id, position) for position, song_id in enumerate(song_ids, start=1)])
+            return playlist_id
@@ -1,10 +1,22 @@
+from datetime import datetime
 from .base_dao import BaseDAO
 
+# Columns added after the original schema; created on existing databases by create_table_if_not_exists
+ADDED_COLUMNS = {
+    'preview_url': 'TEXT',
+    'valence': 'REAL',
+    'energy': 'REAL',
+    'tempo': 'REAL',
+    'danceability': 'REAL',
+}
+
+AUDIO_FEATURES = ('valence', 'energy', 'tempo', 'danceability')
+
 class SongDAO(BaseDAO):
     def __init__(self):
-        super().__init__()
-        self.table_name = 'songs'
+        super().__init__('songs')
         self.create_table_if_not_exists()
+        self.create_song_moods_table()
 
     def create_table_if_not_exists(self):
         create_table_sql = '''
@@ -18,19 +30,57 @@ class SongDAO(BaseDAO):
             duration INTEGER,
             mood_category TEXT,
             spotify_url TEXT,
+            preview_url TEXT,
+            valence REAL,
+            energy REAL,
+            tempo REAL,
+            danceability REAL,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
         '''
         self.create_table(create_table_sql)
+        with self.db.get_cursor() as cursor:
+            cursor.execute(f"PRAGMA table_info({self.table_name})")
+            existing = {row[1] for row in cursor.fetchall()}
+            for column, column_type in ADDED_COLUMNS.items():
+                if column not in existing:
+                    cursor.execute(f"ALTER TABLE {self.table_name} ADD COLUMN {column} {column_type}")
+
+    def create_song_moods_table(self):
+        """Create the table recording which (mood, market) searches each song was found by."""
+        create_table_sql = '''
+        CREATE TABLE IF NOT EXISTS song_moods (
+            song_id TEXT NOT NULL,
+            mood TEXT NOT NULL,
+            market TEXT NOT NULL,
+            refreshed_at TIMESTAMP NOT NULL,
+            PRIMARY KEY (song_id, mood, market),
+            FOREIGN KEY (song_id) REFERENCES songs(song_id)
+        )
+        '''
+        self.create_table(create_table_sql)
+        with self.db.get_cursor() as cursor:
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_song_moods_mood_market ON song_moods (mood, market)")
+            # Databases from before song_moods kept one market table and the last mood on the song
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'song_markets'")
+            if cursor.fetchone():
+                cursor.execute(f"""
+                INSERT OR IGNORE INTO song_moods (song_id, mood, market, refreshed_at)
+                SELECT m.song_id, s.mood_category, m.market, m.refreshed_at FROM song_markets m
+                JOIN {self.table_name} s ON s.song_id = m.song_id
+                WHERE s.mood_category IS NOT NULL
+                """)
+                cursor.execute("DROP TABLE song_markets")
 
     def get_songs_by_mood(self, mood):
-        """Get songs categorized by a specific mood."""
+        """Get songs categorized by a specific mood, or found by the catalog's search for it."""
         query = f"""
         SELECT * FROM {self.table_name} 
         WHERE mood_category = ?
+           OR song_id IN (SELECT song_id FROM song_moods WHERE mood = ?)
         """
         with self.db.get_cursor() as cursor:
-            cursor.execute(query, (mood,))
+            cursor.execute(query, (mood, mood))
             return cursor.fetchall()
 
     def get_songs_by_artist(self, artist):
@@ -51,4 +101,84 @@ class SongDAO(BaseDAO):
         """
         with self.db.get_cursor() as cursor:
             cursor.execute(query, (genre,))
-            return cursor.fetchall() 
\ No newline at end of file
+            return cursor.fetchall()
+
+    def upsert_songs(self, songs, mood, market):
+        """
+        Insert or update the songs found for (mood, market) and make them that pair's
+        members, in one transaction.
+
+        A song keeps its membership of every other (mood, market) pair. Members of this
+        pair that the refresh no longer returned are removed; an empty result leaves the
+        pair as it was, since it more likely means a failed search than an empty mood.
+
+        :param songs: Dicts with song_id, title and artist, and optionally album, genre,
+                      duration, spotify_url and preview_url.
+        """
+        now = datetime.utcnow()
+        rows = [(
+            song['song_id'], song['title'], song['artist'], song.get('album'), song.get('genre'),
+            song.get('duration'), mood, song.get('spotify_url'), song.get('preview_url'),
+        ) for song in songs]
+        with self.db.get_cursor() as cursor:
+            cursor.executemany(f"""
+            INSERT INTO {self.table_name}
+                (song_id, title, artist, album, genre, duration, mood_category, spotify_url, preview_url)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(song_id) DO UPDATE SET
+                title = excluded.title,
+                artist = excluded.artist,
+                album = COALESCE(excluded.album, album),
+                genre = COALESCE(excluded.genre, genre),
+                duration = COALESCE(excluded.duration, duration),
+                mood_category = excluded.mood_category,
+                spotify_url = excluded.spotify_url,
+                preview_url = excluded.preview_url
+            """, rows)
+            cursor.executemany("""
+            INSERT INTO song_moods (song_id, mood, market, refreshed_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(song_id, mood, market) DO UPDATE SET refreshed_at = excluded.refreshed_at
+            """, [(row[0], mood, market, now) for row in rows])
+            if rows:
+                cursor.execute("DELETE FROM song_moods WHERE mood = ? AND market = ? AND refreshed_at < ?",
+                               (mood, market, now))
+            return len(rows)
+
+    def get_catalog(self):
+        """Get every song with each mood and market it was found for, one row per (song, mood, market)."""
+        query = f"""
+        SELECT s.*, m.mood, m.market FROM {self.table_name} s
+        JOIN song_moods m ON s.song_id = m.song_id
+        """
+        with self.db.get_cursor() as cursor:
+            cursor.execute(query)
+            rows = cursor.fetchall()
+            if rows:
+                columns = [description[0] for description in cursor.description]
+                return [dict(zip(columns, row)) for row in rows]
+            return []
+
+    def get_last_refreshed(self):
+        """Get when any market was last refreshed, or None for an empty catalog."""
+        with self.db.get_cursor() as cursor:
+            cursor.execute("SELECT MAX(refreshed_at) FROM song_moods")
+            value = cursor.fetchone()[0]
+            return datetime.fromisoformat(value) if value else None
+
+    def get_song_ids_without_features(self):
+        """Get the song_id of every song whose audio features have not been fetched."""
+        with self.db.get_cursor() as cursor:
+            cursor.execute(f"SELECT song_id FROM {self.table_name} WHERE valence IS NULL")
+            return [row[0] for row in cursor.fetchall()]
+
+    def update_features(self, features):
+        """
+        Store audio features for many songs in one transaction.
+
+        :param features: {song_id: {'valence', 'energy', 'tempo', 'danceability'}}
+        """
+        rows = [tuple(values[name] for name in AUDIO_FEATURES) + (song_id,) for song_id, values in features.items()]
+        set_clause = ', '.join(f"{name} = ?" for name in AUDIO_FEATURES)
+        with self.db.get_cursor() as cursor:
+            cursor.executemany(f"UPDATE {self.table_name} SET {set_clause} WHERE song_id = ?", rows)
+            return cursor.rowcount
@@ -0,0 +1,149 @@
+"""
+Audio normalization through a pool of pre-spawned ffmpeg processes.
+
+Browser uploads (webm/opus, ogg, mp4/aac) are piped into ffmpeg and come back
+as 16 kHz mono float32 PCM, without intermediate files and without decoding the
+codec in the request thread. Each ffmpeg process handles one stream, so the pool
+keeps warm processes waiting on stdin and replaces each one in the background
+as soon as it is taken; the request only pays for the transcode itself.
+"""
+import atexit
+import io
+import logging
+import queue
+import shutil
+import subprocess
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+from django.conf import settings
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+FFMPEG_COMMAND = [
+    'ffmpeg', '-hide_banner', '-loglevel', 'error', '-i', 'pipe:0',
+    '-f', 'f32le', '-acodec', 'pcm_f32le', '-ac', '1', '-ar', str(SAMPLE_RATE), 'pipe:1',
+]
+
+# Uploads in these formats are already decodable without ffmpeg
+WAV_CONTENT_TYPES = ('audio/wav', 'audio/x-wav', 'audio/wave', 'audio/vnd.wave')
+
+
+class TranscodeError(Exception):
+    pass
+
+
+class TranscoderPool:
+    """Bounded pool of warm ffmpeg processes converting audio bytes to PCM."""
+
+    def __init__(self, size=2, timeout=30.0, command=None):
+        """
+        :param size: Maximum concurrent transcodes, and number of warm processes kept.
+        :param timeout: Seconds before a transcode is killed.
+        :param command: Command reading any audio on stdin and writing float32 PCM to stdout.
+        """
+        self.command = command or FFMPEG_COMMAND
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = queue.Queue()
+        self._spawner = ThreadPoolExecutor(max_workers=1, thread_name_prefix='transcoder-spawn')
+        self._closed = False
+        for _ in range(size):
+            self._idle.put(self._spawn())
+
+    def _spawn(self):
+        started = time.perf_counter()
+        process = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE)
+        metrics.observe('audio_transcode.spawn_ms', (time.perf_counter() - started) * 1000)
+        return process
+
+    def _replenish(self):
+        if not self._closed:
+            self._idle.put(self._spawn())
+
+    def _take(self):
+        """Return a warm process (spawning inline if none is ready) and queue its replacement."""
+        try:
+            process = self._idle.get_nowait()
+            if process.poll() is not None:
+                process = self._spawn()
+        except queue.Empty:
+            metrics.increment('audio_transcode.cold_spawns')
+            process = self._spawn()
+        self._spawner.submit(self._replenish)
+        return process
+
+    def transcode(self, data):
+        """
+        Convert encoded audio bytes to 16 kHz mono float32 PCM.
+
+        :raises TranscodeError: When ffmpeg rejects the input or times out.
+        """
+        metrics.increment('audio_transcode.requests')
+        with self._slots:
+            process = self._take()
+            started = time.perf_counter()
+            try:
+                stdout, stderr = process.communicate(data, timeout=self.timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.communicate()
+                metrics.increment('audio_transcode.failures')
+                raise TranscodeError(f"Transcode timed out after {self.timeout} s")
+
+        if process.returncode != 0 or not stdout:
+            metrics.increment('audio_transcode.failures')
+            detail = stderr.decode('utf-8', errors='replace').strip()
+            raise TranscodeError(detail or f"Transcoder exited with status {process.returncode}")
+        metrics.observe('audio_transcode.transcode_ms', (time.perf_counter() - started) * 1000)
+        return np.frombuffer(stdout[:len(stdout) - len(stdout) % 4], dtype='<f4')
+
+    def transcode_to_wav(self, data):
+        """Convert encoded audio bytes to an in-memory 16-bit 16 kHz mono WAV."""
+        return pcm_to_wav(self.transcode(data))
+
+    def close(self):
+        self._closed = True
+        self._spawner.shutdown(wait=True)
+        while not self._idle.empty():
+            process = self._idle.get_nowait()
+            process.kill()
+            process.communicate()
+
+
+def pcm_to_wav(pcm, sample_rate=SAMPLE_RATE):
+    """Wrap float PCM in [-1, 1] as 16-bit WAV bytes."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as handle:
+        handle.setnchannels(1)
+        handle.setsampwidth(2)
+        handle.setframerate(sample_rate)
+        handle.writeframes((np.clip(pcm, -1, 1) * 32767).astype('<i2').tobytes())
+    return buffer.getvalue()
+
+
+def needs_transcode(name, content_type):
+    return not (content_type in WAV_CONTENT_TYPES or (name or '').lower().endswith('.wav'))
+
+
+@lru_cache(maxsize=1)
+def get_transcoder_pool():
+    """Return the process-wide pool, or None when disabled or ffmpeg is not installed."""
+    size = getattr(settings, 'AUDIO_TRANSCODER_POOL_SIZE', 2)
+    if size <= 0:
+        return None
+    if shutil.which(FFMPEG_COMMAND[0]) is None:
+        logger.warning("ffmpeg not found; audio uploads will be decoded in-process")
+        return None
+    pool = TranscoderPool(size, timeout=getattr(settings, 'AUDIO_TRANSCODE_TIMEOUT', 30.0))
+    atexit.register(pool.close)
+    return pool
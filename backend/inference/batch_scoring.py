@@ -0,0 +1,384 @@
+"""
+Offline batch scoring of text, speech and facial inputs.
+
+Used by the ``score_emotions`` management command for research runs and backfills.
+Work items are grouped per modality into batches, scored in a process pool and
+streamed to JSONL or Parquet as batches complete. The pool loads its own copy of
+every model; to score on a running inference server instead, at batch priority
+behind its live requests, pass a gRPC client (``score_emotions --grpc``). Item
+ids already scored without an error are skipped, so an interrupted run resumes
+where it stopped and retries the items that failed.
+"""
+import csv
+import glob
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+logger = logging.getLogger(__name__)
+
+MODALITIES = ('text', 'speech', 'facial')
+
+AUDIO_EXTENSIONS = {'.wav', '.mp3', '.ogg', '.webm', '.mp4', '.m4a', '.flac'}
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.bmp'}
+TEXT_EXTENSIONS = {'.txt'}
+
+
+def modality_for_path(path):
+    """Infer the modality of a file from its extension, or None if unsupported."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in AUDIO_EXTENSIONS:
+        return 'speech'
+    if extension in IMAGE_EXTENSIONS:
+        return 'facial'
+    if extension in TEXT_EXTENSIONS:
+        return 'text'
+    return None
+
+
+def iter_directory(root):
+    """Yield work items for every supported file under root."""
+    for path in sorted(glob.glob(os.path.join(root, '**', '*'), recursive=True)):
+        modality = modality_for_path(path)
+        if modality and os.path.isfile(path):
+            yield {'id': os.path.relpath(path, root), 'modality': modality, 'path': path}
+
+
+def iter_manifest(manifest_path):
+    """
+    Yield work items from a CSV or JSONL manifest.
+
+    Each row needs either a 'path' or a 'text' column; 'id' and 'modality' are
+    optional and inferred when missing. Relative paths resolve against the
+    manifest's directory.
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    with open(manifest_path, newline='', encoding='utf-8') as handle:
+        if manifest_path.endswith('.jsonl'):
+            rows = (json.loads(line) for line in handle if line.strip())
+        else:
+            rows = csv.DictReader(handle)
+        for row in rows:
+            item = _item_from_row(row, base_dir)
+            if item:
+                yield item
+
+
+def _item_from_row(row, base_dir):
+    text = row.get('text')
+    path = row.get('path')
+    if path:
+        path = path if os.path.isabs(path) else os.path.join(base_dir, path)
+        modality = row.get('modality') or modality_for_path(path)
+        item_id = row.get('id') or os.path.relpath(path, base_dir)
+    elif text:
+        modality = 'text'
+        item_id = row.get('id') or hashlib.sha1(text.encode('utf-8')).hexdigest()
+    else:
+        logger.warning(f"Skipping manifest row without 'path' or 'text': {row}")
+        return None
+
+    if modality not in MODALITIES:
+        logger.warning(f"Skipping {item_id}: unsupported modality {modality!r}")
+        return None
+    return {'id': str(item_id), 'modality': modality, 'path': path, 'text': text}
+
+
+def make_batches(items, batch_size):
+    """Group items into single-modality batches of at most batch_size."""
+    buckets = {modality: [] for modality in MODALITIES}
+    for item in items:
+        bucket = buckets[item['modality']]
+        bucket.append(item)
+        if len(bucket) >= batch_size:
+            yield item['modality'], bucket
+            buckets[item['modality']] = []
+    for modality, bucket in buckets.items():
+        if bucket:
+            yield modality, bucket
+
+
+def _load_text(item):
+    if item.get('text'):
+        return item['text']
+    with open(item['path'], encoding='utf-8') as handle:
+        return handle.read()
+
+
+def score_batch(modality, items, speech_model='default'):
+    """
+    Score one single-modality batch. Runs inside a worker process.
+
+    Models are imported lazily so each worker loads them once and keeps them for
+    every later batch it receives.
+    """
+    started = time.perf_counter()
+    results = []
+
+    if modality == 'speech' and speech_model == 'classical':
+        from .speech_features import get_caching_extractor, predict_speech_emotions
+
+        extractor = get_caching_extractor()
+        try:
+            labels = predict_speech_emotions([item['path'] for item in items], extractor)
+            elapsed_ms = (time.perf_counter() - started) * 1000 / len(items)
+            return [_result(item, label, None, elapsed_ms) for item, label in zip(items, labels)]
+        except Exception as e:
+            logger.error(f"Batched speech scoring failed, falling back to per-item: {str(e)}")
+
+        # Still the classical model, so one bad clip fails alone and every label comes from the same model
+        def infer(path):
+            return predict_speech_emotions([path], extractor)[0]
+    else:
+        infer = _inference_function(modality)
+
+    for item in items:
+        item_started = time.perf_counter()
+        try:
+            source = _load_text(item) if modality == 'text' else item['path']
+            label, error = infer(source), None
+        except Exception as e:
+            label, error = None, str(e)
+        results.append(_result(item, label, error, (time.perf_counter() - item_started) * 1000))
+    return results
+
+
+def score_batch_remote(client, modality, items):
+    """
+    Score one single-modality batch on a gRPC inference server, streamed at batch priority.
+
+    :param client: api.grpc_service.EmotionInferenceClient.
+    """
+    kind = {'text': 'text', 'speech': 'audio', 'facial': 'image'}[modality]
+    by_id = {item['id']: item for item in items}
+    requests, results = [], []
+    for item in items:
+        try:
+            if modality == 'text':
+                payload = _load_text(item)
+            else:
+                with open(item['path'], 'rb') as handle:
+                    payload = handle.read()
+        except OSError as e:
+            results.append(_result(item, None, str(e), 0.0))
+            continue
+        requests.append({'request_id': item['id'], kind: payload, 'priority': 'batch',
+                         'filename': os.path.basename(item.get('path') or '')})
+    for reply in client.stream(requests):
+        results.append(_result(by_id[reply.request_id], reply.emotion or None, reply.error or None, reply.latency_ms))
+    return results
+
+
+def _inference_function(modality):
+    if modality == 'text':
+        from ai_ml.src.models.text_emotion import infer_text_emotion
+        return infer_text_emotion
+    if modality == 'speech':
+        from ai_ml.src.models.speech_emotion import infer_speech_emotion
+        return infer_speech_emotion
+    from ai_ml.src.models.facial_emotion import infer_facial_emotion
+    return infer_facial_emotion
+
+
+def _result(item, emotion, error, latency_ms):
+    return {
+        'id': item['id'],
+        'modality': item['modality'],
+        'source': item.get('path') or '',
+        'emotion': emotion,
+        'error': error,
+        'latency_ms': round(latency_ms, 3),
+    }
+
+
+class JsonlResultWriter:
+    """Appends results to a JSONL file, one line per item; a retried item's last line wins."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def completed_ids(self):
+        """Return the ids scored without error, truncating a torn last line left by a crash."""
+        ids = set()
+        if not os.path.exists(self.path):
+            return ids
+        with open(self.path, 'rb+') as handle:
+            valid_end = 0
+            for line in handle:
+                if not line.endswith(b'\n'):
+                    break
+                valid_end += len(line)
+                try:
+                    result = json.loads(line)
+                    item_id = result['id']
+                except (ValueError, KeyError):
+                    continue
+                # Failed items are retried; a later successful line marks them completed
+                if not result.get('error'):
+                    ids.add(item_id)
+            handle.truncate(valid_end)
+        return ids
+
+    def write(self, results):
+        with open(self.path, 'a', encoding='utf-8') as handle:
+            for result in results:
+                handle.write(json.dumps(result) + '\n')
+            handle.flush()
+            os.fsync(handle.fileno())
+
+    def close(self):
+        pass
+
+
+class ParquetResultWriter:
+    """
+    Writes results as numbered Parquet part files inside a directory.
+
+    Parquet files cannot be appended to, so every batch of results is written as
+    its own part; each part is a durable checkpoint, and an interrupted run loses
+    at most the batches still being scored.
+    """
+
+    def __init__(self, directory):
+        import pyarrow  # noqa: F401 - fail early if pyarrow is missing
+
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.next_part = len(self._parts())
+
+    def _parts(self):
+        return sorted(glob.glob(os.path.join(self.directory, 'part-*.parquet')))
+
+    def completed_ids(self):
+        import pyarrow.parquet as pq
+
+        ids = set()
+        for part in self._parts():
+            table = pq.read_table(part, columns=['id', 'error']).to_pydict()
+            ids.update(item_id for item_id, error in zip(table['id'], table['error']) if not error)
+        return ids
+
+    def write(self, results):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not results:
+            return
+        path = os.path.join(self.directory, f'part-{self.next_part:05d}.parquet')
+        tmp_path = f'{path}.tmp'
+        schema = pa.schema([
+            ('id', pa.string()), ('modality', pa.string()), ('source', pa.string()),
+            ('emotion', pa.string()), ('error', pa.string()), ('latency_ms', pa.float64()),
+        ])
+        pq.write_table(pa.Table.from_pylist(results, schema=schema), tmp_path)
+        os.replace(tmp_path, path)
+        self.next_part += 1
+
+    def close(self):
+        pass
+
+
+def make_writer(output_path, output_format=None):
+    """Pick a writer from the explicit format or the output path's extension."""
+    output_format = output_format or ('parquet' if output_path.endswith('.parquet') else 'jsonl')
+    if output_format == 'parquet':
+        return ParquetResultWriter(output_path)
+    return JsonlResultWriter(output_path)
+
+
+class Progress:
+    """Tracks throughput and ETA for a scoring run."""
+
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.errors = 0
+        self.started = time.monotonic()
+
+    def update(self, results):
+        self.done += len(results)
+        self.errors += sum(1 for result in results if result['error'])
+
+    @property
+    def rate(self):
+        elapsed = time.monotonic() - self.started
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta_seconds(self):
+        return (self.total - self.done) / self.rate if self.rate else float('inf')
+
+    def __str__(self):
+        eta = time.strftime('%H:%M:%S', time.gmtime(self.eta_seconds)) if self.rate else '--:--:--'
+        return (f"{self.done}/{self.total} items, {self.rate:.1f} items/s, "
+                f"{self.errors} errors, ETA {eta}")
+
+
+def run_scoring(items, writer, workers=None, batch_size=32, speech_model='default', on_progress=None,
+                client=None):
+    """
+    Score items in a process pool and stream the results to writer.
+
+    With a client, batches are sent to that gRPC inference server instead, up to
+    workers streams at a time; the server schedules them at batch priority, so they
+    share its loaded models and yield to its live requests. With workers=0 the
+    batches run in this process through its own scheduler at batch priority; the
+    models are still this process's own.
+
+    :param items: Work items from iter_directory/iter_manifest.
+    :param writer: A JsonlResultWriter or ParquetResultWriter.
+    :param on_progress: Optional callable receiving the Progress after each batch.
+    :param client: Optional api.grpc_service.EmotionInferenceClient.
+    :return: The final Progress.
+    """
+    completed = writer.completed_ids()
+    pending = [item for item in items if item['id'] not in completed]
+    if completed:
+        logger.info(f"Resuming: {len(completed)} items already scored, {len(pending)} remaining")
+
+    progress = Progress(len(pending))
+    if workers == 0 and client is None:
+        return _run_in_process(pending, writer, batch_size, speech_model, on_progress, progress)
+    # Remote batches only wait on the server, so threads are enough to keep several streams open
+    executor = ThreadPoolExecutor(max_workers=workers or 1) if client else ProcessPoolExecutor(max_workers=workers)
+    try:
+        with executor:
+            futures = [
+                executor.submit(score_batch_remote, client, modality, batch) if client
+                else executor.submit(score_batch, modality, batch, speech_model)
+                for modality, batch in make_batches(pending, batch_size)
+            ]
+            for future in as_completed(futures):
+                results = future.result()
+                writer.write(results)
+                progress.update(results)
+                if on_progress:
+                    on_progress(progress)
+    finally:
+        writer.close()
+    return progress
+
+
+def _run_in_process(pending, writer, batch_size, speech_model, on_progress, progress):
+    """
+    Score through this process's scheduler at batch priority. Only interactive work
+    submitted in this same process is prioritized over it.
+    """
+    from .scheduler import get_scheduler
+
+    scheduler = get_scheduler()
+    try:
+        futures = [scheduler.submit(score_batch, modality, batch, speech_model, priority='batch')
+                   for modality, batch in make_batches(pending, batch_size)]
+        for future in as_completed(futures):
+            results = future.result()
+            writer.write(results)
+            progress.update(results)
+            if on_progress:
+                on_progress(progress)
+    finally:
+        writer.close()
+    return progress
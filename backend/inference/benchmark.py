@@ -0,0 +1,419 @@
+"""
+Reproducible latency/throughput benchmarks for the emotion models.
+
+Each (target, input size, thread count) case runs in a freshly spawned process so
+that the first call measures a genuine cold start (imports, weight loading and
+allocator warmup) and peak RSS is attributable to that case alone. Results are
+written as JSON with sorted keys so that two runs can be diffed with
+``compare_results``.
+"""
+import glob
+import json
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+import wave
+from datetime import datetime
+
+import numpy as np
+
+from .batch_scoring import modality_for_path
+
+# Registered benchmark targets: name -> (modality, loader). A loader returns
+# (predict_one, predict_batch); predict_batch may be None to loop over predict_one.
+TARGETS = {}
+
+DEFAULT_SIZES = {
+    'text': (8, 64, 256),          # words
+    'speech': (1, 5, 15),          # seconds of audio
+    'facial': (224, 640, 1280),    # square image edge in pixels
+}
+
+SIZE_UNITS = {'text': 'words', 'speech': 'seconds', 'facial': 'pixels'}
+
+# Read by OpenMP and the BLAS libraries once, when numpy or torch is first imported
+THREAD_VARIABLES = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')
+
+# Metrics where a larger value is a regression; throughput is the reverse
+LOWER_IS_BETTER = ('cold_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'peak_rss_mb')
+
+
+def register_target(name, modality):
+    """Register a benchmark target loader under name."""
+    def decorator(loader):
+        TARGETS[name] = (modality, loader)
+        return loader
+    return decorator
+
+
+@register_target('text', 'text')
+def _text_target():
+    from ai_ml.src.models.text_emotion import infer_text_emotion
+    return infer_text_emotion, None
+
+
+@register_target('text-cascade', 'text')
+def _text_cascade_target():
+    from ai_ml.src.models.text_emotion import infer_text_emotion
+    from .text_cascade import get_text_cascade
+
+    cascade = get_text_cascade()
+    return (lambda text: cascade.predict(text, infer_text_emotion)), None
+
+
+@register_target('text-long', 'text')
+def _text_long_target():
+    from .long_text import get_long_text_emotion
+
+    analyzer = get_long_text_emotion()
+    return (lambda text: analyzer.analyze(text)['emotion']), None
+
+
+def _segment_classifier_target(compiled):
+    from django.conf import settings
+    from .compiled import load_artifact
+    from .long_text import TransformerSegmentClassifier
+
+    artifact = None
+    if compiled:
+        artifact = load_artifact('text_emotion_model')
+        if artifact is None:
+            raise RuntimeError("No compiled text model for this version; run `manage.py compile_models`")
+    classifier = TransformerSegmentClassifier(os.path.join(settings.AI_ML_MODELS_DIR, 'text_emotion_model'),
+                                              compiled=artifact)
+    return (lambda text: classifier([text])), (lambda texts: classifier(texts))
+
+
+@register_target('text-eager', 'text')
+def _text_eager_target():
+    return _segment_classifier_target(compiled=False)
+
+
+@register_target('text-compiled', 'text')
+def _text_compiled_target():
+    return _segment_classifier_target(compiled=True)
+
+
+@register_target('speech', 'speech')
+def _speech_target():
+    from ai_ml.src.models.speech_emotion import infer_speech_emotion
+    return infer_speech_emotion, None
+
+
+@register_target('speech-classical', 'speech')
+def _speech_classical_target():
+    from .speech_features import SpeechFeatureExtractor, predict_speech_emotions
+
+    # No feature cache: repeated inputs would otherwise only measure cache hits
+    extractor = SpeechFeatureExtractor()
+    return (lambda path: predict_speech_emotions([path], extractor)[0],
+            lambda paths: predict_speech_emotions(paths, extractor))
+
+
+@register_target('speech-tiered', 'speech')
+def _speech_tiered_target():
+    from ai_ml.src.models.speech_emotion import infer_speech_emotion
+    from .speech_tiers import get_speech_router
+
+    router = get_speech_router()
+    return (lambda path: router.predict(path, infer_speech_emotion)), None
+
+
+@register_target('facial', 'facial')
+def _facial_target():
+    from ai_ml.src.models.facial_emotion import infer_facial_emotion
+    return infer_facial_emotion, None
+
+
+@register_target('facial-compiled', 'facial')
+def _facial_compiled_target():
+    import torch
+    from PIL import Image
+    from .compiled import load_artifact
+
+    artifact = load_artifact('facial_emotion_model')
+    if artifact is None:
+        raise RuntimeError("No compiled facial model for this version; run `manage.py compile_models`")
+    module, meta = artifact
+    _, channels, height, width = meta['input_shape']
+
+    def predict(path):
+        image = Image.open(path).convert('L' if channels == 1 else 'RGB').resize((width, height))
+        pixels = torch.from_numpy(np.asarray(image, dtype=np.float32) / 255.0)
+        pixels = pixels.reshape(1, height, width, channels).permute(0, 3, 1, 2)
+        with torch.inference_mode():
+            return int(module(pixels).argmax())
+
+    return predict, None
+
+
+@register_target('face-detection', 'facial')
+def _face_detection_target():
+    from PIL import Image
+    from .face_detection import get_face_detector
+
+    detector = get_face_detector()
+    return (lambda path: detector.detect(np.asarray(Image.open(path).convert('RGB')))['stage']), None
+
+
+def _facial_pipeline(skip_without_face):
+    from ai_ml.src.models.facial_emotion import infer_facial_emotion
+    from .face_detection import NO_FACE_EMOTION, found_no_face, get_face_detector
+
+    detector = get_face_detector()
+    if detector is None:
+        raise RuntimeError("OpenCV is required for the face detection targets")
+
+    def predict(path):
+        face_path, summary = detector.crop_to_face(path)
+        try:
+            if skip_without_face and found_no_face(summary):
+                return NO_FACE_EMOTION
+            return infer_facial_emotion(face_path or path)
+        finally:
+            if face_path:
+                os.remove(face_path)
+
+    return predict, None
+
+
+# Detection and crop ahead of a model that always runs: the request path before the no-face skip
+@register_target('facial-cropped', 'facial')
+def _facial_cropped_target():
+    return _facial_pipeline(skip_without_face=False)
+
+
+# The request path as served: the model is skipped when detection finds no face
+@register_target('facial-detected', 'facial')
+def _facial_detected_target():
+    return _facial_pipeline(skip_without_face=True)
+
+
+def make_synthetic_input(modality, size, directory, seed=0):
+    """
+    Create a deterministic synthetic input of the given size.
+
+    Text inputs are returned as strings; audio and images are written to
+    directory and returned as paths.
+    """
+    rng = np.random.default_rng(seed)
+    if modality == 'text':
+        words = ['today', 'feel', 'really', 'happy', 'tired', 'sad', 'music', 'great',
+                 'angry', 'calm', 'work', 'friends', 'weather', 'nothing', 'love', 'worried']
+        chooser = random.Random(seed)
+        return ' '.join(chooser.choice(words) for _ in range(size))
+
+    if modality == 'speech':
+        sample_rate = 16000
+        t = np.arange(int(size * sample_rate)) / sample_rate
+        signal = 0.3 * np.sin(2 * np.pi * 220 * t) * (1 + 0.5 * np.sin(2 * np.pi * 3 * t))
+        signal += 0.05 * rng.standard_normal(len(t))
+        path = os.path.join(directory, f'speech_{size}s.wav')
+        with wave.open(path, 'wb') as handle:
+            handle.setnchannels(1)
+            handle.setsampwidth(2)
+            handle.setframerate(sample_rate)
+            handle.writeframes((np.clip(signal, -1, 1) * 32767).astype('<i2').tobytes())
+        return path
+
+    from PIL import Image
+
+    gradient = np.linspace(0, 255, size, dtype=np.float32)
+    pixels = (gradient[None, :, None] * 0.5 + rng.uniform(0, 128, (size, size, 3))).astype(np.uint8)
+    path = os.path.join(directory, f'facial_{size}px.jpg')
+    Image.fromarray(pixels).save(path, quality=90)
+    return path
+
+
+def load_fixtures(directory, modality):
+    """Return (label, input) pairs for fixture files of the given modality."""
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(directory, '**', '*'), recursive=True)):
+        if modality_for_path(path) != modality:
+            continue
+        if modality == 'text':
+            with open(path, encoding='utf-8') as handle:
+                fixtures.append((f'fixture={os.path.basename(path)}', handle.read()))
+        else:
+            fixtures.append((f'fixture={os.path.basename(path)}', path))
+    return fixtures
+
+
+def _percentiles(samples_ms):
+    p50, p95, p99 = np.percentile(samples_ms, [50, 95, 99])
+    return {'p50_ms': round(float(p50), 3), 'p95_ms': round(float(p95), 3), 'p99_ms': round(float(p99), 3)}
+
+
+def _peak_rss_mb():
+    import resource
+
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if platform.system() == 'Darwin' else 1024), 1)
+
+
+def run_case(target, sample, threads, batch_sizes, iterations, warmup):
+    """
+    Benchmark one case. Meant to run in a fresh process (see benchmark_case).
+
+    :return: dict with load/first-call/cold latency, warm percentiles,
+             throughput per batch size and peak RSS.
+    """
+    # THREAD_VARIABLES were set before this process started (see benchmark_case); setting them
+    # here would be too late, since importing this module has already loaded numpy
+    django_settings = os.environ.get('DJANGO_SETTINGS_MODULE')
+    if django_settings:
+        import django
+        django.setup()
+
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+    started = time.perf_counter()
+    _, loader = TARGETS[target]
+    predict_one, predict_batch = loader()
+    loaded = time.perf_counter()
+    predict_one(sample)
+    first_done = time.perf_counter()
+
+    for _ in range(warmup):
+        predict_one(sample)
+
+    samples_ms = []
+    for _ in range(iterations):
+        call_started = time.perf_counter()
+        predict_one(sample)
+        samples_ms.append((time.perf_counter() - call_started) * 1000)
+
+    throughput = {}
+    for batch_size in batch_sizes:
+        batch = [sample] * batch_size
+        rounds = max(1, iterations // batch_size)
+        batch_started = time.perf_counter()
+        for _ in range(rounds):
+            if predict_batch:
+                predict_batch(batch)
+            else:
+                for item in batch:
+                    predict_one(item)
+        elapsed = time.perf_counter() - batch_started
+        throughput[str(batch_size)] = round(rounds * batch_size / elapsed, 3)
+
+    return {
+        'load_ms': round((loaded - started) * 1000, 3),
+        'first_call_ms': round((first_done - loaded) * 1000, 3),
+        'cold_ms': round((first_done - started) * 1000, 3),
+        **_percentiles(samples_ms),
+        'throughput_per_s': throughput,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def benchmark_case(target, sample, threads, *args):
+    """
+    Run run_case in a freshly spawned process so the cold start is real.
+
+    The spawned process inherits THREAD_VARIABLES set to threads, so numpy, scikit-learn
+    and torch size their thread pools for the case from the start.
+    """
+    context = multiprocessing.get_context('spawn')
+    saved = {variable: os.environ.get(variable) for variable in THREAD_VARIABLES}
+    os.environ.update({variable: str(threads) for variable in THREAD_VARIABLES})
+    try:
+        # The worker is started here and copies the environment as it is now
+        pool = context.Pool(1)
+    finally:
+        for variable, value in saved.items():
+            if value is None:
+                os.environ.pop(variable, None)
+            else:
+                os.environ[variable] = value
+    with pool:
+        return pool.apply(run_case, (target, sample, threads, *args))
+
+
+def run_benchmarks(targets, threads=(1,), batch_sizes=(1, 8), iterations=50, warmup=5,
+                   fixtures_dir=None, sizes=None, on_result=None):
+    """
+    Run every (target, input, thread count) case.
+
+    :return: dict with 'meta' and 'results'; results are keyed
+             '<target>/<input label>/threads=<n>'.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for target in targets:
+            modality, _ = TARGETS[target]
+            inputs = [
+                (f'{SIZE_UNITS[modality]}={size}', make_synthetic_input(modality, size, workdir))
+                for size in (sizes or {}).get(modality, DEFAULT_SIZES[modality])
+            ]
+            if fixtures_dir:
+                inputs.extend(load_fixtures(fixtures_dir, modality))
+
+            for label, sample in inputs:
+                for thread_count in threads:
+                    key = f'{target}/{label}/threads={thread_count}'
+                    try:
+                        results[key] = benchmark_case(target, sample, thread_count, list(batch_sizes),
+                                                      iterations, warmup)
+                    except Exception as e:
+                        results[key] = {'error': str(e)}
+                    if on_result:
+                        on_result(key, results[key])
+
+    return {'meta': _metadata(iterations, warmup), 'results': results}
+
+
+def _metadata(iterations, warmup):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'iterations': iterations,
+        'warmup': warmup,
+    }
+
+
+def write_results(report, path):
+    with open(path, 'w', encoding='utf-8') as handle:
+        json.dump(report, handle, indent=2, sort_keys=True)
+        handle.write('\n')
+
+
+def compare_results(baseline, current, threshold_pct=10.0):
+    """
+    Compare two benchmark reports case by case.
+
+    :return: List of (case, metric, baseline, current, change_pct, regressed) rows
+             for every metric present in both reports.
+    """
+    rows = []
+    for case in sorted(set(baseline['results']) & set(current['results'])):
+        before, after = baseline['results'][case], current['results'][case]
+        metrics = [(name, before.get(name), after.get(name), True) for name in LOWER_IS_BETTER]
+        for batch_size, value in after.get('throughput_per_s', {}).items():
+            metrics.append((f'throughput_per_s[{batch_size}]',
+                            before.get('throughput_per_s', {}).get(batch_size), value, False))
+
+        for name, old, new, lower_is_better in metrics:
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100
+            regressed = change > threshold_pct if lower_is_better else change < -threshold_pct
+            rows.append((case, name, old, new, round(change, 1), regressed))
+    return rows
@@ -0,0 +1,138 @@
+"""
+Precompiled (TorchScript) model artifacts.
+
+``compile_models`` traces and freezes each model once per model version and
+stores the result under COMPILED_MODELS_DIR/<model>/<version>/. Serving loads
+the artifact instead of rebuilding the eager model, which skips the Python
+model construction on cold start and runs the frozen graph afterwards. The
+version is derived from the source weights' names, sizes and modification
+times plus the torch version, so retrained weights or a torch upgrade never
+load a stale artifact.
+
+Only the long-text segment classifier and the benchmark targets load these
+artifacts. The default text and facial requests call infer_text_emotion and
+infer_facial_emotion in ai_ml, which build their own eager models.
+"""
+import hashlib
+import json
+import logging
+import os
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Bump when the artifact layout or tracing recipe changes
+ARTIFACT_FORMAT = 2
+
+
+def _source_path(name):
+    return os.path.join(settings.AI_ML_MODELS_DIR, *MODELS[name]['source'])
+
+
+def source_version(path):
+    """Return a short version key for the weights at path (a file or a directory)."""
+    import torch
+
+    if os.path.isdir(path):
+        files = sorted(os.path.join(root, file) for root, _, names in os.walk(path) for file in names)
+    else:
+        files = [path]
+    digest = hashlib.sha256(f'{ARTIFACT_FORMAT}:{torch.__version__}'.encode())
+    for file in files:
+        stat = os.stat(file)
+        digest.update(f'{os.path.relpath(file, path)}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+    return digest.hexdigest()[:16]
+
+
+def artifact_dir(name, version):
+    return os.path.join(settings.COMPILED_MODELS_DIR, name, version)
+
+
+def compile_text_model(source, max_length=128):
+    """
+    Trace the fine-tuned text transformer on (input_ids, attention_mask).
+
+    The trace may fix the sequence length, so it is taken at the longest input
+    the segment classifier sends (LONG_TEXT max_length) and callers pad every
+    batch to meta['max_length']. The example has two rows so the batch
+    dimension is not specialized to 1.
+    """
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(source)
+    model = AutoModelForSequenceClassification.from_pretrained(source, torchscript=True).eval()
+    example = tokenizer(['an example sentence to trace the model with', 'and a second one'], return_tensors='pt',
+                        padding='max_length', truncation=True, max_length=max_length)
+    with torch.no_grad():
+        traced = torch.jit.trace(model, (example['input_ids'], example['attention_mask']), strict=False)
+    labels = [model.config.id2label[i] for i in range(model.config.num_labels)]
+    return torch.jit.freeze(traced.eval()), {'labels': labels, 'inputs': ['input_ids', 'attention_mask'],
+                                             'max_length': max_length}
+
+
+def compile_facial_model(source, input_shape=(1, 1, 48, 48)):
+    """Trace the facial emotion CNN, saved as a whole module with torch.save."""
+    import torch
+
+    model = torch.load(source, map_location='cpu')
+    if not isinstance(model, torch.nn.Module):
+        raise ValueError(f"{source} holds a state dict, not a module; it cannot be traced without the model class")
+    model.eval()
+    with torch.no_grad():
+        traced = torch.jit.trace(model, torch.zeros(input_shape))
+    return torch.jit.freeze(traced), {'input_shape': list(input_shape)}
+
+
+MODELS = {
+    'text_emotion_model': {'source': ('text_emotion_model',), 'compile': compile_text_model},
+    'facial_emotion_model': {'source': ('facial_emotion_model', 'trained_facial_emotion_model.pt'),
+                             'compile': compile_facial_model},
+}
+
+
+def build_artifact(name, force=False):
+    """
+    Compile one model into its versioned artifact directory.
+
+    :return: (artifact directory, whether it was built now rather than already present)
+    """
+    import torch
+
+    source = _source_path(name)
+    directory = artifact_dir(name, source_version(source))
+    if os.path.exists(os.path.join(directory, 'meta.json')) and not force:
+        return directory, False
+
+    module, meta = MODELS[name]['compile'](source)
+    os.makedirs(directory, exist_ok=True)
+    temp_path = os.path.join(directory, 'model.pt.tmp')
+    torch.jit.save(module, temp_path)
+    os.replace(temp_path, os.path.join(directory, 'model.pt'))
+    # meta.json is written last and marks the artifact complete
+    with open(os.path.join(directory, 'meta.json'), 'w', encoding='utf-8') as handle:
+        json.dump({**meta, 'model': name, 'source': source, 'torch': torch.__version__}, handle, indent=2)
+    return directory, True
+
+
+def load_artifact(name):
+    """
+    Load the compiled artifact for the current version of a model.
+
+    :return: (module, meta), or None when no artifact has been built for this version.
+    """
+    import torch
+
+    source = _source_path(name)
+    if not os.path.exists(source):
+        return None
+    directory = artifact_dir(name, source_version(source))
+    meta_path = os.path.join(directory, 'meta.json')
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, encoding='utf-8') as handle:
+        meta = json.load(handle)
+    module = torch.jit.load(os.path.join(directory, 'model.pt'), map_location='cpu')
+    logger.debug(f"Loaded compiled {name} from {directory}")
+    return module, meta
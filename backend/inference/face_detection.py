@@ -0,0 +1,185 @@
+"""
+Tiered face detection for facial emotion requests.
+
+OpenCV's Haar cascade runs first; it is an order of magnitude cheaper than MTCNN
+and finds the well-lit frontal faces that make up most uploads. MTCNN
+(facenet-pytorch) is only loaded and run when the cascade finds nothing or is
+not confident. The largest face is cropped and passed to the emotion model.
+
+infer_facial_emotion still runs its own detector on the crop, so callers use
+the detection to skip the model altogether when neither stage finds a face and
+answer NO_FACE_EMOTION instead. The crop keeps the face large in a small image,
+so the model's second pass is cheap. The whole step, including decoding the
+upload and saving the crop, is recorded as face_detect.crop_ms so its cost on
+top of inference can be watched; the facial-cropped and facial-detected
+benchmark targets compare the end-to-end latency with and without the skip.
+"""
+import logging
+import os
+import time
+from functools import lru_cache
+
+import numpy as np
+from django.conf import settings
+
+from .metrics import metrics
+from .model_cache import estimate_size, model_cache
+
+logger = logging.getLogger(__name__)
+
+NO_FACES = (np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32))
+
+# Answered without running the emotion model when no face is found
+NO_FACE_EMOTION = 'neutral'
+
+
+class HaarFaceDetector:
+    """OpenCV Haar cascade with level weights mapped to a 0-1 confidence."""
+
+    def __init__(self, scale_factor=1.1, min_neighbors=5, min_size=48):
+        import cv2
+
+        self.cv2 = cv2
+        self.cascade = cv2.CascadeClassifier(os.path.join(cv2.data.haarcascades, 'haarcascade_frontalface_default.xml'))
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+
+    def __call__(self, image):
+        """
+        :param image: RGB uint8 array.
+        :return: (boxes as x1, y1, x2, y2, confidences)
+        """
+        gray = self.cv2.equalizeHist(self.cv2.cvtColor(image, self.cv2.COLOR_RGB2GRAY))
+        rects, _, weights = self.cascade.detectMultiScale3(
+            gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors,
+            minSize=(self.min_size, self.min_size), outputRejectLevels=True,
+        )
+        if len(rects) == 0:
+            return NO_FACES
+        rects = np.asarray(rects, dtype=np.float32)
+        boxes = np.hstack([rects[:, :2], rects[:, :2] + rects[:, 2:]])
+        return boxes, 1 / (1 + np.exp(-np.asarray(weights, dtype=np.float32).ravel()))
+
+
+class MtcnnFaceDetector:
+    """facenet-pytorch MTCNN on CPU."""
+
+    def __init__(self, min_face_size=40):
+        from facenet_pytorch import MTCNN
+
+        self.mtcnn = MTCNN(keep_all=True, device='cpu', min_face_size=min_face_size)
+
+    def __call__(self, image):
+        from PIL import Image
+
+        boxes, probabilities = self.mtcnn.detect(Image.fromarray(image))
+        if boxes is None:
+            return NO_FACES
+        return boxes.astype(np.float32), probabilities.astype(np.float32)
+
+
+class TieredFaceDetector:
+    """Runs the fast detector and falls back to the accurate one only when needed."""
+
+    def __init__(self, fast, fallback, min_confidence=0.8):
+        """
+        :param fast: Callable RGB image -> (boxes, confidences).
+        :param fallback: Same interface; called when fast finds no face at min_confidence.
+        """
+        self.fast = fast
+        self.fallback = fallback
+        self.min_confidence = min_confidence
+
+    def detect(self, image):
+        """
+        :return: dict with boxes, confidences, the stage that produced them
+                 ('fast', 'fallback', 'fast_low_confidence' or 'none') and per-stage timings.
+        """
+        timings = {}
+        started = time.perf_counter()
+        boxes, confidences = self.fast(image)
+        timings['fast_ms'] = (time.perf_counter() - started) * 1000
+        metrics.observe('face_detect.fast_ms', timings['fast_ms'])
+
+        stage = 'fast'
+        if not len(boxes) or confidences.max() < self.min_confidence:
+            started = time.perf_counter()
+            fallback_boxes, fallback_confidences = self.fallback(image)
+            timings['fallback_ms'] = (time.perf_counter() - started) * 1000
+            metrics.observe('face_detect.fallback_ms', timings['fallback_ms'])
+            if len(fallback_boxes):
+                boxes, confidences, stage = fallback_boxes, fallback_confidences, 'fallback'
+            else:
+                stage = 'fast_low_confidence' if len(boxes) else 'none'
+
+        metrics.increment(f'face_detect.stage.{stage}')
+        return {
+            'boxes': boxes,
+            'confidences': confidences,
+            'stage': stage,
+            'timings_ms': {name: round(value, 3) for name, value in timings.items()},
+        }
+
+    def crop_to_face(self, path, margin=0.2):
+        """
+        Detect faces in the image at path and save the largest one next to it.
+
+        timings_ms['crop_ms'] is the wall time of the whole call: the latency added
+        ahead of the emotion model.
+
+        :return: (crop path or None when no face was found, detection summary)
+        """
+        from PIL import Image
+
+        started = time.perf_counter()
+        with Image.open(path) as image:
+            pixels = np.asarray(image.convert('RGB'))
+        detection = self.detect(pixels)
+        summary = {
+            'stage': detection['stage'],
+            'faces': len(detection['boxes']),
+            'confidence': round(float(detection['confidences'].max()), 4) if len(detection['boxes']) else None,
+            'timings_ms': detection['timings_ms'],
+        }
+        crop_path = None
+        if len(detection['boxes']):
+            crop = crop_largest_face(pixels, detection['boxes'], margin)
+            crop_path = f'{os.path.splitext(path)[0]}_face.png'
+            Image.fromarray(crop).save(crop_path)
+        summary['timings_ms']['crop_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        metrics.observe('face_detect.crop_ms', summary['timings_ms']['crop_ms'])
+        return crop_path, summary
+
+
+def found_no_face(summary):
+    """True when crop_to_face ran and neither stage found a face, so the emotion model can be skipped."""
+    return summary is not None and summary['stage'] == 'none'
+
+
+def crop_largest_face(image, boxes, margin=0.2):
+    """Crop the largest box, grown by margin on every side and clipped to the image."""
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    x1, y1, x2, y2 = boxes[int(areas.argmax())]
+    pad_x, pad_y = (x2 - x1) * margin, (y2 - y1) * margin
+    height, width = image.shape[:2]
+    left, top = max(0, int(x1 - pad_x)), max(0, int(y1 - pad_y))
+    right, bottom = min(width, int(np.ceil(x2 + pad_x))), min(height, int(np.ceil(y2 + pad_y)))
+    return image[top:bottom, left:right]
+
+
+def _mtcnn():
+    return model_cache.get('mtcnn', MtcnnFaceDetector, size=lambda detector: estimate_size(detector.mtcnn))
+
+
+@lru_cache(maxsize=1)
+def get_face_detector():
+    """Return the process-wide tiered detector, or None when OpenCV is not installed."""
+    try:
+        fast = HaarFaceDetector()
+    except ImportError as e:
+        logger.warning(f"OpenCV unavailable, skipping face detection: {str(e)}")
+        return None
+    # MTCNN is loaded on first fallback, so requests the cascade handles never pay for it
+    return TieredFaceDetector(fast, lambda image: _mtcnn()(image),
+                              min_confidence=getattr(settings, 'FACE_DETECT_MIN_CONFIDENCE', 0.8))
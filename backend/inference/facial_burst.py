@@ -0,0 +1,136 @@
+"""
+Multi-image ("burst") facial emotion detection.
+
+A burst of frames from the camera is decoded and face-cropped in parallel, run
+through the facial model in one pass and reduced to a single label, so the
+caller pays for one recommendation lookup and one history write instead of one
+per frame.
+"""
+import io
+import logging
+import os
+import shutil
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .face_detection import crop_largest_face
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+AGGREGATIONS = ('majority', 'average')
+
+
+def decode_image(data):
+    """Decode image bytes to an RGB uint8 array."""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as image:
+        return np.asarray(image.convert('RGB'))
+
+
+def aggregate_labels(labels, weights=None, method='majority'):
+    """
+    Reduce per-frame labels to one.
+
+    'majority' counts one vote per frame; 'average' weights each frame by its
+    face-detection confidence so blurred or half-visible frames count for less.
+    Ties go to the label seen first.
+
+    :return: (label, {label: vote share})
+    """
+    if method not in AGGREGATIONS:
+        raise ValueError(f"Unknown aggregation '{method}'; expected one of {', '.join(AGGREGATIONS)}")
+    if method == 'majority' or weights is None:
+        weights = [1.0] * len(labels)
+
+    votes = Counter()
+    for label, weight in zip(labels, weights):
+        votes[label] += weight
+    total = sum(votes.values())
+    best = max(votes, key=lambda label: (votes[label], -labels.index(label)))
+    return best, {label: round(vote / total, 4) for label, vote in votes.items()}
+
+
+class FacialBurst:
+    """Runs a burst of images through decode, face crop and the facial model."""
+
+    def __init__(self, infer, detector=None, workers=4):
+        """
+        :param infer: Callable image path -> emotion label (infer_facial_emotion).
+        :param detector: Optional TieredFaceDetector used to crop each frame.
+        :param workers: Threads used for decoding, cropping and inference.
+        """
+        self.infer = infer
+        self.detector = detector
+        self.workers = workers
+
+    def _prepare(self, data, path):
+        """Decode, crop to the face when one is found, and write the frame for the model."""
+        pixels = decode_image(data)
+        confidence = None
+        if self.detector:
+            detection = self.detector.detect(pixels)
+            if len(detection['boxes']):
+                pixels = crop_largest_face(pixels, detection['boxes'])
+                confidence = float(detection['confidences'].max())
+
+        from PIL import Image
+        Image.fromarray(pixels).save(path)
+        return confidence
+
+    def run(self, images, temp_dir, method='majority'):
+        """
+        :param images: List of raw image bytes.
+        :param temp_dir: Directory for the frames handed to the model; each run writes them to
+                         its own subdirectory, removed afterwards.
+        :return: dict with the aggregate emotion, vote shares and per-frame results.
+        """
+        # A private directory per run, so concurrent bursts in one process never share frame paths
+        frame_dir = tempfile.mkdtemp(prefix='temp_burst_', dir=temp_dir)
+        paths = [os.path.join(frame_dir, f'{index}.png') for index in range(len(images))]
+        timings = {}
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                started = time.perf_counter()
+                prepared = list(executor.map(self._safe, [self._prepare] * len(images), images, paths))
+                timings['decode_ms'] = (time.perf_counter() - started) * 1000
+
+                usable = [index for index, (result, error) in enumerate(prepared) if error is None]
+                started = time.perf_counter()
+                inferred = list(executor.map(self._safe, [self.infer] * len(usable), [paths[i] for i in usable]))
+                timings['inference_ms'] = (time.perf_counter() - started) * 1000
+        finally:
+            shutil.rmtree(frame_dir, ignore_errors=True)
+
+        frames = [{'index': index, 'emotion': None, 'face_confidence': None, 'error': error}
+                  for index, (_, error) in enumerate(prepared)]
+        for index, (label, error) in zip(usable, inferred):
+            frames[index].update(emotion=label or None, face_confidence=prepared[index][0], error=error)
+
+        labelled = [frame for frame in frames if frame['emotion']]
+        metrics.increment('facial_burst.frames', len(images))
+        metrics.increment('facial_burst.failed_frames', len(images) - len(labelled))
+        for name, value in timings.items():
+            metrics.observe(f'facial_burst.{name}', value)
+        if not labelled:
+            return {'emotion': None, 'votes': {}, 'frames': frames}
+
+        emotion, votes = aggregate_labels(
+            [frame['emotion'] for frame in labelled],
+            [frame['face_confidence'] if frame['face_confidence'] is not None else 1.0 for frame in labelled],
+            method,
+        )
+        return {'emotion': emotion, 'votes': votes, 'frames': frames}
+
+    @staticmethod
+    def _safe(function, *args):
+        try:
+            return function(*args), None
+        except Exception as e:
+            logger.error(f"Burst frame failed: {str(e)}")
+            return None, str(e)
@@ -0,0 +1,193 @@
+"""
+Sentence-chunked emotion detection for long texts.
+
+Long journal entries are split into sentences (over-long sentences into word
+windows, and windows that still tokenize past the model's limit into halves) so
+that nothing past the model's token limit is dropped and attention
+cost grows linearly with the number of segments. Segments are sorted by token
+length and packed into batches so that each batch is only padded to its own
+longest member. Per-segment probabilities are combined into one emotion, weighted
+by segment length.
+"""
+import logging
+import os
+import re
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .metrics import metrics
+from .model_cache import model_cache, weights_size
+
+logger = logging.getLogger(__name__)
+
+# Sentence ends at terminal punctuation (optionally followed by closing quotes or
+# brackets) and whitespace, or at a line break
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?…])["\'”’)\]]*\s+|\s*\n+\s*')
+
+
+def split_segments(text, max_words=64):
+    """
+    Split text into sentence segments of at most max_words words.
+
+    :return: List of non-empty segment strings in reading order.
+    """
+    segments = []
+    for sentence in SENTENCE_BOUNDARY.split(text):
+        words = sentence.split()
+        for start in range(0, len(words), max_words):
+            segments.append(' '.join(words[start:start + max_words]))
+    return segments
+
+
+def fit_segments(segments, count_tokens, max_tokens):
+    """
+    Halve segments until each fits in max_tokens, so subword-heavy text is not truncated.
+
+    :param count_tokens: Callable list of segments -> token count of each, special tokens included.
+    :return: Segments in reading order; a single word longer than max_tokens is kept as is.
+    """
+    fitted = []
+    for segment, count in zip(segments, count_tokens(segments)):
+        words = segment.split()
+        if count <= max_tokens or len(words) < 2:
+            fitted.append(segment)
+            continue
+        middle = len(words) // 2
+        fitted.extend(fit_segments([' '.join(words[:middle]), ' '.join(words[middle:])], count_tokens, max_tokens))
+    return fitted
+
+
+def length_buckets(lengths, batch_size):
+    """
+    Group indices into batches of similar length.
+
+    :return: List of index arrays; every index appears exactly once.
+    """
+    order = np.argsort(lengths, kind='stable')
+    return [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+
+
+class TransformerSegmentClassifier:
+    """Batched, length-bucketed inference with the fine-tuned text emotion transformer."""
+
+    def __init__(self, model_dir, batch_size=16, max_length=128, compiled=None):
+        """
+        :param compiled: Optional (module, meta) TorchScript artifact from
+                         inference.compiled.load_artifact, used instead of the eager model.
+                         Its inputs are padded to the length it was traced at, which also
+                         caps max_length.
+        """
+        from transformers import AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.padded_length = None
+        if compiled:
+            self.model, meta = compiled
+            self.labels = meta['labels']
+            self.padded_length = meta['max_length']
+            max_length = min(max_length, self.padded_length)
+        else:
+            from transformers import AutoModelForSequenceClassification
+
+            self.model = AutoModelForSequenceClassification.from_pretrained(model_dir).eval()
+            self.labels = [self.model.config.id2label[i] for i in range(self.model.config.num_labels)]
+        self.compiled = bool(compiled)
+        self.batch_size = batch_size
+        self.max_length = max_length
+
+    def count_tokens(self, segments):
+        return [len(ids) for ids in self.tokenizer(segments)['input_ids']]
+
+    def __call__(self, segments):
+        """
+        :return: (n_segments, n_labels) array of class probabilities.
+        """
+        import torch
+
+        encoded = self.tokenizer(segments, truncation=True, max_length=self.max_length)['input_ids']
+        probabilities = np.zeros((len(segments), len(self.labels)), dtype=np.float32)
+        with torch.inference_mode():
+            for batch in length_buckets([len(ids) for ids in encoded], self.batch_size):
+                # A traced graph may only be valid at the length it was traced at
+                padding = {'padding': 'max_length', 'max_length': self.padded_length} if self.compiled else {}
+                inputs = self.tokenizer.pad({'input_ids': [encoded[i] for i in batch]}, return_tensors='pt',
+                                            **padding)
+                if self.compiled:
+                    logits = self.model(inputs['input_ids'], inputs['attention_mask'])[0]
+                else:
+                    logits = self.model(**inputs).logits
+                probabilities[batch] = torch.softmax(logits, dim=-1).numpy()
+        return probabilities
+
+
+class LongTextEmotion:
+    """Splits a text into segments, classifies them in batches and aggregates the result."""
+
+    def __init__(self, classifier, labels, max_words=64, count_tokens=None, max_tokens=None):
+        """
+        :param classifier: Callable list of segments -> (n_segments, n_labels) probabilities.
+        :param labels: Label for each probability column.
+        :param max_words: Longest segment passed to the classifier, in words.
+        :param count_tokens: Optional callable list of segments -> token counts; with max_tokens,
+                             segments that would be truncated are split further.
+        """
+        self.classifier = classifier
+        self.labels = list(labels)
+        self.max_words = max_words
+        self.count_tokens = count_tokens
+        self.max_tokens = max_tokens
+
+    def analyze(self, text):
+        """
+        Return the aggregate emotion and the per-segment breakdown for text.
+
+        Each segment contributes its probability vector weighted by its word count,
+        so a long sad paragraph outweighs a short cheerful sign-off.
+        """
+        segments = split_segments(text, self.max_words)
+        if not segments:
+            raise ValueError("Text contains no words")
+        if self.count_tokens is not None and self.max_tokens:
+            segments = fit_segments(segments, self.count_tokens, self.max_tokens)
+
+        started = time.perf_counter()
+        probabilities = np.asarray(self.classifier(segments), dtype=np.float64)
+        metrics.observe('long_text.inference_ms', (time.perf_counter() - started) * 1000)
+        metrics.increment('long_text.segments', len(segments))
+
+        weights = np.array([len(segment.split()) for segment in segments], dtype=np.float64)
+        scores = weights @ probabilities / weights.sum()
+        best = probabilities.argmax(axis=1)
+        return {
+            'emotion': self.labels[int(scores.argmax())],
+            'scores': {label: round(float(score), 4) for label, score in zip(self.labels, scores)},
+            'segments': [
+                {
+                    'text': segment,
+                    'emotion': self.labels[label],
+                    'confidence': round(float(row[label]), 4),
+                    'weight': round(float(weight / weights.sum()), 4),
+                }
+                for segment, row, label, weight in zip(segments, probabilities, best, weights)
+            ],
+        }
+
+
+def get_long_text_emotion():
+    """Return the long-text analyzer, loading the transformer through the model cache."""
+    return model_cache.get('text_emotion_model', _load_long_text_emotion,
+                           expected_bytes=weights_size(os.path.join(settings.AI_ML_MODELS_DIR, 'text_emotion_model')))
+
+
+def _load_long_text_emotion():
+    from .compiled import load_artifact
+
+    model_dir = os.path.join(settings.AI_ML_MODELS_DIR, 'text_emotion_model')
+    compiled = load_artifact('text_emotion_model') if getattr(settings, 'USE_COMPILED_MODELS', True) else None
+    classifier = TransformerSegmentClassifier(model_dir, batch_size=getattr(settings, 'LONG_TEXT_BATCH_SIZE', 16),
+                                              compiled=compiled)
+    logger.debug(f"Loaded long-text segment classifier from {model_dir} (compiled: {classifier.compiled})")
+    return LongTextEmotion(classifier, classifier.labels, max_words=getattr(settings, 'LONG_TEXT_MAX_WORDS', 64),
+                           count_tokens=classifier.count_tokens, max_tokens=classifier.max_length)
@@ -0,0 +1,83 @@
+"""
+In-process metrics for the inference and recommendation layers.
+
+Counters, gauges and timings are kept per process (each gunicorn worker has its
+own registry) and exposed through the ``inference_metrics`` endpoint.
+"""
+import threading
+from collections import defaultdict, deque
+
+import numpy as np
+
+# Timings keep a bounded window of recent samples for percentiles
+TIMING_WINDOW = 2048
+
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and timing summaries."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._gauges = {}
+        self._timings = {}
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name, value_ms):
+        """Record one timing sample in milliseconds."""
+        with self._lock:
+            timing = self._timings.get(name)
+            if timing is None:
+                timing = self._timings[name] = {'count': 0, 'total': 0.0, 'max': 0.0,
+                                                'samples': deque(maxlen=TIMING_WINDOW)}
+            timing['count'] += 1
+            timing['total'] += value_ms
+            timing['max'] = max(timing['max'], value_ms)
+            timing['samples'].append(value_ms)
+
+    def counter(self, name):
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def percentile(self, name, q):
+        """Return the q-th percentile of recent samples for a timing, or None."""
+        with self._lock:
+            timing = self._timings.get(name)
+            samples = list(timing['samples']) if timing else None
+        return float(np.percentile(samples, q)) if samples else None
+
+    def snapshot(self):
+        """Return a JSON-serialisable view of every metric."""
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            timings = {name: dict(timing, samples=list(timing['samples'])) for name, timing in self._timings.items()}
+
+        summaries = {}
+        for name, timing in timings.items():
+            p50, p95, p99 = np.percentile(timing['samples'], [50, 95, 99])
+            summaries[name] = {
+                'count': timing['count'],
+                'mean_ms': round(timing['total'] / timing['count'], 3),
+                'p50_ms': round(float(p50), 3),
+                'p95_ms': round(float(p95), 3),
+                'p99_ms': round(float(p99), 3),
+                'max_ms': round(timing['max'], 3),
+            }
+        return {'counters': counters, 'gauges': gauges, 'timings': summaries}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._timings.clear()
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,260 @@
+"""
+Memory-capped LRU cache for loaded models.
+
+Every model this package loads goes through ``model_cache.get``. Loads are
+single-flight per key, the resident set is kept under MODEL_CACHE_MAX_MB by
+evicting the least recently used models, and models idle for longer than
+MODEL_CACHE_IDLE_TTL seconds are dropped by a background sweep, so a worker
+that only ever serves text does not keep the speech and face models resident.
+Room is made before a load, from the size the model had at its previous load
+or, on the first one, the size of its weights on disk, so the budget is not
+overshot while the new model and the ones it displaces are both resident.
+
+The default text, facial and wav2vec2 models are loaded and kept by ai_ml,
+outside this cache. ``reserve`` counts them against the budget as pinned
+entries, so the cap covers them too: they are never evicted, and the cached
+models get what is left. Loads and evictions are recorded in the inference
+metrics.
+"""
+import gc
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Recent load/evict events kept for the metrics endpoint
+EVENT_WINDOW = 128
+
+
+def _rss_bytes():
+    try:
+        import psutil
+    except ImportError:
+        return 0
+    return psutil.Process().memory_info().rss
+
+
+def weights_size(*paths):
+    """Bytes on disk of the given files and directories; missing paths count as 0."""
+    total = 0
+    for path in paths:
+        if os.path.isdir(path):
+            total += sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+        elif os.path.exists(path):
+            total += os.path.getsize(path)
+    return total
+
+
+def estimate_size(model):
+    """Bytes held by torch parameters and buffers, or None when model is not a torch module."""
+    parameters = getattr(model, 'parameters', None)
+    if parameters is None or not callable(parameters):
+        return None
+    try:
+        tensors = list(model.parameters()) + list(model.buffers())
+    except (TypeError, AttributeError):
+        return None
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+
+class ModelCache:
+    """LRU of loaded models bounded by memory, with idle eviction."""
+
+    def __init__(self, max_bytes=None, idle_ttl=None, clock=time.monotonic):
+        """
+        :param max_bytes: Budget for all cached models; None is unbounded.
+        :param idle_ttl: Seconds since last use after which a model is evicted; None keeps models.
+        """
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> {'model', 'bytes', 'last_used', 'pinned'}
+        self._loading = {}
+        self._loading_bytes = {}  # key -> room set aside for a load in progress
+        self._sizes = {}  # key -> bytes measured at the last load, kept across evictions
+        self._lock = threading.Lock()
+        self._events = deque(maxlen=EVENT_WINDOW)
+        self._sweeper = None
+
+    def get(self, key, loader, size=None, expected_bytes=None):
+        """
+        Return the cached model for key, loading it with loader() on a miss.
+
+        :param size: Optional callable model -> bytes. Defaults to the size of torch
+                     parameters, or the process RSS growth during the load.
+        :param expected_bytes: Optional estimate used to make room before the first load,
+                               e.g. weights_size() of its files. Later loads use the size
+                               measured at the previous one.
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and not entry['pinned']:
+                    entry['last_used'] = self.clock()
+                    self._entries.move_to_end(key)
+                    metrics.increment('model_cache.hits')
+                    return entry['model']
+                pending = self._loading.get(key)
+                if pending is None:
+                    pending = self._loading[key] = threading.Event()
+                    self._loading_bytes[key] = self._sizes.get(key, expected_bytes) or 0
+                    self._evict_over_budget()
+                    break
+            # Another thread is loading this model; wait for it rather than loading twice
+            pending.wait()
+
+        try:
+            rss_before = _rss_bytes()
+            started = time.perf_counter()
+            model = loader()
+            load_ms = (time.perf_counter() - started) * 1000
+            nbytes = size(model) if size else estimate_size(model)
+            # Frozen TorchScript modules and non-torch models report no parameters; fall back to RSS growth
+            if not nbytes:
+                nbytes = max(0, _rss_bytes() - rss_before)
+            metrics.increment('model_cache.loads')
+            metrics.observe('model_cache.load_ms', load_ms)
+
+            with self._lock:
+                self._loading_bytes.pop(key)
+                self._sizes[key] = nbytes
+                self._entries[key] = {'model': model, 'bytes': nbytes, 'last_used': self.clock(), 'pinned': False}
+                self._record('load', key, nbytes, load_ms)
+                # The estimate may have been low; trim again with the measured size
+                self._evict_over_budget(keep=key)
+            logger.debug(f"Loaded model {key} ({nbytes / 2 ** 20:.1f} MB) in {load_ms:.0f} ms")
+            self._start_sweeper()
+            return model
+        finally:
+            with self._lock:
+                self._loading_bytes.pop(key, None)
+                self._loading.pop(key).set()
+
+    def reserve(self, key, nbytes):
+        """
+        Count a model held outside the cache against the budget. Reserved entries are
+        pinned: never evicted, swept or returned by get.
+        """
+        with self._lock:
+            self._entries[key] = {'model': None, 'bytes': nbytes, 'last_used': self.clock(), 'pinned': True}
+            self._record('reserve', key, nbytes)
+            self._evict_over_budget(keep=key)
+
+    def _evict(self, key, reason):
+        entry = self._entries.pop(key)
+        metrics.increment('model_cache.evictions')
+        metrics.increment(f'model_cache.evictions.{reason}')
+        self._record(f'evict_{reason}', key, entry['bytes'])
+        logger.debug(f"Evicted model {key} ({reason})")
+
+    def _evict_over_budget(self, keep=None):
+        """Evict least recently used models until resident and loading models fit the budget."""
+        if self.max_bytes is not None:
+            for key in list(self._entries):
+                if self._total_bytes() + sum(self._loading_bytes.values()) <= self.max_bytes:
+                    break
+                if key != keep and not self._entries[key]['pinned']:
+                    self._evict(key, 'memory')
+        metrics.set_gauge('model_cache.bytes', self._total_bytes())
+        metrics.set_gauge('model_cache.models', len(self._entries))
+
+    def _total_bytes(self):
+        return sum(entry['bytes'] for entry in self._entries.values())
+
+    def _record(self, event, key, nbytes, load_ms=None):
+        self._events.append({
+            'event': event,
+            'model': key,
+            'mb': round(nbytes / 2 ** 20, 1),
+            'load_ms': round(load_ms, 1) if load_ms is not None else None,
+            'at': time.time(),
+        })
+
+    def sweep(self):
+        """Evict models idle for longer than idle_ttl."""
+        if self.idle_ttl is None:
+            return
+        now = self.clock()
+        with self._lock:
+            expired = [key for key, entry in self._entries.items()
+                       if not entry['pinned'] and now - entry['last_used'] > self.idle_ttl]
+            for key in expired:
+                self._evict(key, 'idle')
+            metrics.set_gauge('model_cache.bytes', self._total_bytes())
+            metrics.set_gauge('model_cache.models', len(self._entries))
+        if expired:
+            gc.collect()
+
+    def _start_sweeper(self):
+        if self.idle_ttl is None or self._sweeper is not None:
+            return
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(target=self._sweep_forever, name='model-cache-sweeper', daemon=True)
+        self._sweeper.start()
+
+    def _sweep_forever(self):
+        while True:
+            time.sleep(max(1.0, self.idle_ttl / 4))
+            self.sweep()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'max_mb': round(self.max_bytes / 2 ** 20, 1) if self.max_bytes is not None else None,
+                'idle_ttl_s': self.idle_ttl,
+                'models': {key: {'mb': round(entry['bytes'] / 2 ** 20, 1),
+                                 'idle_s': round(self.clock() - entry['last_used'], 1),
+                                 'pinned': entry['pinned']}
+                           for key, entry in self._entries.items()},
+                'recent_events': list(self._events),
+            }
+
+
+def _from_settings():
+    from django.conf import settings
+
+    max_mb = getattr(settings, 'MODEL_CACHE_MAX_MB', None)
+    idle_ttl = getattr(settings, 'MODEL_CACHE_IDLE_TTL', None)
+    return ModelCache(max_bytes=max_mb * 2 ** 20 if max_mb else None, idle_ttl=idle_ttl or None)
+
+
+class _LazyModelCache:
+    """Builds the process-wide cache from settings on first use."""
+
+    def __init__(self):
+        self._cache = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if self._cache is None:
+            with self._lock:
+                if self._cache is None:
+                    self._cache = _from_settings()
+        return getattr(self._cache, name)
+
+
+model_cache = _LazyModelCache()
+
+
+def reserve_external_models():
+    """
+    Reserve budget for the models ai_ml loads itself, sized by their weights under
+    AI_ML_MODELS_DIR (MODEL_CACHE_EXTERNAL_MODELS).
+    """
+    from django.conf import settings
+
+    for path in getattr(settings, 'MODEL_CACHE_EXTERNAL_MODELS', ()):
+        nbytes = weights_size(os.path.join(settings.AI_ML_MODELS_DIR, path))
+        if nbytes:
+            model_cache.reserve(f'external:{path}', nbytes)
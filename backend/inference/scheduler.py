@@ -0,0 +1,131 @@
+"""
+Priority-aware scheduling of inference work within a process.
+
+Model calls from the UI (``interactive``) and from bulk jobs (``batch``) are
+queued separately and executed by a fixed set of worker threads. Interactive
+work is dispatched first, but when both queues are waiting every
+``batch_every``-th dispatch goes to batch work, so backfills keep a guaranteed
+share of throughput; at most ``max_batch_running`` batch tasks run at once, so
+they can never occupy every worker. Queue wait is recorded per class.
+
+Scheduling is per process. Bulk work competes with live requests only when it
+reaches the serving process: ``score_emotions --grpc`` streams it to the gRPC
+server with priority 'batch'. ``score_emotions --workers 0`` uses the batch
+class of its own process, which serves no live traffic.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from functools import lru_cache
+
+from django.conf import settings
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = ('interactive', 'batch')
+
+
+class InferenceScheduler:
+    """Two-class priority queue in front of a fixed pool of inference threads."""
+
+    def __init__(self, workers=4, batch_every=4, max_batch_running=1):
+        """
+        :param workers: Threads executing inference.
+        :param batch_every: When both classes are waiting, one in this many dispatches is batch work.
+        :param max_batch_running: Upper bound on concurrently running batch tasks.
+        """
+        self.workers = workers
+        self.batch_every = batch_every
+        self.max_batch_running = min(max_batch_running, workers)
+        self._queues = {priority: deque() for priority in PRIORITIES}
+        self._condition = threading.Condition()
+        self._batch_running = 0
+        self._since_batch = 0
+        self._threads = []
+        self._closed = False
+
+    def submit(self, function, *args, priority='interactive', **kwargs):
+        """Queue function(*args, **kwargs) and return a Future for its result."""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}'; expected one of {', '.join(PRIORITIES)}")
+        future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Scheduler is shut down")
+            if not self._threads:
+                self._start()
+            self._queues[priority].append((future, function, args, kwargs, time.perf_counter()))
+            metrics.set_gauge(f'scheduler.{priority}.queued', len(self._queues[priority]))
+            self._condition.notify()
+        return future
+
+    def run(self, function, *args, priority='interactive', **kwargs):
+        """Run function through the scheduler and wait for its result."""
+        return self.submit(function, *args, priority=priority, **kwargs).result()
+
+    def _start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'inference-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _next(self):
+        """Pick the next task; caller holds the condition."""
+        interactive, batch = self._queues['interactive'], self._queues['batch']
+        batch_ready = batch and self._batch_running < self.max_batch_running
+        if interactive and not (batch_ready and self._since_batch >= self.batch_every - 1):
+            self._since_batch += 1
+            return 'interactive', interactive.popleft()
+        if batch_ready:
+            self._since_batch = 0
+            self._batch_running += 1
+            return 'batch', batch.popleft()
+        return None
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while True:
+                    picked = self._next()
+                    if picked or self._closed:
+                        break
+                    self._condition.wait()
+                if picked is None:
+                    return
+                priority, (future, function, args, kwargs, queued_at) = picked
+                metrics.set_gauge(f'scheduler.{priority}.queued', len(self._queues[priority]))
+
+            metrics.observe(f'scheduler.{priority}.wait_ms', (time.perf_counter() - queued_at) * 1000)
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(function(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+            metrics.increment(f'scheduler.{priority}.completed')
+
+            if priority == 'batch':
+                with self._condition:
+                    self._batch_running -= 1
+                    self._condition.notify()
+
+    def shutdown(self):
+        """Stop the workers once the queues have drained."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+
+@lru_cache(maxsize=1)
+def get_scheduler():
+    """Return the process-wide scheduler configured from settings."""
+    return InferenceScheduler(
+        workers=getattr(settings, 'INFERENCE_WORKERS', 4),
+        batch_every=getattr(settings, 'INFERENCE_BATCH_EVERY', 4),
+        max_batch_running=getattr(settings, 'INFERENCE_MAX_BATCH_RUNNING', 1),
+    )
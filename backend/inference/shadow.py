@@ -0,0 +1,200 @@
+"""
+Shadow evaluation of candidate emotion models on sampled live traffic.
+
+A configurable fraction of requests is replayed against a candidate model in a
+background thread after the live prediction has been made. The request never
+waits for it: submissions are dropped (and counted) when the shadow queue is
+full. Each comparison is appended to a JSONL log that ``shadow_report``
+summarizes. Inputs are logged only as a SHA-256 digest.
+"""
+import hashlib
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ShadowEvaluator:
+    """Replays sampled requests against candidate models off the request path."""
+
+    def __init__(self, candidates, sample_rate, log_path, workers=1, max_pending=16):
+        """
+        :param candidates: {modality: callable or dotted path}; a candidate takes the same
+                           input as the live model (text, or an audio/image file path).
+        :param sample_rate: Fraction of requests replayed.
+        :param log_path: JSONL file comparisons are appended to.
+        """
+        self.candidates = candidates
+        self.sample_rate = sample_rate
+        self.log_path = log_path
+        self.workers = workers
+        self.max_pending = max_pending
+        self._resolved = {}
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def maybe_submit(self, modality, source, label, latency_ms):
+        """
+        Sample this request for shadow evaluation.
+
+        :param source: Text, or path of the uploaded file; files are read now because
+                       the view deletes them once the response is built.
+        :param label: The live model's prediction.
+        :param latency_ms: The live model's latency.
+        :return: Whether the request was submitted.
+        """
+        if modality not in self.candidates or not self.sample_rate or random.random() >= self.sample_rate:
+            return False
+        with self._lock:
+            if self._pending >= self.max_pending:
+                metrics.increment('shadow.dropped')
+                return False
+            self._pending += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='shadow-eval')
+
+        try:
+            if modality == 'text':
+                payload, suffix = source, None
+            else:
+                with open(source, 'rb') as handle:
+                    payload, suffix = handle.read(), os.path.splitext(source)[1]
+        except OSError as e:
+            logger.error(f"Could not read shadow input: {str(e)}")
+            with self._lock:
+                self._pending -= 1
+            return False
+
+        metrics.increment(f'shadow.{modality}.submitted')
+        self._executor.submit(self._evaluate, modality, payload, suffix, label, latency_ms)
+        return True
+
+    def _candidate(self, modality):
+        if modality not in self._resolved:
+            candidate = self.candidates[modality]
+            self._resolved[modality] = import_string(candidate) if isinstance(candidate, str) else candidate
+        return self._resolved[modality]
+
+    def _evaluate(self, modality, payload, suffix, label, latency_ms):
+        temp_path = None
+        candidate_label, error = None, None
+        try:
+            candidate = self._candidate(modality)
+            if modality == 'text':
+                source = payload
+            else:
+                handle, temp_path = tempfile.mkstemp(suffix=suffix, prefix='shadow_')
+                with os.fdopen(handle, 'wb') as destination:
+                    destination.write(payload)
+                source = temp_path
+            started = time.perf_counter()
+            candidate_label = candidate(source)
+            candidate_ms = (time.perf_counter() - started) * 1000
+            metrics.observe(f'shadow.{modality}.candidate_ms', candidate_ms)
+        except Exception as e:
+            logger.error(f"Shadow candidate for {modality} failed: {str(e)}")
+            candidate_ms, error = None, str(e)
+        finally:
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+            with self._lock:
+                self._pending -= 1
+
+        agreed = error is None and str(candidate_label) == str(label)
+        if agreed:
+            metrics.increment(f'shadow.{modality}.agreed')
+        self._write({
+            'timestamp': time.time(),
+            'modality': modality,
+            'candidate': self._name(modality),
+            'input_sha256': hashlib.sha256(payload.encode('utf-8') if isinstance(payload, str) else payload).hexdigest(),
+            'live_label': label,
+            'candidate_label': candidate_label,
+            'agreed': agreed,
+            'live_ms': round(latency_ms, 3),
+            'candidate_ms': round(candidate_ms, 3) if candidate_ms is not None else None,
+            'error': error,
+        })
+
+    def _name(self, modality):
+        candidate = self.candidates[modality]
+        return candidate if isinstance(candidate, str) else getattr(candidate, '__name__', repr(candidate))
+
+    def _write(self, record):
+        with self._write_lock:
+            os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+            with open(self.log_path, 'a', encoding='utf-8') as handle:
+                handle.write(json.dumps(record) + '\n')
+
+
+def summarize(records):
+    """
+    Summarize shadow comparisons per (modality, candidate).
+
+    :return: List of dicts with sample count, agreement, error rate, live and
+             candidate p50/p95 latency and the p50 delta.
+    """
+    groups = {}
+    for record in records:
+        groups.setdefault((record['modality'], record['candidate']), []).append(record)
+
+    summaries = []
+    for (modality, candidate), rows in sorted(groups.items()):
+        completed = [row for row in rows if row['error'] is None]
+        live = np.array([row['live_ms'] for row in completed]) if completed else None
+        shadow = np.array([row['candidate_ms'] for row in completed]) if completed else None
+        summary = {
+            'modality': modality,
+            'candidate': candidate,
+            'samples': len(rows),
+            'error_rate': round(1 - len(completed) / len(rows), 4),
+            'agreement': round(sum(row['agreed'] for row in completed) / len(completed), 4) if completed else None,
+        }
+        if completed:
+            summary.update({
+                'live_p50_ms': round(float(np.percentile(live, 50)), 3),
+                'live_p95_ms': round(float(np.percentile(live, 95)), 3),
+                'candidate_p50_ms': round(float(np.percentile(shadow, 50)), 3),
+                'candidate_p95_ms': round(float(np.percentile(shadow, 95)), 3),
+                'p50_delta_ms': round(float(np.percentile(shadow, 50) - np.percentile(live, 50)), 3),
+            })
+        summaries.append(summary)
+    return summaries
+
+
+def read_log(path, since=None):
+    """Yield records from a shadow log, skipping a torn last line."""
+    with open(path, encoding='utf-8') as handle:
+        for line in handle:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if since is None or record['timestamp'] >= since:
+                yield record
+
+
+@lru_cache(maxsize=1)
+def get_shadow_evaluator():
+    """Return the process-wide evaluator configured from settings."""
+    return ShadowEvaluator(
+        candidates=getattr(settings, 'SHADOW_CANDIDATES', {}),
+        sample_rate=getattr(settings, 'SHADOW_SAMPLE_RATE', 0.0),
+        log_path=getattr(settings, 'SHADOW_LOG_PATH', os.path.join(settings.BASE_DIR, 'cache', 'shadow.jsonl')),
+        max_pending=getattr(settings, 'SHADOW_MAX_PENDING', 16),
+    )
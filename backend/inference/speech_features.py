@@ -0,0 +1,258 @@
+"""
+Batched feature extraction for the classical speech emotion model.
+
+The scikit-learn pipeline (``scaler.pkl`` + ``trained_speech_emotion_model.pkl``)
+consumes one hand-crafted feature vector per clip: the per-clip mean of 40 MFCCs,
+12 chroma bins and 128 mel bands. Computing those with librosa one file at a time
+repeats the STFT setup for every clip, so this module frames and transforms a whole
+batch of clips in a single set of NumPy operations and returns a matrix that can be
+passed straight to ``scaler.transform`` and ``model.predict``.
+"""
+import hashlib
+import io
+import logging
+import os
+from functools import lru_cache
+
+import joblib
+import librosa
+import numpy as np
+import scipy.fft
+from django.conf import settings
+
+from .model_cache import model_cache, weights_size
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the feature layout changes so stale cache entries are never reused
+FEATURE_VERSION = 1
+
+
+class FeatureCache:
+    """On-disk cache of feature vectors keyed by the SHA-256 of the audio bytes."""
+
+    def __init__(self, root, namespace):
+        """Initialize the cache under root/namespace."""
+        self.directory = os.path.join(root, namespace)
+        os.makedirs(self.directory, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, digest):
+        return os.path.join(self.directory, digest[:2], f'{digest}.npy')
+
+    def get(self, digest):
+        """Return the cached vector for digest, or None."""
+        try:
+            vector = np.load(self._path(digest))
+        except (FileNotFoundError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return vector
+
+    def put(self, digest, vector):
+        """Store a vector, writing atomically so concurrent workers never see partial files."""
+        path = self._path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as handle:
+            np.save(handle, vector)
+        os.replace(tmp_path, path)
+
+
+class SpeechFeatureExtractor:
+    """
+    Computes MFCC, chroma and mel features for many clips at once.
+
+    Each batch is zero-padded to a common length, framed with a strided view and
+    transformed with one FFT call; mel and chroma projections are single matrix
+    products, and the per-clip means ignore the padding frames. The output matches
+    librosa's per-file ``mfcc``/``chroma_stft``/``melspectrogram`` defaults, except
+    that chroma uses no tuning estimation.
+    """
+
+    def __init__(self, sample_rate=22050, n_fft=2048, hop_length=512, n_mfcc=40,
+                 n_chroma=12, n_mels=128, top_db=80.0, batch_size=16, cache_dir=None):
+        """Initialize the extractor and precompute the filter banks."""
+        self.sample_rate = sample_rate
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.n_mfcc = n_mfcc
+        self.n_chroma = n_chroma
+        self.n_mels = n_mels
+        self.top_db = top_db
+        self.batch_size = batch_size
+
+        self.window = librosa.filters.get_window('hann', n_fft, fftbins=True).astype(np.float32)
+        self.mel_basis = librosa.filters.mel(sr=sample_rate, n_fft=n_fft, n_mels=n_mels).T.astype(np.float32)
+        self.chroma_basis = librosa.filters.chroma(sr=sample_rate, n_fft=n_fft, n_chroma=n_chroma).T.astype(np.float32)
+
+        self.cache = FeatureCache(cache_dir, self.spec_key) if cache_dir else None
+
+    @property
+    def n_features(self):
+        return self.n_mfcc + self.n_chroma + self.n_mels
+
+    @property
+    def spec_key(self):
+        """Identifies the feature layout; used to namespace cached vectors."""
+        return (f'v{FEATURE_VERSION}-sr{self.sample_rate}-fft{self.n_fft}-hop{self.hop_length}'
+                f'-mfcc{self.n_mfcc}-chroma{self.n_chroma}-mel{self.n_mels}')
+
+    def extract(self, sources):
+        """
+        Extract features for a list of audio sources.
+
+        :param sources: File paths or raw audio bytes.
+        :return: float32 array of shape (len(sources), n_features).
+        """
+        features = np.empty((len(sources), self.n_features), dtype=np.float32)
+        pending = []
+
+        for row, source in enumerate(sources):
+            data = _read_bytes(source)
+            digest = hashlib.sha256(data).hexdigest()
+            cached = self.cache.get(digest) if self.cache else None
+            if cached is not None and cached.shape == (self.n_features,):
+                features[row] = cached
+            else:
+                pending.append((row, digest, source, data))
+
+        if pending:
+            logger.debug(f"Computing speech features for {len(pending)} of {len(sources)} clips")
+            waveforms = [self.load(source, data) for _, _, source, data in pending]
+            computed = self.extract_waveforms(waveforms)
+            for (row, digest, _, _), vector in zip(pending, computed):
+                features[row] = vector
+                if self.cache:
+                    self.cache.put(digest, vector)
+
+        return features
+
+    def load(self, source, data=None):
+        """Decode a clip to a mono waveform at the extractor's sample rate."""
+        if isinstance(source, (str, os.PathLike)):
+            waveform, _ = librosa.load(source, sr=self.sample_rate, mono=True)
+        else:
+            waveform, _ = librosa.load(io.BytesIO(data if data is not None else source), sr=self.sample_rate, mono=True)
+        return waveform
+
+    def extract_waveforms(self, waveforms):
+        """
+        Extract features for already-decoded mono waveforms.
+
+        Clips are sorted by length and processed in batches of similar length so
+        that padding stays small.
+        """
+        features = np.empty((len(waveforms), self.n_features), dtype=np.float32)
+        order = np.argsort([len(waveform) for waveform in waveforms], kind='stable')
+        for start in range(0, len(order), self.batch_size):
+            indices = order[start:start + self.batch_size]
+            features[indices] = self._extract_batch([waveforms[i] for i in indices])
+        return features
+
+    def _extract_batch(self, waveforms):
+        pad = self.n_fft // 2
+        lengths = np.array([len(waveform) for waveform in waveforms])
+        n_frames = 1 + lengths // self.hop_length
+
+        # Centre each clip the way librosa does (zero padding of n_fft // 2 on both sides)
+        width = max(int(lengths.max()) + 2 * pad, self.n_fft)
+        batch = np.zeros((len(waveforms), width), dtype=np.float32)
+        for i, waveform in enumerate(waveforms):
+            batch[i, pad:pad + len(waveform)] = waveform
+
+        frames = np.lib.stride_tricks.sliding_window_view(batch, self.n_fft, axis=1)[:, ::self.hop_length]
+        power = np.abs(scipy.fft.rfft(frames * self.window, axis=-1)) ** 2
+        mask = np.arange(power.shape[1])[None, :] < n_frames[:, None]
+
+        mel = power @ self.mel_basis
+        log_mel = 10.0 * np.log10(np.maximum(mel, 1e-10))
+        peak = np.where(mask[..., None], log_mel, -np.inf).max(axis=(1, 2))
+        log_mel = np.maximum(log_mel, (peak - self.top_db)[:, None, None])
+        mfcc = scipy.fft.dct(log_mel, type=2, norm='ortho', axis=-1)[..., :self.n_mfcc]
+
+        chroma = power @ self.chroma_basis
+        chroma_norm = chroma.max(axis=-1, keepdims=True)
+        chroma = chroma / np.where(chroma_norm < np.finfo(np.float32).tiny, 1.0, chroma_norm)
+
+        stacked = np.concatenate([mfcc, chroma, mel], axis=-1)
+        sums = np.einsum('nt,ntf->nf', mask.astype(stacked.dtype), stacked)
+        return sums / n_frames[:, None]
+
+
+def _read_bytes(source):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    with open(source, 'rb') as handle:
+        return handle.read()
+
+
+@lru_cache(maxsize=1)
+def get_default_extractor():
+    """
+    Return the process-wide extractor used for live requests.
+
+    It has no feature cache: uploads are rarely repeated, and caching them would
+    write one file per request that is never read again.
+    """
+    return SpeechFeatureExtractor()
+
+
+@lru_cache(maxsize=1)
+def get_caching_extractor():
+    """Return an extractor caching features under SPEECH_FEATURE_CACHE_DIR, for re-scoring the same files."""
+    return SpeechFeatureExtractor(cache_dir=getattr(settings, 'SPEECH_FEATURE_CACHE_DIR', None))
+
+
+def speech_classifier_paths():
+    """Return the (scaler, model) paths of the scikit-learn speech emotion model."""
+    model_dir = os.path.join(settings.AI_ML_MODELS_DIR, 'speech_emotion_model')
+    return os.path.join(model_dir, 'scaler.pkl'), os.path.join(model_dir, 'trained_speech_emotion_model.pkl')
+
+
+def _load_speech_classifier():
+    scaler_path, model_path = speech_classifier_paths()
+    scaler = joblib.load(scaler_path)
+    model = joblib.load(model_path)
+    logger.debug(f"Loaded classical speech emotion model from {os.path.dirname(model_path)}")
+    return scaler, model
+
+
+def load_speech_classifier():
+    """Return the scaler and scikit-learn speech emotion model, loading them through the model cache."""
+    return model_cache.get('speech_classifier', _load_speech_classifier,
+                           expected_bytes=weights_size(*speech_classifier_paths()))
+
+
+def predict_speech_emotions(sources, extractor=None):
+    """
+    Predict an emotion label for each audio source with one scaler/model call.
+
+    :param sources: File paths or raw audio bytes.
+    :param extractor: Optional SpeechFeatureExtractor; defaults to the process-wide extractor, which
+                      caches nothing; pass get_caching_extractor() to reuse features on disk.
+    :return: List of emotion labels, one per source.
+    """
+    extractor = extractor or get_default_extractor()
+    scaler, model = load_speech_classifier()
+    features = extractor.extract(sources)
+    return [str(label) for label in model.predict(scaler.transform(features))]
+
+
+def predict_speech_probabilities(sources, extractor=None):
+    """
+    Like predict_speech_emotions, but also return the model's confidence.
+
+    :return: (labels, confidences); confidences is None when the model has no
+             predict_proba.
+    """
+    extractor = extractor or get_default_extractor()
+    scaler, model = load_speech_classifier()
+    features = scaler.transform(extractor.extract(sources))
+    if not hasattr(model, 'predict_proba'):
+        return [str(label) for label in model.predict(features)], None
+    probabilities = model.predict_proba(features)
+    labels = [str(model.classes_[i]) for i in probabilities.argmax(axis=1)]
+    return labels, probabilities.max(axis=1)
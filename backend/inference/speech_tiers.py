@@ -0,0 +1,173 @@
+"""
+Tiered model selection for speech emotion detection.
+
+The scikit-learn pipeline (MFCC/chroma/mel features + ``scaler.pkl`` +
+``trained_speech_emotion_model.pkl``) answers by default. The SpeechBrain
+wav2vec2 classifier behind ``infer_speech_emotion`` is only used for premium
+calls or when the cheap model is unsure, and never when the latency budget
+cannot absorb it. Every routing decision and per-model latency is recorded so
+that the confidence threshold can be tuned from real traffic.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+from django.conf import settings
+
+from .metrics import metrics
+from .speech_features import predict_speech_probabilities, speech_classifier_paths
+
+logger = logging.getLogger(__name__)
+
+TIERS = ('fast', 'standard', 'premium')
+
+def parse_request_options(tier=None, latency_budget_ms=None):
+    """
+    Validate a request's tier and latency budget before any work is scheduled.
+
+    :return: (tier, budget in ms); either is None when the request left it out.
+    :raises ValueError: For an unknown tier or a budget that is not a finite, non-negative number.
+    """
+    tier = tier or None
+    if tier is not None and tier not in TIERS:
+        raise ValueError(f"Unknown speech tier '{tier}'; expected one of {', '.join(TIERS)}")
+    if latency_budget_ms in (None, ''):
+        return tier, None
+    try:
+        budget = float(latency_budget_ms)
+    except (TypeError, ValueError):
+        budget = math.nan
+    if not math.isfinite(budget) or budget < 0:
+        raise ValueError("latency_budget_ms must be a finite, non-negative number of milliseconds")
+    return tier, budget
+
+
+# Recent decisions kept for threshold tuning
+DECISION_WINDOW = 256
+
+
+class SpeechModelRouter:
+    """Routes each clip to the cheap or the heavy speech model."""
+
+    def __init__(self, classical=predict_speech_probabilities, confidence_threshold=0.6, default_tier='standard',
+                 default_budget_ms=None, classical_available=True):
+        """
+        :param classical: Callable list of sources -> (labels, confidences).
+        :param confidence_threshold: Below this the standard tier escalates.
+        :param default_tier: Tier used when a request does not name one.
+        :param default_budget_ms: Latency budget used when a request does not set one; None is unlimited.
+        :param classical_available: False routes every clip to wav2vec2.
+        """
+        self.classical = classical
+        self.confidence_threshold = confidence_threshold
+        self.default_tier = default_tier
+        self.default_budget_ms = default_budget_ms
+        self._classical_available = classical_available
+        self._decisions = deque(maxlen=DECISION_WINDOW)
+        self._lock = threading.Lock()
+
+    def predict(self, source, heavy, tier=None, latency_budget_ms=None):
+        """
+        Return the emotion for one audio clip.
+
+        :param source: Audio file path or raw bytes.
+        :param heavy: The wav2vec2 model (infer_speech_emotion).
+        :param tier: 'fast' (cheap model only), 'standard' (escalate when unsure)
+                     or 'premium' (heavy model); defaults to the configured tier.
+        :param latency_budget_ms: Skip the heavy model when its recent median latency
+                                  would not fit in what remains of the budget.
+        """
+        tier = tier or self.default_tier
+        if tier not in TIERS:
+            raise ValueError(f"Unknown speech tier '{tier}'; expected one of {', '.join(TIERS)}")
+        budget = latency_budget_ms if latency_budget_ms is not None else self.default_budget_ms
+
+        started = time.perf_counter()
+        label, confidence, reason = None, None, None
+        if not self._classical_available:
+            reason = 'no_classical_model'
+        elif tier == 'premium' and self._heavy_fits(budget, 0.0):
+            reason = 'premium'
+        else:
+            try:
+                labels, confidences = self.classical([source])
+                label = labels[0]
+                confidence = float(confidences[0]) if confidences is not None else None
+                metrics.observe('speech_router.classical_ms', (time.perf_counter() - started) * 1000)
+            except (FileNotFoundError, ImportError) as e:
+                # No trained classical model in this deployment: behave as before and always use wav2vec2
+                logger.warning(f"Classical speech model unavailable, routing everything to wav2vec2: {str(e)}")
+                self._classical_available = False
+                reason = 'no_classical_model'
+            except Exception as e:
+                # A clip the classical tier cannot decode or featurize may still work with wav2vec2
+                logger.error(f"Classical speech model failed, falling back to wav2vec2: {str(e)}")
+                reason = 'classical_error'
+
+        if reason is None:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if tier == 'premium':
+                reason = 'over_budget'
+            elif tier == 'fast':
+                reason = 'fast'
+            elif confidence is None or confidence >= self.confidence_threshold:
+                reason = 'confident'
+            elif self._heavy_fits(budget, elapsed_ms):
+                reason = 'low_confidence'
+            else:
+                reason = 'over_budget'
+
+        model = 'wav2vec2' if reason in ('premium', 'low_confidence', 'no_classical_model', 'classical_error') else 'classical'
+        if model == 'wav2vec2':
+            heavy_started = time.perf_counter()
+            label = heavy(source)
+            metrics.observe('speech_router.wav2vec2_ms', (time.perf_counter() - heavy_started) * 1000)
+
+        metrics.increment(f'speech_router.model.{model}')
+        metrics.increment(f'speech_router.reason.{reason}')
+        with self._lock:
+            self._decisions.append({
+                'tier': tier,
+                'model': model,
+                'reason': reason,
+                'confidence': round(confidence, 4) if confidence is not None else None,
+                'latency_ms': round((time.perf_counter() - started) * 1000, 3),
+            })
+        return label
+
+    def _heavy_fits(self, budget_ms, elapsed_ms):
+        if budget_ms is None:
+            return True
+        estimate = metrics.percentile('speech_router.wav2vec2_ms', 50)
+        # Without a measurement yet, let the first call through so one gets recorded
+        return estimate is None or elapsed_ms + estimate <= budget_ms
+
+    def stats(self):
+        """Routing mix and recent decisions, for tuning the threshold."""
+        with self._lock:
+            decisions = list(self._decisions)
+        return {
+            'confidence_threshold': self.confidence_threshold,
+            'default_tier': self.default_tier,
+            'default_budget_ms': self.default_budget_ms,
+            'classical_available': self._classical_available,
+            'recent_decisions': decisions,
+        }
+
+
+@lru_cache(maxsize=1)
+def get_speech_router():
+    """Return the process-wide router configured from settings."""
+    classical_available = all(os.path.exists(path) for path in speech_classifier_paths())
+    if not classical_available:
+        logger.warning("Classical speech model not found; every clip will use wav2vec2")
+    return SpeechModelRouter(
+        confidence_threshold=getattr(settings, 'SPEECH_ESCALATION_CONFIDENCE', 0.6),
+        default_tier=getattr(settings, 'SPEECH_DEFAULT_TIER', 'standard'),
+        default_budget_ms=getattr(settings, 'SPEECH_LATENCY_BUDGET_MS', None),
+        classical_available=classical_available,
+    )
@@ -0,0 +1,587 @@
+import importlib.util
+import io
+import os
+import sys
+import tempfile
+import threading
+import unittest
+import wave
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+
+from .audio_normalize import TranscodeError, TranscoderPool, pcm_to_wav
+from .batch_scoring import JsonlResultWriter, make_batches, run_scoring, score_batch
+from .benchmark import compare_results
+from .facial_burst import FacialBurst, aggregate_labels
+from .compiled import build_artifact, load_artifact
+from .face_detection import NO_FACES, TieredFaceDetector, crop_largest_face, found_no_face
+from .long_text import LongTextEmotion, TransformerSegmentClassifier, fit_segments, length_buckets, split_segments
+from .metrics import metrics
+from .model_cache import ModelCache
+from .scheduler import InferenceScheduler
+from .shadow import ShadowEvaluator, read_log, summarize
+from .speech_features import SpeechFeatureExtractor
+from .speech_tiers import SpeechModelRouter, parse_request_options
+from .text_cascade import TextEmotionCascade, distill_student
+
+
+class SpeechFeatureExtractorTestCase(SimpleTestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.waveforms = [rng.standard_normal(n).astype(np.float32) * 0.1 for n in (22050, 5123, 30000)]
+
+    # Test that batching does not change the per-clip features
+    def test_batch_matches_single_clip(self):
+        extractor = SpeechFeatureExtractor(batch_size=8)
+        batched = extractor.extract_waveforms(self.waveforms)
+
+        self.assertEqual(batched.shape, (3, extractor.n_features))
+        for waveform, row in zip(self.waveforms, batched):
+            single = extractor.extract_waveforms([waveform])[0]
+            np.testing.assert_allclose(row, single, rtol=1e-4, atol=1e-5)
+
+    # Test that features are cached by content hash
+    def test_cache_hit_skips_recompute(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            extractor = SpeechFeatureExtractor(cache_dir=cache_dir)
+            extractor.load = lambda source, data=None: self.waveforms[0]
+            first = extractor.extract([b'clip-a'])
+
+            extractor.load = lambda source, data=None: self.fail('cached clip was decoded again')
+            second = extractor.extract([b'clip-a'])
+
+        np.testing.assert_array_equal(first, second)
+        self.assertEqual(extractor.cache.hits, 1)
+
+
+class BatchScoringTestCase(SimpleTestCase):
+    # Test that batches never mix modalities or exceed the batch size
+    def test_make_batches_groups_by_modality(self):
+        items = [{'id': str(i), 'modality': 'text' if i % 3 else 'speech'} for i in range(10)]
+        batches = list(make_batches(items, batch_size=4))
+
+        for modality, batch in batches:
+            self.assertLessEqual(len(batch), 4)
+            self.assertTrue(all(item['modality'] == modality for item in batch))
+        self.assertEqual(sum(len(batch) for _, batch in batches), 10)
+
+    # Test that completed ids survive a torn final line so runs can resume
+    def test_jsonl_writer_resume(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            writer = JsonlResultWriter(os.path.join(output_dir, 'results.jsonl'))
+            writer.write([{'id': 'a', 'emotion': 'joy'}, {'id': 'b', 'emotion': 'sadness'}])
+            with open(writer.path, 'a') as handle:
+                handle.write('{"id": "c", "emo')
+
+            self.assertEqual(writer.completed_ids(), {'a', 'b'})
+
+    # Test that failed items are not treated as completed until a retry succeeds
+    def test_jsonl_writer_retries_failures(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            writer = JsonlResultWriter(os.path.join(output_dir, 'results.jsonl'))
+            writer.write([{'id': 'a', 'emotion': 'joy', 'error': None},
+                          {'id': 'b', 'emotion': None, 'error': 'decode failed'}])
+            self.assertEqual(writer.completed_ids(), {'a'})
+
+            writer.write([{'id': 'b', 'emotion': 'sadness', 'error': None}])
+            self.assertEqual(writer.completed_ids(), {'a', 'b'})
+
+    # Test that a failed classical batch is retried per item with the classical model, never wav2vec2
+    def test_classical_fallback_stays_classical(self):
+        def predict(paths, extractor):
+            if 'bad.wav' in paths:
+                raise ValueError('could not decode audio')
+            return ['hap'] * len(paths)
+
+        items = [{'id': name, 'modality': 'speech', 'path': name} for name in ('a.wav', 'bad.wav', 'b.wav')]
+        with patch('inference.speech_features.predict_speech_emotions', predict), \
+                patch('inference.speech_features.get_caching_extractor', lambda: None), \
+                patch('inference.batch_scoring._inference_function', side_effect=AssertionError('wav2vec2 used')):
+            results = score_batch('speech', items, speech_model='classical')
+
+        self.assertEqual([result['emotion'] for result in results], ['hap', None, 'hap'])
+        self.assertEqual(results[1]['error'], 'could not decode audio')
+
+    # Test that remote scoring streams every item to the server at batch priority
+    def test_run_scoring_through_grpc_client(self):
+        class Client:
+            def __init__(self):
+                self.requests = []
+
+            def stream(self, requests):
+                for request in requests:
+                    self.requests.append(request)
+                    yield SimpleNamespace(request_id=request['request_id'], emotion='' if 'image' in request else 'joy',
+                                          error='no face' if 'image' in request else '', latency_ms=1.0)
+
+        client = Client()
+        with tempfile.TemporaryDirectory() as directory:
+            image = os.path.join(directory, 'face.png')
+            with open(image, 'wb') as handle:
+                handle.write(b'png')
+            items = [{'id': 'a', 'modality': 'text', 'text': 'so happy'},
+                     {'id': 'b', 'modality': 'facial', 'path': image},
+                     {'id': 'c', 'modality': 'facial', 'path': os.path.join(directory, 'missing.png')}]
+            writer = JsonlResultWriter(os.path.join(directory, 'results.jsonl'))
+            progress = run_scoring(items, writer, workers=2, client=client)
+
+            self.assertEqual(writer.completed_ids(), {'a'})
+        self.assertEqual((progress.done, progress.errors), (3, 2))
+        self.assertEqual({request['priority'] for request in client.requests}, {'batch'})
+        self.assertEqual(sorted(request['request_id'] for request in client.requests), ['a', 'b'])
+
+
+class BenchmarkCompareTestCase(SimpleTestCase):
+    # Test that latency increases and throughput drops are both flagged as regressions
+    def test_compare_flags_regressions(self):
+        baseline = {'results': {'text/words=8/threads=1': {'p50_ms': 10.0, 'throughput_per_s': {'8': 100.0}}}}
+        current = {'results': {'text/words=8/threads=1': {'p50_ms': 12.0, 'throughput_per_s': {'8': 95.0}}}}
+        rows = {row[1]: row for row in compare_results(baseline, current, threshold_pct=10.0)}
+
+        self.assertTrue(rows['p50_ms'][5])
+        self.assertFalse(rows['throughput_per_s[8]'][5])
+
+
+class TextEmotionCascadeTestCase(SimpleTestCase):
+    def setUp(self):
+        metrics.reset()
+        self.texts = [f'{word} {filler}' for word in ('happy', 'sad') * 30 for filler in ('today', 'now')]
+        self.teacher = lambda text: 'joy' if 'happy' in text else 'sadness'
+
+    # Test that confident inputs are answered without calling the teacher
+    def test_confident_inputs_skip_teacher(self):
+        student, report = distill_student(self.texts, self.teacher, threshold=0.6)
+        cascade = TextEmotionCascade(student, threshold=0.6)
+
+        label = cascade.predict('happy today', lambda text: self.fail('teacher should not be called'))
+
+        self.assertEqual(label, 'joy')
+        self.assertEqual(report['cascade_agreement'], 1.0)
+        self.assertEqual(TextEmotionCascade.stats()['escalation_rate'], 0.0)
+
+    # Test that every request escalates when no student has been distilled
+    def test_missing_student_always_escalates(self):
+        cascade = TextEmotionCascade(None)
+
+        self.assertEqual(cascade.predict('anything', lambda text: 'neutral'), 'neutral')
+        self.assertEqual(TextEmotionCascade.stats()['escalation_rate'], 1.0)
+
+
+class LongTextEmotionTestCase(SimpleTestCase):
+    # Test that sentences are split and over-long sentences are windowed without losing words
+    def test_split_segments_keeps_every_word(self):
+        text = "I woke up late. Everything went wrong!\n" + ' '.join(['word'] * 10) + "? Fine"
+        segments = split_segments(text, max_words=4)
+
+        self.assertEqual(segments[:2], ['I woke up late.', 'Everything went wrong!'])
+        self.assertEqual(' '.join(segments).split(), text.split())
+        self.assertTrue(all(len(segment.split()) <= 4 for segment in segments))
+
+    # Test that segments over the token limit are halved until they fit, keeping every word in order
+    def test_fit_segments_to_token_limit(self):
+        def count_tokens(segments):
+            # Every word costs three subword tokens, plus two special tokens
+            return [3 * len(segment.split()) + 2 for segment in segments]
+
+        segments = fit_segments(['a b c d e f g h i j', 'short one'], count_tokens, max_tokens=14)
+
+        self.assertTrue(all(count <= 14 for count in count_tokens(segments)))
+        self.assertEqual(' '.join(segments).split(), 'a b c d e f g h i j short one'.split())
+        self.assertEqual(segments[-1], 'short one')
+
+    # Test that buckets group similar lengths and cover every index once
+    def test_length_buckets(self):
+        buckets = length_buckets([5, 1, 9, 2, 8], batch_size=2)
+
+        self.assertEqual([list(bucket) for bucket in buckets], [[1, 3], [0, 4], [2]])
+
+    # Test that the aggregate is weighted by segment length
+    def test_aggregate_weighted_by_length(self):
+        def classifier(segments):
+            return [[0.9, 0.1] if 'sad' in segment else [0.2, 0.8] for segment in segments]
+
+        analyzer = LongTextEmotion(classifier, ['sad', 'happy'], max_words=64)
+        result = analyzer.analyze("Great day. " + ' '.join(['sad'] * 20) + '.')
+
+        self.assertEqual([segment['emotion'] for segment in result['segments']], ['happy', 'sad'])
+        self.assertEqual(result['emotion'], 'sad')
+        self.assertAlmostEqual(sum(result['scores'].values()), 1.0, places=3)
+
+
+class SpeechModelRouterTestCase(SimpleTestCase):
+    def setUp(self):
+        metrics.reset()
+        self.heavy_calls = []
+
+    def heavy(self, source):
+        self.heavy_calls.append(source)
+        return 'angry'
+
+    def router(self, confidence, **kwargs):
+        return SpeechModelRouter(classical=lambda sources: (['calm'], np.array([confidence])), **kwargs)
+
+    # Test that the cheap model answers when confident and escalates when unsure
+    def test_escalates_only_below_threshold(self):
+        self.assertEqual(self.router(0.9, confidence_threshold=0.6).predict('a.wav', self.heavy), 'calm')
+        self.assertEqual(self.router(0.3, confidence_threshold=0.6).predict('b.wav', self.heavy), 'angry')
+        self.assertEqual(self.heavy_calls, ['b.wav'])
+        self.assertEqual(metrics.counter('speech_router.reason.low_confidence'), 1)
+
+    # Test tiers and the latency budget
+    def test_tiers_and_budget(self):
+        router = self.router(0.3)
+        self.assertEqual(router.predict('a.wav', self.heavy, tier='fast'), 'calm')
+        self.assertEqual(router.predict('b.wav', self.heavy, tier='premium'), 'angry')
+
+        metrics.observe('speech_router.wav2vec2_ms', 500.0)
+        self.assertEqual(router.predict('c.wav', self.heavy, latency_budget_ms=100), 'calm')
+        self.assertEqual(self.heavy_calls, ['b.wav'])
+        self.assertEqual(router.stats()['recent_decisions'][-1]['reason'], 'over_budget')
+        with self.assertRaises(ValueError):
+            router.predict('d.wav', self.heavy, tier='gold')
+
+    # Test that request options are validated before anything is scheduled
+    def test_parse_request_options(self):
+        self.assertEqual(parse_request_options('premium', '250'), ('premium', 250.0))
+        self.assertEqual(parse_request_options('', None), (None, None))
+        for tier, budget in (('gold', None), (None, 'nan'), (None, 'inf'), (None, '-5'), (None, 'abc')):
+            with self.assertRaises(ValueError):
+                parse_request_options(tier, budget)
+
+    # Test that a deployment without the classical model always uses wav2vec2
+    def test_missing_classical_model(self):
+        def missing(sources):
+            raise FileNotFoundError('scaler.pkl')
+
+        router = SpeechModelRouter(classical=missing)
+        self.assertEqual(router.predict('a.wav', self.heavy, tier='fast'), 'angry')
+        self.assertEqual(router.predict('b.wav', self.heavy), 'angry')
+        self.assertEqual(metrics.counter('speech_router.reason.no_classical_model'), 2)
+
+    # Test that a clip the classical tier fails on falls back to wav2vec2 without disabling that tier
+    def test_classical_error_falls_back(self):
+        def undecodable(sources):
+            raise ValueError('could not decode audio')
+
+        router = SpeechModelRouter(classical=undecodable)
+        self.assertEqual(router.predict('a.wav', self.heavy, tier='fast'), 'angry')
+        self.assertEqual(metrics.counter('speech_router.reason.classical_error'), 1)
+        self.assertTrue(router._classical_available)
+
+
+class TranscoderPoolTestCase(SimpleTestCase):
+    # Stand-in for ffmpeg: echoes stdin, or fails on input starting with b'bad'
+    COMMAND = [sys.executable, '-c', (
+        "import sys; data = sys.stdin.buffer.read(); "
+        "sys.exit('invalid data') if data.startswith(b'bad') else sys.stdout.buffer.write(data)"
+    )]
+
+    def setUp(self):
+        metrics.reset()
+        self.pool = TranscoderPool(size=2, timeout=10, command=self.COMMAND)
+
+    def tearDown(self):
+        self.pool.close()
+
+    # Test that warm processes are reused across transcodes and failures are counted
+    def test_transcode_and_failure(self):
+        pcm = np.linspace(-1, 1, 100, dtype='<f4')
+        for _ in range(3):
+            np.testing.assert_array_equal(self.pool.transcode(pcm.tobytes()), pcm)
+
+        with self.assertRaises(TranscodeError):
+            self.pool.transcode(b'bad input')
+        self.assertEqual(metrics.counter('audio_transcode.failures'), 1)
+        self.assertEqual(metrics.snapshot()['timings']['audio_transcode.transcode_ms']['count'], 3)
+
+    # Test that PCM is wrapped as a 16 kHz mono WAV
+    def test_pcm_to_wav(self):
+        with wave.open(io.BytesIO(pcm_to_wav(np.zeros(1600, dtype=np.float32)))) as handle:
+            self.assertEqual((handle.getnchannels(), handle.getframerate(), handle.getnframes()), (1, 16000, 1600))
+
+
+class TieredFaceDetectorTestCase(SimpleTestCase):
+    def setUp(self):
+        metrics.reset()
+        self.image = np.zeros((100, 200, 3), dtype=np.uint8)
+        self.fallback_calls = 0
+
+    def fallback(self, image):
+        self.fallback_calls += 1
+        return np.array([[10, 10, 50, 60]], dtype=np.float32), np.array([0.99], dtype=np.float32)
+
+    def fast(self, confidence):
+        return lambda image: (np.array([[0, 0, 30, 30]], dtype=np.float32), np.array([confidence], dtype=np.float32))
+
+    # Test that the fallback only runs when the fast stage is missing or unsure
+    def test_fallback_only_when_needed(self):
+        self.assertEqual(TieredFaceDetector(self.fast(0.95), self.fallback).detect(self.image)['stage'], 'fast')
+        self.assertEqual(self.fallback_calls, 0)
+
+        detection = TieredFaceDetector(self.fast(0.5), self.fallback).detect(self.image)
+        self.assertEqual(detection['stage'], 'fallback')
+        self.assertIn('fallback_ms', detection['timings_ms'])
+
+        detection = TieredFaceDetector(lambda image: NO_FACES, lambda image: NO_FACES).detect(self.image)
+        self.assertEqual(detection['stage'], 'none')
+
+    # Test that the crop picks the largest face and stays inside the image
+    def test_crop_largest_face(self):
+        boxes = np.array([[0, 0, 10, 10], [150, 40, 200, 100]], dtype=np.float32)
+        crop = crop_largest_face(self.image, boxes, margin=0.2)
+
+        self.assertEqual(crop.shape, (72, 60, 3))
+
+    # Test that crop_to_face reports the latency it adds ahead of the emotion model
+    def test_crop_to_face_records_latency(self):
+        from PIL import Image
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'frame.png')
+            Image.fromarray(self.image).save(path)
+            crop_path, summary = TieredFaceDetector(self.fast(0.95), self.fallback).crop_to_face(path)
+
+            self.assertTrue(os.path.exists(crop_path))
+        self.assertIn('crop_ms', summary['timings_ms'])
+        self.assertEqual(metrics.snapshot()['timings']['face_detect.crop_ms']['count'], 1)
+
+    # Test that the emotion model is only skipped when detection ran and found no face
+    def test_found_no_face(self):
+        from PIL import Image
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'frame.png')
+            Image.fromarray(self.image).save(path)
+            crop_path, summary = TieredFaceDetector(lambda image: NO_FACES, lambda image: NO_FACES).crop_to_face(path)
+            self.assertIsNone(crop_path)
+            self.assertTrue(found_no_face(summary))
+            self.assertFalse(found_no_face(TieredFaceDetector(self.fast(0.95), self.fallback).crop_to_face(path)[1]))
+        self.assertFalse(found_no_face(None))
+
+
+class FacialBurstTestCase(SimpleTestCase):
+    def frame(self, shade):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.fromarray(np.full((32, 32, 3), shade, dtype=np.uint8)).save(buffer, format='PNG')
+        return buffer.getvalue()
+
+    # Test majority and confidence-weighted aggregation
+    def test_aggregate_labels(self):
+        labels = ['happy', 'sad', 'sad', 'happy', 'neutral']
+        self.assertEqual(aggregate_labels(labels)[0], 'happy')
+        label, votes = aggregate_labels(labels, [0.2, 0.9, 0.9, 0.2, 0.5], method='average')
+        self.assertEqual(label, 'sad')
+        self.assertAlmostEqual(sum(votes.values()), 1.0, places=3)
+
+    # Test that every frame is classified, bad frames are reported and temp files removed
+    def test_run_burst(self):
+        from PIL import Image
+
+        def infer(path):
+            return 'happy' if Image.open(path).getpixel((0, 0))[0] > 128 else 'sad'
+
+        with tempfile.TemporaryDirectory() as directory:
+            result = FacialBurst(infer).run([self.frame(200), self.frame(10), self.frame(250), b'not an image'],
+                                           directory)
+            self.assertEqual(os.listdir(directory), [])
+
+        self.assertEqual(result['emotion'], 'happy')
+        self.assertEqual([frame['emotion'] for frame in result['frames']], ['happy', 'sad', 'happy', None])
+        self.assertIsNotNone(result['frames'][3]['error'])
+
+    # Test that concurrent bursts in one process never write to the same frame paths
+    def test_concurrent_bursts_use_separate_frames(self):
+        seen, lock = [], threading.Lock()
+        barrier = threading.Barrier(4)
+
+        def infer(path):
+            with lock:
+                seen.append(path)
+            return 'happy'
+
+        def run():
+            barrier.wait()
+            FacialBurst(infer, workers=2).run([self.frame(200), self.frame(10)], directory)
+
+        with tempfile.TemporaryDirectory() as directory:
+            threads = [threading.Thread(target=run) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(os.listdir(directory), [])
+
+        self.assertEqual(len(seen), 8)
+        self.assertEqual(len(set(seen)), 8)
+
+
+@unittest.skipUnless(importlib.util.find_spec('torch'), 'torch is not installed')
+class CompiledArtifactTestCase(SimpleTestCase):
+    # Test that a compiled artifact matches the eager model and is tied to the weights version
+    def test_build_and_load_facial_artifact(self):
+        import torch
+
+        model = torch.nn.Sequential(torch.nn.Conv2d(1, 4, 3), torch.nn.Flatten(), torch.nn.Linear(4 * 46 * 46, 7))
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(AI_ML_MODELS_DIR=directory, COMPILED_MODELS_DIR=os.path.join(directory, 'compiled')):
+            source = os.path.join(directory, 'facial_emotion_model', 'trained_facial_emotion_model.pt')
+            os.makedirs(os.path.dirname(source))
+            torch.save(model, source)
+
+            self.assertTrue(build_artifact('facial_emotion_model')[1])
+            self.assertFalse(build_artifact('facial_emotion_model')[1])
+            module, meta = load_artifact('facial_emotion_model')
+            for batch_size in (1, 4):
+                sample = torch.rand(batch_size, 1, 48, 48)
+                torch.testing.assert_close(module(sample), model(sample))
+
+            os.utime(source, ns=(0, 0))
+            self.assertIsNone(load_artifact('facial_emotion_model'))
+
+    # Test that the text artifact matches the eager model across batch sizes and segment lengths
+    @unittest.skipUnless(importlib.util.find_spec('transformers'), 'transformers is not installed')
+    def test_text_artifact_serves_long_text_shapes(self):
+        from transformers import BertConfig, BertForSequenceClassification, BertTokenizer
+
+        words = ['calm', 'happy', 'sad', 'angry', 'rain', 'sun', 'day', 'night']
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(AI_ML_MODELS_DIR=directory, COMPILED_MODELS_DIR=os.path.join(directory, 'compiled')):
+            source = os.path.join(directory, 'text_emotion_model')
+            os.makedirs(source)
+            with open(os.path.join(source, 'vocab.txt'), 'w', encoding='utf-8') as handle:
+                handle.write('\n'.join(['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]'] + words))
+            BertTokenizer(os.path.join(source, 'vocab.txt')).save_pretrained(source)
+            config = BertConfig(vocab_size=len(words) + 5, hidden_size=16, num_hidden_layers=1, num_attention_heads=2,
+                                intermediate_size=32, max_position_embeddings=160, num_labels=3)
+            BertForSequenceClassification(config).save_pretrained(source)
+
+            build_artifact('text_emotion_model')
+            eager = TransformerSegmentClassifier(source)
+            compiled = TransformerSegmentClassifier(source, compiled=load_artifact('text_emotion_model'))
+            # 17 segments at batch size 16 make a full batch and a batch of one
+            segments = [' '.join(words[i % len(words)] for i in range(length)) for length in range(1, 170, 10)]
+            np.testing.assert_allclose(compiled(segments), eager(segments), atol=1e-5)
+            np.testing.assert_allclose(compiled(segments[:3]), eager(segments[:3]), atol=1e-5)
+
+
+class ModelCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        metrics.reset()
+        self.now = 0.0
+        self.cache = ModelCache(max_bytes=100, idle_ttl=60, clock=lambda: self.now)
+
+    def load(self, key, nbytes=40):
+        return self.cache.get(key, lambda: object(), size=lambda model: nbytes)
+
+    # Test that the least recently used model is evicted when over the memory budget
+    def test_lru_eviction_under_budget(self):
+        a = self.load('a')
+        self.load('b')
+        self.assertIs(self.load('a'), a)
+        self.load('c')
+
+        self.assertEqual(sorted(self.cache.stats()['models']), ['a', 'c'])
+        self.assertEqual(metrics.counter('model_cache.evictions.memory'), 1)
+        self.assertEqual(metrics.counter('model_cache.loads'), 3)
+
+    # Test that idle models are swept
+    def test_idle_eviction(self):
+        self.load('a')
+        self.now = 30
+        self.load('b')
+        self.now = 80
+        self.cache.sweep()
+
+        self.assertEqual(list(self.cache.stats()['models']), ['b'])
+        self.assertEqual(self.cache.stats()['recent_events'][-1]['event'], 'evict_idle')
+
+    # Test that room is made before a load, from the expected size or the size at the previous load
+    def test_evicts_before_loading(self):
+        resident = []
+
+        def loader():
+            resident.append(sorted(self.cache.stats()['models']))
+            return object()
+
+        self.load('a')
+        self.load('b')
+        self.cache.get('c', loader, size=lambda model: 40, expected_bytes=40)
+        self.assertEqual(resident[-1], ['b'])
+
+        self.cache.clear()
+        self.load('a')
+        self.load('b')
+        self.cache.get('c', loader, size=lambda model: 40)
+        self.assertEqual(resident[-1], ['b'])
+
+    # Test that reserved models count against the budget but are never evicted
+    def test_reserved_models_are_pinned(self):
+        self.cache.reserve('external', 50)
+        self.load('a')
+        self.load('b')
+        self.now = 200
+        self.cache.sweep()
+
+        self.assertEqual(list(self.cache.stats()['models']), ['external'])
+        self.assertTrue(self.cache.stats()['models']['external']['pinned'])
+
+
+class ShadowEvaluatorTestCase(SimpleTestCase):
+    # Test that sampled requests are replayed, logged and summarized
+    def test_shadow_log_and_summary(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log_path = os.path.join(directory, 'shadow.jsonl')
+            image_path = os.path.join(directory, 'face.jpg')
+            with open(image_path, 'wb') as handle:
+                handle.write(b'image bytes')
+
+            evaluator = ShadowEvaluator({'text': lambda text: 'happy' if 'good' in text else 'sad',
+                                         'facial': lambda path: open(path, 'rb').read().decode()},
+                                        sample_rate=1.0, log_path=log_path)
+            self.assertTrue(evaluator.maybe_submit('text', 'a good day', 'happy', 5.0))
+            self.assertTrue(evaluator.maybe_submit('text', 'a bad day', 'happy', 7.0))
+            self.assertTrue(evaluator.maybe_submit('facial', image_path, 'image bytes', 20.0))
+            self.assertFalse(evaluator.maybe_submit('speech', image_path, 'calm', 1.0))
+            evaluator._executor.shutdown(wait=True)
+
+            summaries = {summary['modality']: summary for summary in summarize(read_log(log_path))}
+            self.assertEqual(summaries['text']['samples'], 2)
+            self.assertEqual(summaries['text']['agreement'], 0.5)
+            self.assertEqual(summaries['facial']['agreement'], 1.0)
+            self.assertNotIn('a good day', open(log_path).read())
+
+
+class InferenceSchedulerTestCase(SimpleTestCase):
+    def setUp(self):
+        metrics.reset()
+
+    # Test that interactive work goes first while batch work keeps a bounded share
+    def test_interactive_first_with_batch_share(self):
+        scheduler = InferenceScheduler(workers=1, batch_every=3, max_batch_running=1)
+        order = []
+        gate = threading.Event()
+        blocker = scheduler.submit(gate.wait)
+
+        futures = [scheduler.submit(order.append, f'b{i}', priority='batch') for i in range(3)]
+        futures += [scheduler.submit(order.append, f'i{i}') for i in range(5)]
+        gate.set()
+        blocker.result()
+        for future in futures:
+            future.result(timeout=5)
+        scheduler.shutdown()
+
+        # The blocker was the first interactive dispatch, so b0 follows i0
+        self.assertEqual(order, ['i0', 'b0', 'i1', 'i2', 'b1', 'i3', 'i4', 'b2'])
+        self.assertEqual(metrics.snapshot()['timings']['scheduler.batch.wait_ms']['count'], 3)
+
+    # Test that exceptions reach the caller
+    def test_exception_propagates(self):
+        scheduler = InferenceScheduler(workers=1)
+        with self.assertRaises(ZeroDivisionError):
+            scheduler.run(lambda: 1 / 0)
+        scheduler.shutdown()
@@ -0,0 +1,189 @@
+"""
+Confidence-gated cascade for text emotion detection.
+
+A linear model over hashed word n-grams, distilled from the transformer's own
+predictions, answers every request whose top-class probability clears a
+threshold; only the remaining, ambiguous inputs are escalated to the transformer
+(``infer_text_emotion``). Without a trained student every request escalates, which
+is exactly the previous behaviour.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import joblib
+import numpy as np
+from django.conf import settings
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on audits waiting for the transformer, so audits never pile up under load
+MAX_PENDING_AUDITS = 32
+
+
+def build_student():
+    """Return an untrained hashed n-gram + logistic regression pipeline."""
+    from sklearn.feature_extraction.text import HashingVectorizer
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.pipeline import make_pipeline
+
+    return make_pipeline(
+        HashingVectorizer(ngram_range=(1, 2), n_features=2 ** 18, alternate_sign=False, lowercase=True),
+        SGDClassifier(loss='log_loss', alpha=1e-5, max_iter=50, tol=1e-4, random_state=0),
+    )
+
+
+def distill_student(texts, teacher, holdout=0.2, threshold=0.9, seed=0):
+    """
+    Label texts with the teacher, fit a student and evaluate it on a held-out split.
+
+    :param texts: Training texts, ideally sampled from real traffic.
+    :param teacher: Callable text -> label (the transformer).
+    :return: (student, report) where report holds held-out agreement, escalation
+             rate at threshold and mean per-request cost of both models.
+    """
+    texts = list(texts)
+    teacher_ms = []
+    labels = []
+    for text in texts:
+        started = time.perf_counter()
+        labels.append(teacher(text))
+        teacher_ms.append((time.perf_counter() - started) * 1000)
+
+    order = list(range(len(texts)))
+    random.Random(seed).shuffle(order)
+    split = int(len(order) * (1 - holdout))
+    train, test = order[:split], order[split:]
+
+    student = build_student()
+    student.fit([texts[i] for i in train], [labels[i] for i in train])
+
+    report = {'train_size': len(train), 'holdout_size': len(test), 'threshold': threshold}
+    if test:
+        started = time.perf_counter()
+        probabilities = student.predict_proba([texts[i] for i in test])
+        student_ms = (time.perf_counter() - started) * 1000 / len(test)
+        predicted = student.classes_[probabilities.argmax(axis=1)]
+        confident = probabilities.max(axis=1) >= threshold
+        truth = np.array([labels[i] for i in test])
+
+        escalation_rate = 1 - confident.mean()
+        mean_teacher_ms = float(np.mean(teacher_ms))
+        report.update({
+            'student_agreement': round(float((predicted == truth).mean()), 4),
+            'confident_agreement': round(float((predicted[confident] == truth[confident]).mean()), 4)
+            if confident.any() else None,
+            'cascade_agreement': round(float(np.where(confident, predicted == truth, True).mean()), 4),
+            'escalation_rate': round(float(escalation_rate), 4),
+            'teacher_ms': round(mean_teacher_ms, 3),
+            'student_ms': round(student_ms, 3),
+            'cascade_ms': round(student_ms + escalation_rate * mean_teacher_ms, 3),
+        })
+    return student, report
+
+
+class TextEmotionCascade:
+    """Answers with the student when confident, otherwise escalates to the teacher."""
+
+    def __init__(self, student=None, threshold=0.9, audit_rate=0.0):
+        """
+        :param student: Fitted pipeline with predict_proba, or None to always escalate.
+        :param threshold: Minimum top-class probability for the student to answer.
+        :param audit_rate: Fraction of student answers re-checked against the teacher
+                           in the background to track live agreement.
+        """
+        self.student = student
+        self.threshold = threshold
+        self.audit_rate = audit_rate
+        self._audit_executor = None
+        self._pending_audits = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path, threshold=0.9, audit_rate=0.0):
+        student = None
+        if os.path.exists(path):
+            student = joblib.load(path)
+            logger.debug(f"Loaded text cascade student from {path}")
+        else:
+            logger.debug(f"No text cascade student at {path}; every request will use the transformer")
+        return cls(student, threshold, audit_rate)
+
+    def predict(self, text, teacher):
+        """
+        Return the emotion for text.
+
+        :param teacher: The full model, called only when the student is not confident.
+        """
+        metrics.increment('text_cascade.requests')
+        if self.student is not None:
+            started = time.perf_counter()
+            probabilities = self.student.predict_proba([text])[0]
+            metrics.observe('text_cascade.student_ms', (time.perf_counter() - started) * 1000)
+
+            best = int(probabilities.argmax())
+            if probabilities[best] >= self.threshold:
+                label = str(self.student.classes_[best])
+                metrics.increment('text_cascade.answered')
+                if self.audit_rate and random.random() < self.audit_rate:
+                    self._submit_audit(text, label, teacher)
+                return label
+
+        metrics.increment('text_cascade.escalated')
+        started = time.perf_counter()
+        label = teacher(text)
+        metrics.observe('text_cascade.teacher_ms', (time.perf_counter() - started) * 1000)
+        return label
+
+    def _submit_audit(self, text, label, teacher):
+        with self._lock:
+            if self._pending_audits >= MAX_PENDING_AUDITS:
+                return
+            self._pending_audits += 1
+            if self._audit_executor is None:
+                self._audit_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='text-cascade-audit')
+        self._audit_executor.submit(self._audit, text, label, teacher)
+
+    def _audit(self, text, label, teacher):
+        try:
+            agrees = teacher(text) == label
+            metrics.increment('text_cascade.audited')
+            if agrees:
+                metrics.increment('text_cascade.audit_agreed')
+        except Exception as e:
+            logger.error(f"Text cascade audit failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._pending_audits -= 1
+
+    @staticmethod
+    def stats():
+        """Escalation rate and audited agreement since process start."""
+        requests = metrics.counter('text_cascade.requests')
+        audited = metrics.counter('text_cascade.audited')
+        return {
+            'requests': requests,
+            'escalation_rate': metrics.counter('text_cascade.escalated') / requests if requests else None,
+            'audited': audited,
+            'agreement': metrics.counter('text_cascade.audit_agreed') / audited if audited else None,
+        }
+
+
+def student_path():
+    return os.path.join(settings.AI_ML_MODELS_DIR, 'text_cascade', 'student.joblib')
+
+
+@lru_cache(maxsize=1)
+def get_text_cascade():
+    """Return the process-wide cascade configured from settings."""
+    return TextEmotionCascade.load(
+        student_path(),
+        threshold=getattr(settings, 'TEXT_CASCADE_THRESHOLD', 0.9),
+        audit_rate=getattr(settings, 'TEXT_CASCADE_AUDIT_RATE', 0.0),
+    )
@@ -0,0 +1,126 @@
+"""
+Stale-while-revalidate cache for Spotify recommendations.
+
+The key space is tiny (emotion labels x markets), so each (emotion, market) is
+computed once per RECOMMENDATION_CACHE_TTL and shared by every worker through
+the Django cache. For RECOMMENDATION_CACHE_STALE seconds after that an entry
+is still served immediately while a single background refresh replaces it; the
+refresh is claimed with ``cache.add``, so only one worker performs it. Bumping
+RECOMMENDATION_STRATEGY_VERSION changes every key, which invalidates the cache
+when the ranking logic changes.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+
+from inference.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class RecommendationCache:
+    """TTL cache with a stale window in front of a recommendation function."""
+
+    def __init__(self, fresh_ttl=600, stale_ttl=3600, version=1, cache=None, clock=time.time, refresh_timeout=30):
+        """
+        :param fresh_ttl: Seconds an entry is served without refreshing.
+        :param stale_ttl: Seconds after that it is still served while being refreshed.
+        :param version: Strategy version, part of every key.
+        :param cache: Django cache backend; defaults to RECOMMENDATION_CACHE_ALIAS.
+        :param refresh_timeout: Seconds a refresh claim is held, so a crashed refresh is retried.
+        """
+        self.fresh_ttl = fresh_ttl
+        self.stale_ttl = stale_ttl
+        self.version = version
+        self.cache = cache if cache is not None else caches[getattr(settings, 'RECOMMENDATION_CACHE_ALIAS', 'default')]
+        self.clock = clock
+        self.refresh_timeout = refresh_timeout
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def key(self, emotion, market=None):
+        return f'recommendations:v{self.version}:{emotion}:{market or "-"}'
+
+    def get(self, emotion, market, compute):
+        """
+        Return recommendations for (emotion, market), calling compute(emotion, market) on a miss.
+
+        Stale entries are returned as-is and refreshed in the background.
+        """
+        key = self.key(emotion, market)
+        entry = self.cache.get(key)
+        if entry is not None:
+            if self.clock() < entry['fresh_until']:
+                metrics.increment('recommendation_cache.hits')
+            else:
+                metrics.increment('recommendation_cache.stale_hits')
+                self._revalidate(key, emotion, market, compute)
+            return entry['tracks']
+
+        metrics.increment('recommendation_cache.misses')
+        started = time.perf_counter()
+        tracks = compute(emotion, market)
+        metrics.observe('recommendation_cache.compute_ms', (time.perf_counter() - started) * 1000)
+        self._store(key, tracks)
+        return tracks
+
+    def peek(self, emotion, market=None):
+        """Return whatever is cached for (emotion, market), fresh or stale, without computing or refreshing."""
+        entry = self.cache.get(self.key(emotion, market))
+        return entry['tracks'] if entry is not None else None
+
+    def _store(self, key, tracks):
+        # Empty results are usually an upstream hiccup; caching them would hide tracks for a whole TTL
+        if tracks:
+            self.cache.set(key, {'tracks': tracks, 'fresh_until': self.clock() + self.fresh_ttl},
+                           timeout=self.fresh_ttl + self.stale_ttl)
+
+    def _revalidate(self, key, emotion, market, compute):
+        if not self.cache.add(f'{key}:refreshing', True, timeout=self.refresh_timeout):
+            return
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='recommendation-refresh')
+        self._executor.submit(self._refresh, key, emotion, market, compute)
+
+    def _refresh(self, key, emotion, market, compute):
+        started = time.perf_counter()
+        try:
+            self._store(key, compute(emotion, market))
+            metrics.observe('recommendation_cache.refresh_ms', (time.perf_counter() - started) * 1000)
+        except Exception as e:
+            metrics.increment('recommendation_cache.refresh_failures')
+            logger.error(f"Refreshing recommendations for {emotion}/{market} failed: {str(e)}")
+        finally:
+            self.cache.delete(f'{key}:refreshing')
+
+    def invalidate(self, emotion, market=None):
+        self.cache.delete(self.key(emotion, market))
+
+    def stats(self):
+        hits = metrics.counter('recommendation_cache.hits')
+        stale = metrics.counter('recommendation_cache.stale_hits')
+        misses = metrics.counter('recommendation_cache.misses')
+        total = hits + stale + misses
+        return {
+            'version': self.version,
+            'fresh_ttl_s': self.fresh_ttl,
+            'stale_ttl_s': self.stale_ttl,
+            'hit_rate': round((hits + stale) / total, 4) if total else None,
+            'stale_rate': round(stale / total, 4) if total else None,
+        }
+
+
+@lru_cache(maxsize=1)
+def get_recommendation_cache():
+    """Return the process-wide recommendation cache configured from settings."""
+    return RecommendationCache(
+        fresh_ttl=getattr(settings, 'RECOMMENDATION_CACHE_TTL', 600),
+        stale_ttl=getattr(settings, 'RECOMMENDATION_CACHE_STALE', 3600),
+        version=getattr(settings, 'RECOMMENDATION_STRATEGY_VERSION', 1),
+    )
@@ -0,0 +1,219 @@
+"""
+Local, mood-indexed track catalog.
+
+Recommendations are served from an in-memory index of the ``songs`` table,
+so the request path never waits on Spotify: tracks with audio features are
+ranked by distance to the emotion's point in feature space (see
+``vector_space``), and the (mood, market) index of Spotify search results
+covers tracks whose features are not known yet. A track found by several
+mood searches is indexed under each of them (``song_moods``), and each refresh
+of a (mood, market) replaces that pair's members. A
+background thread keeps the table populated: when the newest refresh recorded
+in ``song_moods`` is older than CATALOG_REFRESH_INTERVAL it fetches every
+(mood, market) from the Spotify-backed source and upserts the results; otherwise
+it only reloads the index, so workers sharing one database do not all refresh.
+"""
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from inference.metrics import metrics
+
+from .moods import canonical_mood
+from .vector_space import build_feature_space
+
+logger = logging.getLogger(__name__)
+
+# Track ids per audio-features request (the Spotify API maximum)
+FEATURES_BATCH = 100
+
+
+def track_to_song(track):
+    """Convert a track as returned by get_music_recommendation into a songs row."""
+    return {
+        'song_id': track.get('id') or track['external_url'].rstrip('/').split('/')[-1],
+        'title': track['name'],
+        'artist': track['artist'],
+        'album': track.get('album'),
+        'spotify_url': track.get('external_url'),
+        'preview_url': track.get('preview_url'),
+    }
+
+
+def song_to_track(song):
+    """Convert a songs row into the track format of get_music_recommendation."""
+    return {
+        'name': song['title'],
+        'artist': song['artist'],
+        'preview_url': song.get('preview_url'),
+        'external_url': song['spotify_url'] or f"https://open.spotify.com/track/{song['song_id']}",
+    }
+
+
+class TrackCatalog:
+    """In-memory (mood, market) index over the songs table, refreshed in the background."""
+
+    def __init__(self, dao, fetch, moods, markets, refresh_interval=6 * 3600, min_tracks=10, features=None):
+        """
+        :param dao: SongDAO.
+        :param fetch: Callable (mood, market) -> tracks, or a dotted path to one; only
+                      called by refresh().
+        :param features: Callable [song_id] -> {song_id: audio features}, or a dotted path;
+                         called by refresh() for songs without features. None disables it.
+        :param markets: Markets to index; the first one serves requests without a market.
+        :param refresh_interval: Seconds between refreshes from fetch.
+        :param min_tracks: Smallest pool recommend() serves from; smaller pools report a miss.
+        """
+        self.dao = dao
+        self.fetch = fetch
+        self.moods = list(moods)
+        self.markets = list(markets)
+        self.refresh_interval = refresh_interval
+        self.min_tracks = min_tracks
+        self.features = features
+        self._index = {}
+        self.space = build_feature_space([])
+        self._refresh_lock = threading.Lock()
+        self._thread = None
+        self.loaded_at = None
+        self.refreshed_at = None
+
+    def load(self):
+        """Rebuild the index from the songs table; returns the number of indexed tracks."""
+        songs = self.dao.get_catalog()
+        index = {}
+        for song in songs:
+            index.setdefault((song['mood'], song['market']), []).append(song_to_track(song))
+        space = build_feature_space(songs)
+        # Swapped by assignment, so readers see either the old or the new index
+        self._index, self.space = index, space
+        self.loaded_at = time.time()
+        total = sum(len(tracks) for tracks in index.values())
+        metrics.set_gauge('catalog.tracks', total)
+        metrics.set_gauge('catalog.tracks_with_features', len(space))
+        return total
+
+    def refresh(self):
+        """Fetch every (mood, market) from the source, upsert it and reload the index."""
+        with self._refresh_lock:
+            fetch = import_string(self.fetch) if isinstance(self.fetch, str) else self.fetch
+            started = time.perf_counter()
+            failures = 0
+            for mood in self.moods:
+                for market in self.markets:
+                    try:
+                        tracks = fetch(mood, market)
+                        self.dao.upsert_songs([track_to_song(track) for track in tracks], mood, market)
+                    except Exception as e:
+                        failures += 1
+                        logger.error(f"Catalog refresh failed for {mood}/{market}: {str(e)}")
+            self._fill_features()
+            metrics.observe('catalog.refresh_ms', (time.perf_counter() - started) * 1000)
+            metrics.increment('catalog.refresh_failures', failures)
+            self.refreshed_at = time.time()
+            return self.load()
+
+    def _fill_features(self):
+        if self.features is None:
+            return
+        features = import_string(self.features) if isinstance(self.features, str) else self.features
+        missing = self.dao.get_song_ids_without_features()
+        for start in range(0, len(missing), FEATURES_BATCH):
+            try:
+                found = features(missing[start:start + FEATURES_BATCH])
+            except Exception as e:
+                logger.error(f"Fetching audio features failed: {str(e)}")
+                return
+            if found:
+                self.dao.update_features(found)
+
+    def is_stale(self):
+        last = self.dao.get_last_refreshed()
+        return last is None or datetime.utcnow() - last > timedelta(seconds=self.refresh_interval)
+
+    def tracks(self, mood, market=None):
+        """All indexed tracks for mood in market (the default market when None)."""
+        return self._index.get((canonical_mood(mood), market or self.markets[0]), [])
+
+    def recommend(self, mood, market=None, limit=10):
+        """
+        Up to limit tracks for mood: the nearest in feature space when enough tracks in
+        market have features, otherwise a sample of the mood's search results.
+
+        :return: List of tracks, or None when the catalog has fewer than min_tracks for
+                 (mood, market) and the caller should ask Spotify instead.
+        """
+        mood = canonical_mood(mood)
+        market = market or self.markets[0]
+        space = self.space
+        if mood in space.targets and space.size(market) >= self.min_tracks:
+            positions, _ = space.for_emotion(mood, limit, market)
+            metrics.increment('catalog.hits')
+            metrics.increment('catalog.feature_hits')
+            return [song_to_track(space.songs[position]) for position in positions]
+
+        pool = self.tracks(mood, market)
+        if len(pool) < self.min_tracks:
+            metrics.increment('catalog.misses')
+            return None
+        metrics.increment('catalog.hits')
+        return random.sample(pool, min(limit, len(pool)))
+
+    def start(self):
+        """Load the index and keep it fresh from a daemon thread; safe to call repeatedly."""
+        with self._refresh_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='catalog-refresh', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                if self.is_stale():
+                    self.refresh()
+                else:
+                    # Tracks added before features were fetched (or while fetching failed) get them now
+                    self._fill_features()
+                    self.load()
+            except Exception as e:
+                logger.error(f"Catalog update failed: {str(e)}")
+            time.sleep(max(60.0, self.refresh_interval / 4))
+
+    def stats(self):
+        return {
+            'tracks': {f'{mood}/{market}': len(tracks) for (mood, market), tracks in sorted(self._index.items())},
+            'tracks_with_features': len(self.space),
+            'loaded_at': self.loaded_at,
+            'refreshed_at': self.refreshed_at,
+        }
+
+
+def build_catalog():
+    """Build a catalog configured from settings."""
+    from dal import SongDAO
+
+    return TrackCatalog(
+        SongDAO(),
+        fetch=getattr(settings, 'CATALOG_SOURCE',
+                      'ai_ml.src.recommendation.music_recommendation.get_music_recommendation'),
+        moods=getattr(settings, 'CATALOG_MOODS', ['joy', 'sadness', 'anger', 'fear', 'love', 'surprise', 'neutral']),
+        markets=getattr(settings, 'CATALOG_MARKETS', ['US']),
+        refresh_interval=getattr(settings, 'CATALOG_REFRESH_INTERVAL', 6 * 3600),
+        min_tracks=getattr(settings, 'CATALOG_MIN_TRACKS', 10),
+        features=getattr(settings, 'CATALOG_FEATURES_SOURCE', None) or None,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_catalog():
+    """Return the process-wide catalog, with its refresh thread running."""
+    catalog = build_catalog()
+    catalog.start()
+    return catalog
@@ -0,0 +1,101 @@
+"""
+Cursor-paginated recommendation feed.
+
+The first request builds one large candidate pool (FEED_POOL_SIZE tracks) and
+keeps it in the Django cache for FEED_TTL seconds together with the feed's MMR
+state. Each page then picks the next FEED_PAGE_SIZE tracks from that pool,
+continuing the same diversity penalty, so scrolling costs one MMR step per page
+rather than new provider calls. Pages are returned with an opaque, signed
+cursor that names the feed and the next page; a cursor can be replayed and
+always returns the same page.
+"""
+import secrets
+from functools import lru_cache
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+
+from inference.metrics import metrics
+
+SALT = 'recommendation.feed'
+
+
+class FeedError(ValueError):
+    """The cursor is malformed, tampered with or belongs to another user."""
+
+
+class FeedExpired(FeedError):
+    """The feed's candidate pool has left the cache; start a new feed."""
+
+
+class RecommendationFeed:
+    """Stores feeds in a Django cache and serves their pages."""
+
+    def __init__(self, page_size=10, ttl=1800, cache=None):
+        """
+        :param ttl: Seconds a feed is kept after its last page was served.
+        :param cache: Django cache backend; defaults to RECOMMENDATION_CACHE_ALIAS.
+        """
+        self.page_size = page_size
+        self.ttl = ttl
+        self.cache = cache if cache is not None else caches[getattr(settings, 'RECOMMENDATION_CACHE_ALIAS', 'default')]
+
+    def key(self, feed_id):
+        return f'recommendation-feed:{feed_id}'
+
+    def start(self, username, emotion, candidates, diversifier, diversity=0.3, relevance_weight=None):
+        """
+        Store a new feed over candidates, in relevance order, and return its first page.
+
+        :return: (tracks, cursor for the next page or None).
+        """
+        feed_id = secrets.token_urlsafe(12)
+        feed = {'username': username, 'emotion': emotion, 'tracks': list(candidates), 'order': [], 'penalty': None,
+                'diversity': diversity, 'relevance_weight': relevance_weight}
+        metrics.increment('feed.started')
+        return self._page(feed_id, feed, 0, diversifier)
+
+    def page(self, username, cursor, diversifier):
+        """
+        :return: (emotion, tracks, cursor for the next page or None).
+        :raises FeedError: For an invalid cursor or one issued to another user.
+        :raises FeedExpired: When the feed is no longer cached.
+        """
+        try:
+            position = signing.loads(cursor, salt=SALT)
+            feed_id, page = position['feed'], int(position['page'])
+        except (signing.BadSignature, KeyError, TypeError, ValueError):
+            raise FeedError("Invalid cursor")
+        feed = self.cache.get(self.key(feed_id))
+        if feed is None:
+            metrics.increment('feed.expired')
+            raise FeedExpired("This feed has expired; start a new one")
+        if feed['username'] != username:
+            raise FeedError("Invalid cursor")
+        tracks, next_cursor = self._page(feed_id, feed, page, diversifier)
+        return feed['emotion'], tracks, next_cursor
+
+    def _page(self, feed_id, feed, page, diversifier):
+        start, end = page * self.page_size, (page + 1) * self.page_size
+        if len(feed['order']) < end and len(feed['order']) < len(feed['tracks']):
+            # Pages are generated in order, so a cursor for page p implies pages before p exist
+            order, penalty = diversifier.pick(feed['tracks'], end - len(feed['order']), diversity=feed['diversity'],
+                                              relevance_weight=feed['relevance_weight'], picked=feed['order'],
+                                              penalty=feed['penalty'])
+            feed['order'] = feed['order'] + [int(index) for index in order]
+            feed['penalty'] = penalty
+            metrics.increment('feed.pages_generated')
+        self.cache.set(self.key(feed_id), feed, timeout=self.ttl)
+        metrics.increment('feed.pages')
+
+        tracks = [feed['tracks'][index] for index in feed['order'][start:end]]
+        more = end < len(feed['tracks'])
+        return tracks, signing.dumps({'feed': feed_id, 'page': page + 1}, salt=SALT) if more else None
+
+
+@lru_cache(maxsize=1)
+def get_feed():
+    """Return the process-wide feed store configured from settings."""
+    return RecommendationFeed(page_size=getattr(settings, 'FEED_PAGE_SIZE', 10),
+                              ttl=getattr(settings, 'FEED_TTL', 1800))
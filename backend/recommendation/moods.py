@@ -0,0 +1,34 @@
+"""
+One mood vocabulary for every emotion model.
+
+The catalog, the Spotify search terms and the feature-space targets are keyed by
+the text model's labels (joy, sadness, anger, fear, love, surprise, neutral).
+The facial model reports FER labels (happy, sad, angry, ...), the wav2vec2
+speech model IEMOCAP abbreviations (hap, ang, neu, sad) and the classical
+speech model RAVDESS labels (calm, fearful, surprised, ...). canonical_mood maps
+each of them to the nearest catalog mood before any lookup.
+"""
+
+# Model label -> canonical mood; labels not listed are already canonical
+MOOD_ALIASES = {
+    'happy': 'joy',
+    'hap': 'joy',
+    'exc': 'joy',
+    'sad': 'sadness',
+    'angry': 'anger',
+    'ang': 'anger',
+    'disgust': 'anger',
+    'dis': 'anger',
+    'fearful': 'fear',
+    'fea': 'fear',
+    'surprised': 'surprise',
+    'sur': 'surprise',
+    'neu': 'neutral',
+    'calm': 'neutral',
+}
+
+
+def canonical_mood(label):
+    """The catalog mood for an emotion label from any model; unknown labels come back lowercased."""
+    label = str(label).strip().lower()
+    return MOOD_ALIASES.get(label, label)
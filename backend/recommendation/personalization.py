@@ -0,0 +1,119 @@
+"""
+Personalized re-ranking from a compact per-user taste profile.
+
+A user's taste is a few numbers kept on their UserProfile: the decayed mean
+audio-feature vector of the tracks they played and decayed play scores for
+their top artists. Both are updated in O(1) per listening event (a running
+mean that becomes an exponential average after 1/PERSONALIZATION_DECAY events),
+so ranking never reads the raw history, which grows without bound.
+
+Re-ranking scores a whole candidate pool in one vectorized pass: the pool's
+own order, closeness to the user's feature mean and affinity to the track's
+artist, weighted by PERSONALIZATION_FEATURE_WEIGHT and
+PERSONALIZATION_ARTIST_WEIGHT.
+"""
+import numpy as np
+from django.conf import settings
+
+from .vector_space import FEATURES, feature_vector
+
+# Largest distance between two points of the unit feature cube
+MAX_DISTANCE = np.sqrt(len(FEATURES))
+
+
+def empty_taste():
+    return {'features': None, 'feature_events': 0, 'artists': [], 'events': 0}
+
+
+def update_taste(taste, features=None, artist=None, decay=0.05, max_artists=50):
+    """
+    Fold one listening event into a taste profile.
+
+    :param taste: Existing profile dict, or None for a new one.
+    :param features: The track's raw audio features, or None when unknown.
+    :param decay: Smallest weight of a new event; earlier events are averaged evenly
+                  until there are 1/decay of them.
+    :param max_artists: Artists kept; the lowest scores are dropped.
+    :return: The updated profile (artists are stored as [name, score] pairs because
+             artist names are not valid MongoDB keys).
+    """
+    taste = dict(taste or empty_taste())
+    taste['events'] += 1
+
+    if features is not None:
+        vector = np.asarray(feature_vector(features), dtype=np.float64)
+        rate = max(decay, 1 / (taste['feature_events'] + 1))
+        mean = vector if taste['features'] is None else (1 - rate) * np.asarray(taste['features']) + rate * vector
+        taste['features'] = [round(float(value), 6) for value in mean]
+        taste['feature_events'] += 1
+
+    if artist:
+        rate = max(decay, 1 / taste['events'])
+        scores = {name: score * (1 - rate) for name, score in taste['artists']}
+        scores[artist] = scores.get(artist, 0.0) + rate
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:max_artists]
+        taste['artists'] = [[name, round(score, 6)] for name, score in ranked]
+    return taste
+
+
+def track_id(track):
+    return track['external_url'].rstrip('/').rpartition('/')[2]
+
+
+class Personalizer:
+    """Re-ranks candidate tracks for a taste profile."""
+
+    def __init__(self, space, feature_weight=0.5, artist_weight=0.3):
+        """
+        :param space: FeatureSpace used to look up candidate features.
+        """
+        self.space = space
+        self.feature_weight = feature_weight
+        self.artist_weight = artist_weight
+
+    def scores(self, candidates, taste):
+        """Personalized score of every candidate; candidates are assumed to be in relevance order."""
+        n = len(candidates)
+        scores = 1 - np.arange(n, dtype=np.float32) / max(n, 1)
+        if not taste or not n:
+            return scores
+
+        if taste.get('features') is not None and len(self.space):
+            positions = np.fromiter((self.space.positions.get(track_id(track), -1) for track in candidates),
+                                    dtype=np.intp, count=n)
+            known = positions >= 0
+            difference = self.space.matrix[positions[known]] - np.asarray(taste['features'], dtype=np.float32)
+            closeness = np.full(n, 0.5, dtype=np.float32)
+            closeness[known] = 1 - np.sqrt((difference * difference).sum(axis=1)) / MAX_DISTANCE
+            scores += self.feature_weight * closeness
+
+        if taste.get('artists'):
+            affinity = dict(taste['artists'])
+            top = max(affinity.values())
+            artist_scores = np.fromiter((affinity.get(track['artist'], 0.0) for track in candidates),
+                                        dtype=np.float32, count=n)
+            scores += self.artist_weight * artist_scores / top
+        return scores
+
+    def rerank(self, candidates, taste):
+        """Candidates ordered by personalized score; unchanged without a taste profile."""
+        if not taste or len(candidates) < 2:
+            return list(candidates)
+        order = np.argsort(-self.scores(candidates, taste), kind='stable')
+        return [candidates[index] for index in order]
+
+
+def get_personalizer(space):
+    return Personalizer(space, feature_weight=getattr(settings, 'PERSONALIZATION_FEATURE_WEIGHT', 0.5),
+                        artist_weight=getattr(settings, 'PERSONALIZATION_ARTIST_WEIGHT', 0.3))
+
+
+def taste_after_listening(taste, song_id, artist):
+    """update_taste for a played track, looking its features up in the catalog."""
+    from .catalog import get_catalog
+
+    space = get_catalog().space
+    position = space.positions.get(song_id)
+    features = {name: space.songs[position][name] for name in FEATURES} if position is not None else None
+    return update_taste(taste, features, artist, decay=getattr(settings, 'PERSONALIZATION_DECAY', 0.05),
+                        max_artists=getattr(settings, 'PERSONALIZATION_MAX_ARTISTS', 50))
@@ -0,0 +1,199 @@
+"""
+Recommendation providers tried in order, each under a deadline and a circuit breaker.
+
+The chain asks each provider in RECOMMENDATION_PROVIDERS order and returns the
+first non-empty answer. A provider that raises, returns nothing or misses its
+deadline counts as a failure; after RECOMMENDATION_BREAKER_FAILURES consecutive
+failures its breaker opens and it is skipped outright for
+RECOMMENDATION_BREAKER_RESET seconds, after which one trial call decides
+whether it closes again. The endpoint's worst case is therefore the sum of the
+deadlines, whatever Spotify does, and ``recommend`` never raises.
+
+Each provider runs on its own small thread pool (RECOMMENDATION_PROVIDER_WORKERS),
+so calls that hang past their deadline only tie up that provider's threads; once
+they are all busy, further calls fail at once instead of queueing. The in-memory
+catalog has no pool and runs on the request thread.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from functools import lru_cache
+
+from django.conf import settings
+
+from inference.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open trial."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go through; moves an expired open breaker to half-open for one trial."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state, self.failures, self.opened_at = CLOSED, 0, None
+
+    def record_empty(self):
+        """
+        A call answered in time with nothing. The provider responded, so a half-open
+        trial closes the breaker; a closed breaker's failure count is left alone.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.state, self.failures, self.opened_at = CLOSED, 0, None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state, self.opened_at = OPEN, self.clock()
+
+
+class ProviderBusy(RuntimeError):
+    """Every worker of the provider is still busy with earlier calls."""
+
+
+class Provider:
+    """A named source of recommendations with its own deadline, breaker and workers."""
+
+    def __init__(self, name, fetch, deadline_ms, breaker, workers=4):
+        """
+        :param fetch: Callable (emotion, market, live, limit) -> tracks or None, where live is
+                      the caller's Spotify function and limit the number of tracks wanted.
+        :param workers: Threads for this provider's calls. 0 calls fetch inline on the
+                        caller's thread, without a deadline; only for in-memory providers.
+        """
+        self.name = name
+        self.fetch = fetch
+        self.deadline_ms = deadline_ms
+        self.breaker = breaker
+        self.workers = workers
+        self._executor = None
+        if workers:
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'recommendation-{name}')
+            self._slots = threading.BoundedSemaphore(workers)
+
+    def call(self, emotion, market, live, limit):
+        """
+        :raises TimeoutError: When the call misses the deadline; it keeps running in the
+                              background and its result is dropped.
+        :raises ProviderBusy: When every worker is still running an earlier call.
+        """
+        if self._executor is None:
+            return self.fetch(emotion, market, live, limit)
+        # Waiting for a worker would only queue behind hung calls; fail now and let the breaker see it
+        if not self._slots.acquire(blocking=False):
+            raise ProviderBusy(f"all {self.workers} workers are busy")
+        try:
+            future = self._executor.submit(self.fetch, emotion, market, live, limit)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result(timeout=self.deadline_ms / 1000)
+
+
+class RecommendationChain:
+    """Returns the first non-empty answer from providers, in order."""
+
+    def __init__(self, providers):
+        self.providers = providers
+
+    def recommend(self, emotion, market=None, live=None, limit=10):
+        """
+        :param live: Callable (emotion, market) -> tracks that queries Spotify.
+        :param limit: Tracks wanted; providers with a fixed answer may return fewer.
+        :return: Tracks from the first provider that answered in time, or [] when none did.
+        """
+        for provider in self.providers:
+            if not provider.breaker.allow():
+                metrics.increment(f'recommendation.{provider.name}.skipped')
+                continue
+            started = time.perf_counter()
+            try:
+                tracks = provider.call(emotion, market, live, limit)
+            except TimeoutError:
+                metrics.increment(f'recommendation.{provider.name}.timeouts')
+                logger.warning(f"Recommendation provider {provider.name} missed its {provider.deadline_ms} ms deadline")
+                provider.breaker.record_failure()
+                continue
+            except ProviderBusy as e:
+                metrics.increment(f'recommendation.{provider.name}.busy')
+                logger.warning(f"Recommendation provider {provider.name} skipped: {str(e)}")
+                provider.breaker.record_failure()
+                continue
+            except Exception as e:
+                metrics.increment(f'recommendation.{provider.name}.errors')
+                logger.error(f"Recommendation provider {provider.name} failed: {str(e)}")
+                provider.breaker.record_failure()
+                continue
+            metrics.observe(f'recommendation.{provider.name}.ms', (time.perf_counter() - started) * 1000)
+            if not tracks:
+                # Cold catalog or empty cache: not the provider's fault, so it never opens the breaker
+                metrics.increment(f'recommendation.{provider.name}.empty')
+                provider.breaker.record_empty()
+                continue
+            provider.breaker.record_success()
+            metrics.increment(f'recommendation.{provider.name}.served')
+            return tracks
+        metrics.increment('recommendation.unserved')
+        return []
+
+    def stats(self):
+        return {
+            provider.name: {'state': provider.breaker.state, 'failures': provider.breaker.failures,
+                            'deadline_ms': provider.deadline_ms, 'workers': provider.workers}
+            for provider in self.providers
+        }
+
+
+def _provider_functions():
+    from .cache import get_recommendation_cache
+    from .catalog import get_catalog
+
+    return {
+        # Spotify behind the stale-while-revalidate cache: hits are immediate, misses call Spotify
+        'spotify': lambda emotion, market, live, limit: get_recommendation_cache().get(emotion, market, live),
+        # Whatever the cache still holds, without calling Spotify; serves while the spotify breaker is open
+        'cache': lambda emotion, market, live, limit: get_recommendation_cache().peek(emotion, market),
+        'catalog': lambda emotion, market, live, limit: get_catalog().recommend(emotion, market, limit),
+    }
+
+
+@lru_cache(maxsize=1)
+def get_recommendation_chain():
+    """Return the process-wide provider chain configured from settings."""
+    functions = _provider_functions()
+    deadlines = getattr(settings, 'RECOMMENDATION_DEADLINES_MS', {})
+    workers = getattr(settings, 'RECOMMENDATION_PROVIDER_WORKERS', {'catalog': 0})
+    providers = []
+    for name in getattr(settings, 'RECOMMENDATION_PROVIDERS', ['catalog', 'spotify', 'cache']):
+        if name not in functions:
+            raise ValueError(f"Unknown recommendation provider '{name}'; expected one of {', '.join(functions)}")
+        breaker = CircuitBreaker(failure_threshold=getattr(settings, 'RECOMMENDATION_BREAKER_FAILURES', 5),
+                                 reset_timeout=getattr(settings, 'RECOMMENDATION_BREAKER_RESET', 30))
+        providers.append(Provider(name, functions[name], deadlines.get(name, 1000), breaker,
+                                  workers=workers.get(name, 4)))
+    return RecommendationChain(providers)
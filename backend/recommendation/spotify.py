@@ -0,0 +1,275 @@
+"""
+Process-wide Spotify client with pooled connections and a proactively refreshed token.
+
+Every Spotify call shares one ``requests`` session, so TLS connections to the
+API stay open between requests instead of being set up per call. That includes
+ai_ml's recommender, which builds its own spotipy client: spotipy clients and
+auth managers created without a session get the pooled one. The
+client-credentials token is cached and replaced by a background thread
+SPOTIFY_TOKEN_REFRESH_MARGIN seconds before it expires; a request only fetches
+a token itself when none is valid (before the server has warmed the client, or
+after refreshes kept failing). Every call carries SPOTIFY_TIMEOUT.
+"""
+import logging
+import threading
+import time
+from functools import lru_cache
+
+import requests
+from django.conf import settings
+
+from inference.metrics import metrics
+
+from .moods import canonical_mood
+
+logger = logging.getLogger(__name__)
+
+TOKEN_URL = 'https://accounts.spotify.com/api/token'
+API_URL = 'https://api.spotify.com/v1/'
+
+# Spotify's largest search page; enough for a RECOMMENDATION_POOL_SIZE pool from one call
+SEARCH_LIMIT = 50
+
+# Search terms per emotion for search_mood_tracks
+MOOD_QUERIES = {
+    'joy': 'happy upbeat',
+    'sadness': 'sad melancholy',
+    'anger': 'angry intense',
+    'fear': 'dark tense',
+    'love': 'love romantic',
+    'surprise': 'energetic surprising',
+    'neutral': 'chill',
+}
+
+
+class PooledSession(requests.Session):
+    """A session shared for the life of the process; spotipy closes its session when a client is collected."""
+
+    def close(self):
+        pass
+
+
+def build_session(pool_size=10, retries=2):
+    """requests session with a keep-alive connection pool and retries on connection errors and 5xx."""
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(total=retries, backoff_factor=0.2, status_forcelist=(500, 502, 503, 504),
+                  allowed_methods=frozenset({'GET', 'POST'}))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = PooledSession()
+    session.mount('https://', adapter)
+    return session
+
+
+def share_session(session):
+    """
+    Make spotipy clients and auth managers created without a session of their own use session.
+
+    ai_ml's get_music_recommendation builds its own spotipy client; with this its API and
+    token requests go over the pooled keep-alive connections. Call it before that client is
+    built; a no-op when spotipy is not installed.
+    """
+    try:
+        import spotipy
+        from spotipy.oauth2 import SpotifyAuthBase
+    except ImportError:
+        return
+    client_init, auth_init = spotipy.Spotify.__init__, SpotifyAuthBase.__init__
+
+    def pooled_client_init(self, *args, **kwargs):
+        # requests_session is Spotify's second parameter; True (the default) means a new session
+        if len(args) < 2 and kwargs.get('requests_session', True) is True:
+            kwargs['requests_session'] = session
+        client_init(self, *args, **kwargs)
+
+    def pooled_auth_init(self, requests_session=True):
+        auth_init(self, session if requests_session is True else requests_session)
+
+    spotipy.Spotify.__init__ = pooled_client_init
+    SpotifyAuthBase.__init__ = pooled_auth_init
+
+
+class SpotifyTokenCache:
+    """
+    Client-credentials token shared by every call, refreshed before it expires.
+
+    Implements spotipy's auth manager interface (``get_access_token``).
+    """
+
+    def __init__(self, client_id, client_secret, session, refresh_margin=300, timeout=5, clock=time.time):
+        """
+        :param refresh_margin: Seconds before expiry at which the background thread refreshes.
+        :param timeout: Seconds allowed for a token request.
+        """
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.session = session
+        self.refresh_margin = refresh_margin
+        self.timeout = timeout
+        self.clock = clock
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def get_access_token(self, as_dict=False):
+        if self._token is None or self.clock() >= self._expires_at:
+            with self._lock:
+                # Another thread may have fetched it while this one waited
+                if self._token is None or self.clock() >= self._expires_at:
+                    metrics.increment('spotify.token_fetches_on_request')
+                    self._fetch()
+        if as_dict:
+            return {'access_token': self._token, 'token_type': 'Bearer', 'expires_at': int(self._expires_at)}
+        return self._token
+
+    def _fetch(self):
+        started = time.perf_counter()
+        response = self.session.post(TOKEN_URL, data={'grant_type': 'client_credentials'},
+                                     auth=(self.client_id, self.client_secret), timeout=self.timeout)
+        response.raise_for_status()
+        payload = response.json()
+        self._token = payload['access_token']
+        self._expires_at = self.clock() + payload.get('expires_in', 3600)
+        metrics.observe('spotify.token_ms', (time.perf_counter() - started) * 1000)
+
+    def refresh(self):
+        with self._lock:
+            self._fetch()
+
+    def seconds_until_refresh(self):
+        return max(0.0, self._expires_at - self.refresh_margin - self.clock())
+
+    def start(self):
+        """Keep the token fresh from a daemon thread; safe to call repeatedly."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='spotify-token', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.seconds_until_refresh())
+            try:
+                self.refresh()
+            except Exception as e:
+                metrics.increment('spotify.token_refresh_failures')
+                logger.error(f"Spotify token refresh failed: {str(e)}")
+                time.sleep(min(30.0, self.refresh_margin / 4))
+
+
+class SpotifyClientManager:
+    """Owns the pooled session, the token cache and the spotipy client built on them."""
+
+    def __init__(self, client_id, client_secret, pool_size=10, timeout=5, retries=2, refresh_margin=300):
+        self.timeout = timeout
+        self.session = build_session(pool_size, retries)
+        self.tokens = SpotifyTokenCache(client_id, client_secret, self.session, refresh_margin, timeout)
+        self._client = None
+        self._warm_thread = None
+        self._lock = threading.Lock()
+
+    def client(self):
+        """Shared spotipy client; spotipy's own retries are off because the session retries."""
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import spotipy
+
+                    self._client = spotipy.Spotify(auth_manager=self.tokens, requests_session=self.session,
+                                                   requests_timeout=self.timeout, retries=0)
+        return self._client
+
+    def start(self):
+        """Warm the client and keep the token fresh from daemon threads; returns at once, safe to call repeatedly."""
+        with self._lock:
+            if self._warm_thread is not None:
+                return
+            self._warm_thread = threading.Thread(target=self.warm, name='spotify-warm', daemon=True)
+        self._warm_thread.start()
+
+    def warm(self):
+        """Fetch the first token and open a pooled connection to the API before traffic arrives."""
+        try:
+            self.tokens.get_access_token()
+            started = time.perf_counter()
+            self.session.head(API_URL, timeout=self.timeout)
+            metrics.observe('spotify.connect_ms', (time.perf_counter() - started) * 1000)
+        except Exception as e:
+            logger.warning(f"Could not warm the Spotify client: {str(e)}")
+        self.tokens.start()
+
+
+_manager_lock = threading.Lock()
+
+
+def get_spotify_manager():
+    """
+    Return the process-wide Spotify client manager, with its session shared with spotipy.
+
+    Building it does no I/O; the WSGI/ASGI entry points call ``start()`` to warm it when the
+    server starts.
+    """
+    # One manager even when the first calls race: a second one would share a second session
+    with _manager_lock:
+        return _build_spotify_manager()
+
+
+@lru_cache(maxsize=1)
+def _build_spotify_manager():
+    manager = SpotifyClientManager(
+        client_id=getattr(settings, 'SPOTIFY_CLIENT_ID', ''),
+        client_secret=getattr(settings, 'SPOTIFY_CLIENT_SECRET', ''),
+        pool_size=getattr(settings, 'SPOTIFY_POOL_SIZE', 10),
+        timeout=getattr(settings, 'SPOTIFY_TIMEOUT', 5),
+        refresh_margin=getattr(settings, 'SPOTIFY_TOKEN_REFRESH_MARGIN', 300),
+    )
+    share_session(manager.session)
+    return manager
+
+
+def get_spotify():
+    """Return the shared spotipy client."""
+    return get_spotify_manager().client()
+
+
+def search_mood_tracks(emotion, market=None, limit=SEARCH_LIMIT):
+    """
+    Search Spotify for tracks matching emotion through the shared client.
+
+    Returns tracks in the same format as get_music_recommendation, so it can be
+    used as CATALOG_SOURCE.
+    """
+    started = time.perf_counter()
+    mood = canonical_mood(emotion)
+    results = get_spotify().search(q=MOOD_QUERIES.get(mood, mood), type='track', limit=limit,
+                                   market=market or None)
+    metrics.observe('spotify.search_ms', (time.perf_counter() - started) * 1000)
+    return [{
+        'id': item['id'],
+        'name': item['name'],
+        'artist': item['artists'][0]['name'] if item['artists'] else '',
+        'album': item.get('album', {}).get('name'),
+        'preview_url': item.get('preview_url'),
+        'external_url': item['external_urls'].get('spotify', f"https://open.spotify.com/track/{item['id']}"),
+    } for item in results['tracks']['items']]
+
+
+def fetch_audio_features(song_ids):
+    """
+    Audio features for up to 100 tracks through the shared client.
+
+    :return: {song_id: {'valence', 'energy', 'tempo', 'danceability'}}; tracks Spotify
+             has no features for are left out, and {} when no credentials are configured.
+    """
+    if not getattr(settings, 'SPOTIFY_CLIENT_ID', ''):
+        return {}
+    started = time.perf_counter()
+    results = get_spotify().audio_features(list(song_ids))
+    metrics.observe('spotify.audio_features_ms', (time.perf_counter() - started) * 1000)
+    return {
+        item['id']: {name: item[name] for name in ('valence', 'energy', 'tempo', 'danceability')}
+        for item in results if item
+    }
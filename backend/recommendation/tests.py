@@ -0,0 +1,544 @@
+import importlib.util
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+from django.core.cache import caches
+from django.test import SimpleTestCase
+
+from inference.metrics import metrics
+
+from .bloom import BloomFilter, unseen_first
+from .cache import RecommendationCache
+from .diversity import Diversifier
+from .feed import FeedError, FeedExpired, RecommendationFeed
+from .moods import canonical_mood
+from .catalog import TrackCatalog, track_to_song
+from .personalization import Personalizer, update_taste
+from .providers import OPEN, CircuitBreaker, Provider, RecommendationChain
+from .spotify import SpotifyClientManager, SpotifyTokenCache, share_session
+from .transitions import transition
+from .vector_space import FeatureSpace
+
+
+def make_tracks(mood, count, offset=0):
+    return [{
+        'name': f'{mood} {i}',
+        'artist': f'Artist {i % 3}',
+        'preview_url': None,
+        'external_url': f'https://open.spotify.com/track/{mood}{i:04d}',
+    } for i in range(offset, offset + count)]
+
+
+class SongDatabaseTestCase(SimpleTestCase):
+    """Points the DAL at a throwaway SQLite file."""
+
+    def setUp(self):
+        metrics.reset()
+        handle, self.db_path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        patcher = patch('dal.base_dao.DB_CONFIG', {'database': self.db_path, 'check_same_thread': False})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(os.remove, self.db_path)
+
+        from dal import SongDAO
+        self.dao = SongDAO()
+
+
+class TrackCatalogTestCase(SongDatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.calls = []
+
+        def fetch(mood, market):
+            self.calls.append((mood, market))
+            return make_tracks(mood, 12 if market == 'US' else 4)
+
+        self.catalog = TrackCatalog(self.dao, fetch, moods=['joy', 'sadness'], markets=['US', 'GB'], min_tracks=10)
+
+    # Test that a refresh populates the songs table and serves from the index without fetching again
+    def test_refresh_and_recommend(self):
+        self.assertIsNone(self.catalog.recommend('joy'))
+        self.assertTrue(self.catalog.is_stale())
+
+        self.assertEqual(self.catalog.refresh(), 32)
+        self.assertEqual(len(self.calls), 4)
+        self.assertFalse(self.catalog.is_stale())
+
+        tracks = self.catalog.recommend('joy', limit=5)
+        self.assertEqual(len(tracks), 5)
+        self.assertTrue(all(track['name'].startswith('joy') for track in tracks))
+        self.assertEqual(len(self.dao.get_songs_by_mood('sadness')), 12)
+        # GB only has 4 tracks, below min_tracks
+        self.assertIsNone(self.catalog.recommend('joy', 'GB'))
+        self.assertEqual(len(self.calls), 4)
+        self.assertEqual(metrics.counter('catalog.hits'), 1)
+
+    # Test that a second refresh replaces each pair's members and a fresh catalog loads them from the table
+    def test_refresh_upserts(self):
+        self.catalog.refresh()
+        self.catalog.fetch = lambda mood, market: make_tracks(mood, 2, offset=11)
+        self.catalog.refresh()
+
+        reloaded = TrackCatalog(self.dao, None, moods=['joy'], markets=['US'])
+        self.assertEqual(reloaded.load(), 8)
+        self.assertEqual([track['name'] for track in reloaded.tracks('joy')], ['joy 11', 'joy 12'])
+        self.assertEqual(len(reloaded.tracks('joy', 'GB')), 2)
+
+        # An empty search result keeps the pair's previous members
+        self.catalog.fetch = lambda mood, market: []
+        self.catalog.refresh()
+        self.assertEqual(len(self.catalog.tracks('joy')), 2)
+
+    # Test that a track found by several mood searches is indexed under each of them
+    def test_track_in_several_moods(self):
+        shared = make_tracks('any', 1)
+        self.catalog.fetch = lambda mood, market: shared + make_tracks(mood, 11)
+        self.catalog.refresh()
+
+        for mood in ('joy', 'sadness'):
+            self.assertIn('any 0', [track['name'] for track in self.catalog.tracks(mood)])
+        self.assertEqual(len(self.dao.get_songs_by_mood('joy')), 12)
+
+    # Test that facial and speech labels reach the catalog moods the text labels are indexed under
+    def test_model_labels_map_to_catalog_moods(self):
+        self.catalog.refresh()
+
+        self.assertEqual([canonical_mood(label) for label in ('happy', 'hap', 'Sad', 'ang', 'neu', 'love')],
+                         ['joy', 'joy', 'sadness', 'anger', 'neutral', 'love'])
+        self.assertEqual(len(self.catalog.tracks('hap')), 12)
+        self.assertTrue(all(track['name'].startswith('sadness') for track in self.catalog.recommend('sad')))
+
+
+class RecommendationCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        metrics.reset()
+        self.now = 1000.0
+        self.backend = caches['default']
+        self.backend.clear()
+        self.cache = RecommendationCache(fresh_ttl=60, stale_ttl=300, version=3, cache=self.backend,
+                                         clock=lambda: self.now)
+        self.calls = []
+
+    def compute(self, emotion, market):
+        self.calls.append((emotion, market))
+        return make_tracks(emotion, 2, offset=len(self.calls) * 10)
+
+    # Test that fresh entries are served from the cache and keys include market and version
+    def test_fresh_hits(self):
+        first = self.cache.get('joy', None, self.compute)
+        self.assertEqual(self.cache.get('joy', None, self.compute), first)
+        self.cache.get('joy', 'GB', self.compute)
+
+        self.assertEqual(self.calls, [('joy', None), ('joy', 'GB')])
+        self.assertEqual(self.cache.key('joy', 'GB'), 'recommendations:v3:joy:GB')
+        self.assertEqual(self.cache.stats()['hit_rate'], round(1 / 3, 4))
+
+    # Test that a stale entry is served immediately and refreshed once in the background
+    def test_stale_while_revalidate(self):
+        first = self.cache.get('joy', None, self.compute)
+        self.now += 120
+        release = threading.Event()
+
+        def slow_compute(emotion, market):
+            release.wait(5)
+            return self.compute(emotion, market)
+
+        self.assertEqual(self.cache.get('joy', None, slow_compute), first)
+        self.assertEqual(self.cache.get('joy', None, slow_compute), first)
+        release.set()
+        self.cache._executor.shutdown(wait=True)
+
+        self.assertEqual(len(self.calls), 2)
+        self.assertNotEqual(self.cache.get('joy', None, self.compute), first)
+        self.assertEqual(metrics.counter('recommendation_cache.stale_hits'), 2)
+        self.assertEqual(metrics.snapshot()['timings']['recommendation_cache.refresh_ms']['count'], 1)
+
+
+class FakeTokenResponse:
+    def __init__(self, token):
+        self.token = token
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {'access_token': self.token, 'expires_in': 3600}
+
+
+class SpotifyTokenCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        metrics.reset()
+        self.now = 0.0
+        self.posts = []
+        self.tokens = SpotifyTokenCache('id', 'secret', self, refresh_margin=300, clock=lambda: self.now)
+
+    def post(self, url, data, auth, timeout):
+        self.posts.append((url, auth, timeout))
+        return FakeTokenResponse(f'token-{len(self.posts)}')
+
+    # Test that the token is fetched once, reused until expiry and refreshed ahead of it
+    def test_token_reuse_and_refresh(self):
+        self.assertEqual(self.tokens.get_access_token(), 'token-1')
+        self.now = 3000
+        self.assertEqual(self.tokens.get_access_token(as_dict=True)['access_token'], 'token-1')
+        self.assertEqual(self.tokens.seconds_until_refresh(), 300)
+
+        self.tokens.refresh()
+        self.assertEqual(self.tokens.get_access_token(), 'token-2')
+        self.assertEqual(metrics.counter('spotify.token_fetches_on_request'), 1)
+        self.assertEqual(self.posts[0][1], ('id', 'secret'))
+
+    # Test that an expired token is fetched on the request path when the refresher fell behind
+    def test_expired_token_fetched_on_request(self):
+        self.tokens.get_access_token()
+        self.now = 3601
+        self.assertEqual(self.tokens.get_access_token(), 'token-2')
+        self.assertEqual(metrics.counter('spotify.token_fetches_on_request'), 2)
+
+
+class SpotifyClientManagerTestCase(SimpleTestCase):
+    # Test that warming runs once, off the calling thread, however often start is called
+    def test_start_warms_once_in_background(self):
+        manager = SpotifyClientManager('id', 'secret')
+        callers = []
+        with patch.object(manager, 'warm', lambda: callers.append(threading.current_thread())):
+            manager.start()
+            manager.start()
+            manager._warm_thread.join(timeout=5)
+
+        self.assertEqual(len(callers), 1)
+        self.assertIsNot(callers[0], threading.current_thread())
+
+    # Test that spotipy clients built elsewhere use the pooled session unless given their own
+    @unittest.skipUnless(importlib.util.find_spec('spotipy'), 'spotipy is not installed')
+    def test_share_session(self):
+        import requests
+        import spotipy
+        from spotipy.oauth2 import SpotifyAuthBase, SpotifyClientCredentials
+
+        self.addCleanup(setattr, spotipy.Spotify, '__init__', spotipy.Spotify.__init__)
+        self.addCleanup(setattr, SpotifyAuthBase, '__init__', SpotifyAuthBase.__init__)
+        session = SpotifyClientManager('id', 'secret').session
+        share_session(session)
+
+        credentials = SpotifyClientCredentials('id', 'secret')
+        self.assertIs(credentials._session, session)
+        self.assertIs(spotipy.Spotify(auth_manager=credentials)._session, session)
+        own = requests.Session()
+        self.assertIs(spotipy.Spotify(auth_manager=credentials, requests_session=own)._session, own)
+
+
+class RecommendationChainTestCase(SimpleTestCase):
+    def setUp(self):
+        metrics.reset()
+        self.now = 0.0
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def breaker(self):
+        return CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=lambda: self.now)
+
+    def hanging(self, emotion, market, live, limit):
+        self.release.wait(5)
+        return make_tracks('slow', 1)
+
+    # Test that a slow provider is cut off at its deadline and the next one answers
+    def test_deadline_falls_through(self):
+        chain = RecommendationChain([
+            Provider('spotify', self.hanging, 20, self.breaker()),
+            Provider('catalog', lambda emotion, market, live, limit: make_tracks(emotion, 3), 50, self.breaker()),
+        ])
+        started = time.perf_counter()
+        tracks = chain.recommend('joy')
+
+        self.assertLess(time.perf_counter() - started, 1.0)
+        self.assertEqual(tracks[0]['name'], 'joy 0')
+        self.assertEqual(metrics.counter('recommendation.spotify.timeouts'), 1)
+
+    # Test that repeated failures open the breaker, which skips the provider until a trial succeeds
+    def test_breaker_skips_failing_provider(self):
+        calls = []
+
+        def failing(emotion, market, live, limit):
+            calls.append(emotion)
+            raise ConnectionError('upstream down')
+
+        spotify = Provider('spotify', failing, 50, self.breaker())
+        chain = RecommendationChain([spotify, Provider('cache', lambda emotion, market, live, limit: None, 50,
+                                                       self.breaker())])
+        for _ in range(4):
+            self.assertEqual(chain.recommend('joy'), [])
+
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(spotify.breaker.state, OPEN)
+        self.assertEqual(metrics.counter('recommendation.spotify.skipped'), 2)
+
+        self.now = 31
+        spotify.fetch = lambda emotion, market, live, limit: live(emotion, market)
+        self.assertEqual(len(chain.recommend('joy', live=lambda emotion, market: make_tracks(emotion, 2))), 2)
+        self.assertEqual(chain.stats()['spotify']['state'], 'closed')
+
+    # Test that a half-open trial answering with nothing still closes the breaker
+    def test_empty_trial_closes_breaker(self):
+        cache = Provider('cache', lambda emotion, market, live, limit: [], 50, self.breaker())
+        cache.breaker.record_failure()
+        cache.breaker.record_failure()
+        self.now = 31
+
+        self.assertEqual(RecommendationChain([cache]).recommend('joy'), [])
+        self.assertEqual(cache.breaker.state, 'closed')
+        self.assertTrue(cache.breaker.allow())
+
+    # Test that hung calls only occupy their own provider's workers, and inline providers still answer
+    def test_hung_provider_does_not_starve_others(self):
+        spotify = Provider('spotify', self.hanging, 20, self.breaker(), workers=1)
+        catalog = Provider('catalog', lambda emotion, market, live, limit: make_tracks(emotion, 3), 50,
+                           self.breaker(), workers=0)
+        chain = RecommendationChain([spotify, catalog])
+        for _ in range(3):
+            self.assertEqual(chain.recommend('joy')[0]['name'], 'joy 0')
+
+        self.assertEqual(metrics.counter('recommendation.spotify.timeouts'), 1)
+        self.assertEqual(metrics.counter('recommendation.spotify.busy'), 1)
+        self.assertEqual(spotify.breaker.state, OPEN)
+
+
+def make_song(song_id, valence, energy, tempo=130.0, danceability=0.5, market='US', artist=None):
+    return {'song_id': song_id, 'title': song_id, 'artist': artist or f'Artist {song_id}', 'spotify_url': None,
+            'preview_url': None, 'market': market, 'valence': valence, 'energy': energy, 'tempo': tempo,
+            'danceability': danceability}
+
+
+class FeatureSpaceTestCase(SimpleTestCase):
+    # Test that the nearest tracks to an emotion target come back in distance order, filtered by market
+    def test_nearest_by_emotion_and_market(self):
+        space = FeatureSpace([
+            make_song('happy', 0.9, 0.8, 144, 0.8),
+            make_song('happy-gb', 0.85, 0.75, 144, 0.75, market='GB'),
+            make_song('sad', 0.1, 0.2, 70, 0.3),
+            make_song('calm', 0.5, 0.4, 120, 0.5),
+            make_song('no-features', None, None),
+        ])
+
+        self.assertEqual(len(space), 4)
+        self.assertEqual(space.matrix.shape, (4, 4))
+        self.assertTrue(space.matrix.flags['C_CONTIGUOUS'])
+        positions, distances = space.for_emotion('joy', 2, market='US')
+        self.assertEqual([space.song_ids[p] for p in positions], ['happy', 'calm'])
+        self.assertTrue(np.all(np.diff(distances) >= 0))
+
+        positions, _ = space.for_emotion('sadness', 1)
+        self.assertEqual(space.song_ids[positions[0]], 'sad')
+        exclude = np.array([song_id == 'sad' for song_id in space.song_ids])
+        positions, _ = space.for_emotion('sadness', 10, exclude=exclude)
+        self.assertNotIn('sad', [space.song_ids[p] for p in positions])
+        self.assertEqual(len(space.nearest(space.target('joy'), 5, market='JP')[0]), 0)
+
+
+class CatalogFeaturesTestCase(SongDatabaseTestCase):
+    # Test that refresh fills missing audio features and recommend ranks by feature distance
+    def test_refresh_fetches_features_and_ranks(self):
+        requested = []
+
+        def features(song_ids):
+            requested.append(list(song_ids))
+            return {song_id: {'valence': 0.9 if song_id.startswith('joy') else 0.1, 'energy': 0.7,
+                              'tempo': 120.0, 'danceability': 0.6} for song_id in song_ids}
+
+        catalog = TrackCatalog(self.dao, lambda mood, market: make_tracks(mood, 6), moods=['joy', 'sadness'],
+                               markets=['US'], min_tracks=10, features=features)
+        catalog.refresh()
+        catalog.refresh()
+
+        self.assertEqual(len(requested), 1)
+        self.assertEqual(len(requested[0]), 12)
+        self.assertEqual(len(catalog.space), 12)
+        tracks = catalog.recommend('joy', limit=6)
+        self.assertTrue(all(track['name'].startswith('joy') for track in tracks))
+        self.assertEqual(metrics.counter('catalog.feature_hits'), 1)
+
+
+class PersonalizationTestCase(SimpleTestCase):
+    # Test that the taste profile is a running mean that turns into an exponential average
+    def test_update_taste_incremental_mean(self):
+        taste = None
+        for valence in (0.2, 0.4, 0.6):
+            taste = update_taste(taste, {'valence': valence, 'energy': 0.5, 'tempo': 130.0, 'danceability': 0.5},
+                                 decay=0.25)
+        self.assertAlmostEqual(taste['features'][0], 0.4, places=5)
+        self.assertEqual(taste['feature_events'], 3)
+
+        # From the fourth event on each new track weighs decay
+        taste = update_taste(taste, {'valence': 1.0, 'energy': 0.5, 'tempo': 130.0, 'danceability': 0.5},
+                             decay=0.25)
+        self.assertAlmostEqual(taste['features'][0], 0.55, places=5)
+
+    # Test that artist scores favour repeated plays and are capped at max_artists
+    def test_update_taste_artists(self):
+        taste = None
+        for artist in ('A', 'B', 'A', 'C', 'A', 'D'):
+            taste = update_taste(taste, artist=artist, max_artists=3)
+        self.assertEqual(len(taste['artists']), 3)
+        self.assertEqual(taste['artists'][0][0], 'A')
+        self.assertIsNone(taste['features'])
+        self.assertEqual(taste['events'], 6)
+
+    # Test that re-ranking moves tracks close to the user's taste and by liked artists up
+    def test_rerank(self):
+        space = FeatureSpace([make_song('calm', 0.2, 0.2), make_song('loud', 0.9, 0.9, artist='Fav'),
+                              make_song('mid', 0.5, 0.5)])
+        candidates = [{'name': song_id, 'artist': 'Fav' if song_id == 'loud' else f'Artist {song_id}',
+                       'preview_url': None, 'external_url': f'https://open.spotify.com/track/{song_id}'}
+                      for song_id in ('calm', 'mid', 'loud', 'unknown')]
+        personalizer = Personalizer(space, feature_weight=2.0, artist_weight=0.0)
+
+        self.assertEqual(personalizer.rerank(candidates, {}), candidates)
+        taste = {'features': [0.9, 0.9, 0.5, 0.5], 'artists': []}
+        self.assertEqual([track['name'] for track in personalizer.rerank(candidates, taste)],
+                         ['loud', 'mid', 'calm', 'unknown'])
+
+        personalizer = Personalizer(space, feature_weight=0.0, artist_weight=1.0)
+        ranked = personalizer.rerank(candidates, {'features': None, 'artists': [['Fav', 0.4]]})
+        self.assertEqual(ranked[0]['name'], 'loud')
+
+
+class BloomFilterTestCase(SimpleTestCase):
+    # Test that added tracks are always found and unseen ones rarely are, at about the configured rate
+    def test_membership_and_error_rate(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        bloom.update(f'seen{i}' for i in range(1000))
+        self.assertTrue(bloom.contains_many(f'seen{i}' for i in range(1000)).all())
+        self.assertTrue(bloom.full)
+
+        false_positives = bloom.contains_many(f'new{i}' for i in range(10000)).mean()
+        self.assertLess(false_positives, 0.02)
+
+    # Test that a filter survives a round trip through bytes
+    def test_serialization(self):
+        bloom = BloomFilter(capacity=100, error_rate=0.05)
+        bloom.add('abc')
+        restored = BloomFilter.from_bytes(bloom.to_bytes())
+        self.assertIn('abc', restored)
+        self.assertNotIn('xyz', restored)
+        self.assertEqual((restored.num_bits, restored.num_hashes, len(restored), restored.capacity),
+                         (bloom.num_bits, bloom.num_hashes, 1, 100))
+
+    # Test that already recommended tracks move behind new ones
+    def test_unseen_first(self):
+        tracks = make_tracks('joy', 4)
+        bloom = BloomFilter(capacity=10)
+        bloom.update(['joy0000', 'joy0002'])
+        self.assertEqual([track['name'] for track in unseen_first(tracks, bloom)],
+                         ['joy 1', 'joy 3', 'joy 0', 'joy 2'])
+        self.assertEqual(unseen_first(tracks, None), tracks)
+
+
+class DiversifierTestCase(SimpleTestCase):
+    # Test that MMR spreads picks across artists and sounds, and keeps relevance order without a penalty
+    def test_rerank(self):
+        space = FeatureSpace([make_song('a1', 0.9, 0.9, artist='A'), make_song('a2', 0.88, 0.9, artist='A'),
+                              make_song('a3', 0.9, 0.88, artist='A'), make_song('b1', 0.2, 0.3, artist='B')])
+        candidates = [{'name': song_id, 'artist': song_id[0].upper(), 'preview_url': None,
+                       'external_url': f'https://open.spotify.com/track/{song_id}'}
+                      for song_id in ('a1', 'a2', 'a3', 'b1')]
+        diversifier = Diversifier(space, artist_weight=0.5)
+
+        self.assertEqual([track['name'] for track in diversifier.rerank(candidates, 2, diversity=0)], ['a1', 'a2'])
+        self.assertEqual([track['name'] for track in diversifier.rerank(candidates, 2, diversity=0.5)], ['a1', 'b1'])
+        # Explicit relevance overrides the pool order
+        ranked = diversifier.rerank(candidates, 4, relevance=[0.1, 0.2, 0.3, 0.9], diversity=0)
+        self.assertEqual([track['name'] for track in ranked], ['b1', 'a3', 'a2', 'a1'])
+
+    # Test that the similarity matrix is symmetric with ones on the diagonal for tracks with features
+    def test_similarity(self):
+        space = FeatureSpace([make_song(f's{i}', i / 10, 1 - i / 10, artist=f'Artist {i % 3}') for i in range(10)])
+        candidates = [{'name': f's{i}', 'artist': f'Artist {i % 3}', 'preview_url': None,
+                       'external_url': f'https://open.spotify.com/track/s{i}'} for i in range(12)]
+        similarity = Diversifier(space).similarity(candidates)
+        np.testing.assert_allclose(similarity, similarity.T, atol=1e-6)
+        np.testing.assert_allclose(np.diag(similarity)[:10], 1.0, atol=1e-3)
+        # s10 and s11 have no features, so only their shared artists count
+        self.assertAlmostEqual(float(similarity[10, 11]), 0.0)
+        self.assertAlmostEqual(float(similarity[10, 1]), 0.5)
+
+
+class RecommendationFeedTestCase(SimpleTestCase):
+    def setUp(self):
+        metrics.reset()
+        self.cache = caches['default']
+        self.cache.clear()
+        self.feed = RecommendationFeed(page_size=4, ttl=60, cache=self.cache)
+        self.diversifier = Diversifier(FeatureSpace([]))
+        self.tracks = make_tracks('joy', 10)
+
+    # Test that pages cover the pool once, in order, and the last page has no cursor
+    def test_pages(self):
+        page, cursor = self.feed.start('alice', 'joy', self.tracks, self.diversifier, diversity=0)
+        pages = [page]
+        while cursor:
+            emotion, page, cursor = self.feed.page('alice', cursor, self.diversifier)
+            self.assertEqual(emotion, 'joy')
+            pages.append(page)
+        self.assertEqual([len(page) for page in pages], [4, 4, 2])
+        self.assertEqual([track for page in pages for track in page], self.tracks)
+
+    # Test that a replayed cursor returns the same page, and diversity carries over between pages
+    def test_replay_and_diversity(self):
+        first, cursor = self.feed.start('alice', 'joy', self.tracks, self.diversifier, diversity=0.9)
+        # Artists 0-2 alternate in the pool, so the first picks spread across all three
+        self.assertEqual(len({track['artist'] for track in first[:3]}), 3)
+        _, second, next_cursor = self.feed.page('alice', cursor, self.diversifier)
+        _, again, _ = self.feed.page('alice', cursor, self.diversifier)
+        self.assertEqual(second, again)
+        self.assertFalse({track['name'] for track in first} & {track['name'] for track in second})
+        self.assertIsNotNone(next_cursor)
+
+    # Test that tampered, foreign and expired cursors are rejected
+    def test_invalid_cursors(self):
+        _, cursor = self.feed.start('alice', 'joy', self.tracks, self.diversifier)
+        with self.assertRaises(FeedError):
+            self.feed.page('alice', cursor + 'x', self.diversifier)
+        with self.assertRaises(FeedError):
+            self.feed.page('bob', cursor, self.diversifier)
+        self.cache.clear()
+        with self.assertRaises(FeedExpired):
+            self.feed.page('alice', cursor, self.diversifier)
+
+
+class MoodTransitionTestCase(SongDatabaseTestCase):
+    # Test that a sadness-to-joy playlist rises in valence without repeats and stays in the market
+    def test_transition(self):
+        songs = [make_song(f'v{i:02d}', i / 20, i / 20, market='US') for i in range(21)]
+        songs.append(make_song('gb', 0.95, 0.95, market='GB'))
+        space = FeatureSpace(songs)
+
+        positions = transition(space, 'sadness', 'joy', 8, market='US')
+        self.assertEqual(len(positions), 8)
+        self.assertEqual(len(set(positions)), 8)
+        valences = [space.songs[position]['valence'] for position in positions]
+        self.assertEqual(valences, sorted(valences))
+        self.assertNotIn(space.positions['gb'], positions)
+
+        self.assertEqual(len(transition(space, 'sadness', 'joy', 50, market='US')), 21)
+        self.assertEqual(transition(space, 'sadness', 'joy', 5, market='FR'), [])
+        with self.assertRaises(ValueError):
+            transition(space, 'sadness', 'boredom', 5)
+        # Facial and speech labels have the same targets as the text labels
+        self.assertEqual(transition(space, 'sad', 'hap', 8, market='US'), positions)
+
+    # Test that the playlist and its ordered songs are written together
+    def test_create_playlist_with_songs(self):
+        from dal import PlaylistDAO
+
+        self.dao.upsert_songs([track_to_song(track) for track in make_tracks('joy', 3)], 'joy', 'US')
+        dao = PlaylistDAO()
+        playlist_id = dao.create_playlist_with_songs(7, 'Up', ['joy0002', 'joy0000', 'joy0001'], mood_category='joy')
+        self.assertEqual(dao.get_by_id(playlist_id)['user_id'], 7)
+        # songs rows are (id, song_id, ...)
+        self.assertEqual([row[1] for row in dao.get_playlist_songs(playlist_id)], ['joy0002', 'joy0000', 'joy0001'])
@@ -1,4 +1,4 @@
-from mongoengine import Document, StringField, ListField, DictField, DateTimeField, BooleanField, connect
+from mongoengine import Document, StringField, ListField, DictField, DateTimeField, BooleanField, BinaryField, connect
 from datetime import datetime
 import logging
 
@@ -14,6 +14,8 @@ class UserProfile(Document):
     mood_history = ListField(DictField(), default=list)  # List of {emotion: str, timestamp: datetime}
     listening_history = ListField(DictField(), default=list)  # List of {track_id: str, track_name: str, artist: str, timestamp: datetime}
     recommendations = ListField(DictField(), default=list)  # List of {track_id: str, track_name: str, artist: str, emotion: str}
+    taste = DictField(default=dict)  # Decayed audio-feature mean and artist scores, updated per listening event
+    recommended_filter = BinaryField()  # Bloom filter of recommended track_ids, see recommendation.bloom
     is_active = BooleanField(default=True)
     created_at = DateTimeField(default=datetime.utcnow)
     last_login = DateTimeField(default=datetime.utcnow)
@@ -87,12 +89,19 @@ class UserProfile(Document):
                 'artist': artist,
                 'timestamp': datetime.utcnow()
             })
+            self.update_taste(track_id, artist)
             self.save()
             logger.debug(f"Successfully added track to listening history for user {self.username}")
         except Exception as e:
             logger.error(f"Error adding track to listening history for {self.username}: {str(e)}")
             raise
 
+    def update_taste(self, track_id, artist):
+        """Fold a played track into the taste profile used to personalize recommendations (not saved)."""
+        from recommendation.personalization import taste_after_listening
+
+        self.taste = taste_after_listening(self.taste, track_id, artist)
+
     def add_recommendation(self, track_id, track_name, artist, emotion):
         """Add a track recommendation."""
         try:
@@ -103,12 +112,75 @@ class UserProfile(Document):
                 'artist': artist,
                 'emotion': emotion
             })
+            self.remember_recommended([track_id])
             self.save()
             logger.debug(f"Successfully added recommendation for user {self.username}")
         except Exception as e:
             logger.error(f"Error adding recommendation for {self.username}: {str(e)}")
             raise
 
+    def add_recommendations(self, recommendations):
+        """Add several track recommendations with a single save."""
+        try:
+            logger.debug(f"Adding {len(recommendations)} recommendations for user {self.username}")
+            for recommendation in recommendations:
+                self.recommendations.append({
+                    'track_id': recommendation['track_id'],
+                    'track_name': recommendation['track_name'],
+                    'artist': recommendation['artist'],
+                    'emotion': recommendation['emotion']
+                })
+            self.remember_recommended([recommendation['track_id'] for recommendation in recommendations])
+            self.save()
+            logger.debug(f"Successfully added recommendations for user {self.username}")
+        except Exception as e:
+            logger.error(f"Error adding recommendations for {self.username}: {str(e)}")
+            raise
+
+    def add_mood_with_recommendations(self, emotion, recommendations):
+        """Add a mood entry and its track recommendations with a single save."""
+        try:
+            logger.debug(f"Adding mood {emotion} and {len(recommendations)} recommendations for user {self.username}")
+            self.mood_history.append({
+                'emotion': emotion,
+                'timestamp': datetime.utcnow()
+            })
+            for recommendation in recommendations:
+                self.recommendations.append({
+                    'track_id': recommendation['track_id'],
+                    'track_name': recommendation['track_name'],
+                    'artist': recommendation['artist'],
+                    'emotion': recommendation['emotion']
+                })
+            self.remember_recommended([recommendation['track_id'] for recommendation in recommendations])
+            self.save()
+            logger.debug(f"Successfully added mood and recommendations for user {self.username}")
+        except Exception as e:
+            logger.error(f"Error adding mood and recommendations for {self.username}: {str(e)}")
+            raise
+
+    def remember_recommended(self, track_ids):
+        """Add track_ids to the recommended-tracks filter (not saved)."""
+        from django.conf import settings
+        from recommendation.bloom import BloomFilter
+
+        bloom = BloomFilter.from_bytes(self.recommended_filter) if self.recommended_filter else None
+        if bloom is None or bloom.full:
+            # New or saturated filter: rebuild from the full history, at twice the size once it has outgrown one
+            capacity = getattr(settings, 'RECOMMENDATION_FILTER_CAPACITY', 1000)
+            while capacity <= len(self.recommendations):
+                capacity *= 2
+            bloom = BloomFilter(capacity, getattr(settings, 'RECOMMENDATION_FILTER_ERROR_RATE', 0.01))
+            bloom.update(rec['track_id'] for rec in self.recommendations if rec.get('track_id'))
+        else:
+            bloom.update(track_id for track_id in track_ids if track_id)
+        self.recommended_filter = bloom.to_bytes()
+
+    def clear_recommendations(self):
+        """Forget all recommendations, including the recommended-tracks filter (not saved)."""
+        self.recommendations = []
+        self.recommended_filter = None
+
     def get_recent_moods(self, limit=5):
         """Get the user's most recent moods."""
         return sorted(self.mood_history, key=lambda x: x['timestamp'], reverse=True)[:limit]
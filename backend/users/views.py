@@ -479,6 +479,7 @@ def save_recommendations(request, user_id):
             return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
 
         user_profile.recommendations.extend(recommendations)
+        user_profile.remember_recommended(rec.get('track_id') for rec in recommendations if isinstance(rec, dict))
         user_profile.save()
 
         return Response({"message": "Recommendations saved successfully"}, status=status.HTTP_201_CREATED)
@@ -546,7 +547,7 @@ def delete_all_recommendations(request, user_id):
             return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
 
         # Explicitly set recommendations to an empty list
-        user_profile.recommendations = []
+        user_profile.clear_recommendations()
         user_profile.save()
 
         return Response({"message": "All recommendations deleted"}, status=status.HTTP_200_OK)
@@ -597,7 +598,9 @@ def user_recommendations(request, user_id):
         data = json.loads(request.body)
         try:
             user_profile = UserProfile.objects.get(id=user_id)
-            user_profile.recommendations.extend(data.get('recommendations', []))
+            recommendations = data.get('recommendations', [])
+            user_profile.recommendations.extend(recommendations)
+            user_profile.remember_recommended(rec.get('track_id') for rec in recommendations if isinstance(rec, dict))
             user_profile.save()
             return Response({"message": "Recommendations saved successfully."}, status=status.HTTP_201_CREATED)
         except DoesNotExist:
@@ -613,7 +616,7 @@ def user_recommendations(request, user_id):
     elif request.method == 'DELETE':
         try:
             user_profile = UserProfile.objects.get(id=user_id)
-            user_profile.recommendations.clear()  # Clear all recommendations
+            user_profile.clear_recommendations()  # Clear all recommendations
             user_profile.save()
             return Response({"message": "All recommendations deleted."}, status=status.HTTP_204_NO_CONTENT)
         except DoesNotExist:
@@ -671,15 +674,38 @@ def user_mood_history(request):
         500: openapi.Response('Internal server error.'),
     },
 )
-@api_view(['GET'])
+@swagger_auto_schema(
+    method='post',
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            'track_id': openapi.Schema(type=openapi.TYPE_STRING, description='Spotify track ID'),
+            'track_name': openapi.Schema(type=openapi.TYPE_STRING, description='Track name'),
+            'artist': openapi.Schema(type=openapi.TYPE_STRING, description='Artist name'),
+        },
+        required=['track_id'],
+    ),
+    responses={
+        201: openapi.Response('Listen recorded.'),
+        400: openapi.Response('track_id is required.'),
+        401: openapi.Response('Unauthorized.'),
+        404: openapi.Response('User not found.'),
+        500: openapi.Response('Internal server error.'),
+    },
+)
+@api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
-def user_listening_history(request):
+def user_listening_history(request, user_id=None):
     """
-    Retrieves the listening history for the authenticated user.
+    Retrieves the listening history for the authenticated user, or records a track they played.
+
+    A recorded listen also updates the taste profile that personalizes their recommendations.
+
+    :param user_id: Part of the URL; the history is always the authenticated user's.
     """
     try:
         username = request.user.username
-        logger.debug(f"Fetching listening history for user: {username}")
+        logger.debug(f"{request.method} listening history for user: {username}")
 
         try:
             user_profile = UserProfile.objects.get(username=username)
@@ -687,6 +713,13 @@ def user_listening_history(request):
             logger.error(f"User profile not found: {username}")
             return Response({"error": "User profile not found"}, status=status.HTTP_404_NOT_FOUND)
 
+        if request.method == 'POST':
+            track_id = request.data.get('track_id')
+            if not track_id:
+                return Response({"error": "track_id is required"}, status=status.HTTP_400_BAD_REQUEST)
+            user_profile.add_listening(track_id, request.data.get('track_name'), request.data.get('artist'))
+            return Response({"message": "Listen recorded"}, status=status.HTTP_201_CREATED)
+
         # Get all listening history, sorted by timestamp
         listening_history = sorted(
             user_profile.listening_history,
@@ -700,5 +733,5 @@ def user_listening_history(request):
         }, status=status.HTTP_200_OK)
 
     except Exception as e:
-        logger.error(f"Error fetching listening history: {str(e)}")
+        logger.error(f"Error handling listening history: {str(e)}")
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file